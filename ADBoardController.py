@@ -8,6 +8,7 @@ from ManageUsersController import ManageUsersController
 from Ainventory_Cont import ProductDetailsController
 from AreportController import ReportsController
 from AreportsView import ReportsView
+import activity_queue
 
 
 # --- Custom Frameless Dialog (Matches Staff/Target Design) ---
@@ -121,6 +122,10 @@ class DashboardController:
 
         self.users_controller = None
         self.product_controller = None
+
+        # Incremental activity feed: newest transaction_id already on screen
+        self.last_activity_id = 0
+        self.recent_activities_data = []
         self.reports_controller = None
 
         self.view.dashboard_clicked.connect(self.handle_dashboard)
@@ -142,16 +147,14 @@ class DashboardController:
 
     def refresh_dashboard(self):
         print("Refreshing Dashboard Data...")
-        data = {
-            'total_products': self.model.get_total_products(),
-            'low_stock_count': self.model.get_low_stock_items_count(),
-            'out_of_stock_count': self.model.get_out_of_stock_count(),
-            'defective_count': self.model.get_defective_count(),
-            'stock_flow': self.model.get_stock_flow_summary(),
-            'recent_activities': self.model.get_recent_inventory_activities(10)
-        }
+        # All KPIs, today's flow and the activity since the last refresh in a single round trip
+        data = self.model.get_dashboard_snapshot(self.view.ACTIVITY_ROWS, self.last_activity_id)
         self.view.update_analytics(data)
-        self.recent_activities_data = data['recent_activities']
+        new_activities = data['recent_activities']
+        if new_activities:
+            self.last_activity_id = new_activities[0]['transaction_id']
+        # Mirrors the table rows, for the details popup
+        self.recent_activities_data = (new_activities + self.recent_activities_data)[:self.view.ACTIVITY_ROWS]
 
     def handle_dashboard(self):
         self.view.show_dashboard_page()
@@ -174,7 +177,7 @@ class DashboardController:
     def handle_product_stock(self):
         self._ensure_product_controller()
         self.view.show_product_page()
-        self.product_controller.load_all_products()
+        self.product_controller.show_all_products()
 
     def filter_total_products_view(self):
         # This method is effectively essentially same as handle_product_stock
@@ -226,6 +229,8 @@ class DashboardController:
     def handle_sign_out(self):
         msg = CustomMessageBox(self.view)
         if msg.exec():
+            # Write any queued activity entries before the session ends
+            activity_queue.flush()
             try:
                 # 1. Open Login Window FIRST
                 from login_controller import LoginController
@@ -73,6 +73,9 @@ class DashboardView(QWidget):
 
     activity_double_clicked = pyqtSignal(int)
 
+    # Rows kept in the Recent Activity table; new rows push the oldest out
+    ACTIVITY_ROWS = 10
+
     def __init__(self):
         super().__init__()
         self.COLORS = {
@@ -474,10 +477,13 @@ class DashboardView(QWidget):
         flow = data.get('stock_flow', {})
         self.flow_chart.update_chart(flow.get('in', 0), flow.get('out', 0))
 
-        acts = data.get('recent_activities', [])
-        self.activity_table.setRowCount(len(acts))
-        for r, a in enumerate(acts):
-            self.activity_table.setItem(r, 0, QTableWidgetItem(str(a.get('formatted_date', ''))))
+        self.prepend_activities(data.get('recent_activities', []))
+
+    def prepend_activities(self, acts):
+        """Insert new activity rows (newest first) at the top, keeping ACTIVITY_ROWS rows"""
+        for a in reversed(acts):
+            self.activity_table.insertRow(0)
+            self.activity_table.setItem(0, 0, QTableWidgetItem(str(a.get('formatted_date', ''))))
 
             type_item = QTableWidgetItem(str(a.get('transaction_type', '')))
             if a.get('transaction_type') == 'IN':
@@ -486,7 +492,9 @@ class DashboardView(QWidget):
                 type_item.setForeground(QColor(self.COLORS['danger']))
             elif a.get('transaction_type') == 'DEFECT':
                 type_item.setForeground(QColor(self.COLORS['warning']))
-            self.activity_table.setItem(r, 1, type_item)
+            self.activity_table.setItem(0, 1, type_item)
 
-            self.activity_table.setItem(r, 2, QTableWidgetItem(str(a.get('product_name', ''))))
-            self.activity_table.setItem(r, 3, QTableWidgetItem(str(a.get('performed_by', ''))))
\ No newline at end of file
+            self.activity_table.setItem(0, 2, QTableWidgetItem(str(a.get('product_name', ''))))
+            self.activity_table.setItem(0, 3, QTableWidgetItem(str(a.get('performed_by', ''))))
+        if self.activity_table.rowCount() > self.ACTIVITY_ROWS:
+            self.activity_table.setRowCount(self.ACTIVITY_ROWS)
\ No newline at end of file
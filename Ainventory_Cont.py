@@ -1,7 +1,11 @@
 # Ainventory_Cont.py
-from Ainventory_model import ProductDetailsModel
-from Ainventory_view import ProductDetailsView, AddProductDialog
-from PyQt6.QtWidgets import QMessageBox
+from Ainventory_model import ProductDetailsModel, PAGE_SIZE
+from Ainventory_view import ProductDetailsView, AddProductDialog, DefectHistoryDialog
+from product_filter import ProductFilter
+from PyQt6.QtWidgets import QMessageBox, QFileDialog, QApplication
+from PyQt6.QtCore import Qt
+from product_import import format_summary
+from product_sync import LocalCatalogue, merge_listing
 
 
 class ProductDetailsController:
@@ -10,6 +14,19 @@ class ProductDetailsController:
         self.view = ProductDetailsView()
         self.user_data = user_data
 
+        # Keyset pagination state for the product table
+        self.current_filter = ProductFilter.all_products()
+        self.last_product_id = 0
+        self.last_sort_value = None
+        self.has_more = False
+        self.loaded_count = 0
+        self.total_count = 0
+        self.defect_cursor = None  # (last_reported, product_id) of the last defective row shown
+        self.rows = []  # Listing on screen, merged with deltas on refresh
+
+        # Tracks product changes so refreshes only fetch what changed
+        self.catalogue = LocalCatalogue(self.model, full=False)
+
         # [NEW] Apply Role Permissions Immediately
         if self.user_data:
             role = self.user_data.get('role', 'Staff')
@@ -19,6 +36,9 @@ class ProductDetailsController:
 
         # Connect View Signals
         self.view.add_product_clicked.connect(self.handle_add_product)
+        self.view.import_csv_clicked.connect(self.handle_import_csv)
+        self.view.load_more_requested.connect(self.load_next_page)
+        self.view.defect_history_requested.connect(self.show_defect_history)
         # Admin doesn't have stock in/out buttons in view, but keeping for compatibility if needed
         if hasattr(self.view, 'stock_in_clicked'):
             self.view.stock_in_clicked.connect(lambda: self.handle_transaction('IN'))
@@ -30,26 +50,109 @@ class ProductDetailsController:
 
     def load_all_products(self):
         """Load full inventory list (Reset filters)"""
-        products = self.model.get_all_products()
+        self.load_first_page(ProductFilter.all_products())
+
+    def refresh_products(self):
+        """
+        Bring the listing on screen up to date by merging only the products
+        changed since the last sync. Falls back to a fresh load for the
+        defective view or when nothing is loaded yet.
+        """
+        if self.current_filter is None or self.catalogue.mark is None:
+            self.load_first_page(self.current_filter or ProductFilter.all_products())
+            return
+        changed, deleted_ids = self.catalogue.sync()
+        if not changed and not deleted_ids:
+            return
+        cursor_row = None
+        if self.has_more:
+            cursor_row = self.current_filter.cursor_row(self.last_product_id, self.last_sort_value)
+        self.rows = merge_listing(self.rows, changed, deleted_ids, self.current_filter, cursor_row)
+        self.view.replace_products(self.rows)
+        self.loaded_count = len(self.rows)
+        self.total_count = self.model.count_products(self.current_filter)
+        self.view.set_product_count(self.loaded_count, self.total_count)
+
+    def show_all_products(self):
+        """Navigation entry: merge changes into the full listing if it is already shown"""
+        if self.current_filter == ProductFilter.all_products():
+            self.refresh_products()
+        else:
+            self.load_all_products()
+
+    # --- PAGINATION ---
+    def load_first_page(self, product_filter):
+        """Show the first page for a filter; further pages load on scroll"""
+        self.current_filter = product_filter
+        self.catalogue.start()
+        products = self.model.get_products_page(0, PAGE_SIZE, product_filter)
         self.view.load_products(products)
+        self.rows = list(products)
+        self.loaded_count = 0
+        self.total_count = self.model.count_products(product_filter)
+        self._page_loaded(products)
+
+    def load_next_page(self):
+        if not self.has_more:
+            return
+        self.has_more = False  # Block re-entry while this page loads
+        if self.current_filter is None:
+            self._load_next_defect_page()
+            return
+        page = self.model.get_products_page(self.last_product_id, PAGE_SIZE, self.current_filter,
+                                            self.last_sort_value)
+        # Rows already merged in from a delta are not shown twice
+        shown = {row['product_id'] for row in self.rows}
+        products = [p for p in page if p['product_id'] not in shown]
+        self.view.append_products(products)
+        self.rows.extend(products)
+        self._page_loaded(page, len(products))
+
+    def _page_loaded(self, page, added=None):
+        if page:
+            self.last_product_id = page[-1]['product_id']
+            self.last_sort_value = self.current_filter.sort_value(page[-1])
+        self.loaded_count += len(page) if added is None else added
+        self.has_more = len(page) == PAGE_SIZE
+        self.view.set_product_count(self.loaded_count, self.total_count)
 
     # --- FILTER METHODS (Called by Dashboard) ---
     def load_low_stock(self):
         """Show items with stock <= 10 but > 0"""
-        products = self.model.get_products_by_filter("stock_quantity <= 10 AND stock_quantity > 0")
-        self.view.load_products(products)
+        self.load_first_page(ProductFilter.low_stock())
 
     def load_out_of_stock(self):
         """Show items with 0 stock"""
-        products = self.model.get_products_by_filter("stock_quantity = 0")
-        self.view.load_products(products)
+        self.load_first_page(ProductFilter.out_of_stock())
 
     def load_defective(self):
-        """Show items explicitly marked as Defective WITH REASON"""
-        # [NEW] Use specific method to get reasons
-        products = self.model.get_defective_products_with_reason()
-        # [NEW] Use specific view method to show Reason column
+        """Defective summary: one row per product, further pages load on scroll"""
+        self.current_filter = None
+        products = self.model.get_defective_summary_page()
         self.view.load_defective_table(products)
+        self.rows = list(products)
+        self.loaded_count = 0
+        self.total_count = self.model.count_defective_products()
+        self._defect_page_loaded(products)
+
+    def _load_next_defect_page(self):
+        products = self.model.get_defective_summary_page(self.defect_cursor)
+        self.view.append_defective_table(products)
+        self.rows.extend(products)
+        self._defect_page_loaded(products)
+
+    def _defect_page_loaded(self, products):
+        if products:
+            self.defect_cursor = (products[-1]['last_reported'], products[-1]['product_id'])
+        self.loaded_count += len(products)
+        self.has_more = len(products) == PAGE_SIZE
+        self.view.set_product_count(self.loaded_count, self.total_count)
+
+    def show_defect_history(self, product_id):
+        """Drill-down: the individual defect reports behind one summary row"""
+        reports = self.model.get_defect_history(product_id)
+        name = next((r['product_name'] for r in self.rows if r['product_id'] == product_id), f"#{product_id}")
+        DefectHistoryDialog(name, reports, self.view).exec()
 
     def handle_add_product(self):
         dialog = AddProductDialog(self.view)
@@ -67,10 +170,32 @@ class ProductDetailsController:
 
             if self.model.add_new_product(data):
                 QMessageBox.information(self.view, "Success", "Product added successfully.")
-                self.load_all_products()
+                self.refresh_products()
             else:
                 QMessageBox.critical(self.view, "Error", "Failed to add product.")
 
+    def handle_import_csv(self):
+        path, _ = QFileDialog.getOpenFileName(self.view, "Import Products", "", "CSV Files (*.csv)")
+        if not path:
+            return
+        user_id = self.user_data.get('user_id', 1) if self.user_data else 1
+
+        def progress(imported, rejected):
+            self.view.count_lbl.setText(f"Importing... {imported} added, {rejected} rejected")
+            QApplication.processEvents()
+
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            summary = self.model.import_products_csv(path, user_id, progress)
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        if summary['error'] and not summary['imported']:
+            QMessageBox.critical(self.view, "Import Failed", format_summary(summary))
+        else:
+            QMessageBox.information(self.view, "Import Complete", format_summary(summary))
+        self.load_all_products()
+
     def handle_transaction(self, trans_type):
         # Admin controller primarily handles View/Add.
         # Transaction logic is typically in Staff controller,
@@ -21,9 +21,13 @@ class ToggleTableWidget(QTableWidget):
 
 class ProductDetailsView(QWidget):
     add_product_clicked = pyqtSignal()
+    import_csv_clicked = pyqtSignal()
+    load_more_requested = pyqtSignal()
+    defect_history_requested = pyqtSignal(int)  # product_id of a defective summary row
 
     def __init__(self):
         super().__init__()
+        self.defective_mode = False
         self.init_ui()
 
     def init_ui(self):
@@ -63,7 +67,22 @@ class ProductDetailsView(QWidget):
         """)
         self.btn_add.clicked.connect(self.add_product_clicked.emit)
         btn_layout.addWidget(self.btn_add)
+
+        self.btn_import = QPushButton("IMPORT CSV")
+        self.btn_import.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_import.setMinimumWidth(140)
+        self.btn_import.setStyleSheet("""
+            QPushButton { background-color: #FFFFFF; color: #008B8B; font-weight: bold; border: 2px solid #008B8B; border-radius: 8px; padding: 8px; font-family: Arial; } 
+            QPushButton:hover { background-color: #E0F2F1; }
+        """)
+        self.btn_import.clicked.connect(self.import_csv_clicked.emit)
+        btn_layout.addWidget(self.btn_import)
         btn_layout.addStretch()
+
+        # "Showing X of Y" for paginated loads
+        self.count_lbl = QLabel("")
+        self.count_lbl.setStyleSheet("color: #757575; font-family: Arial; border: none;")
+        btn_layout.addWidget(self.count_lbl)
         card_layout.addLayout(btn_layout)
 
         # Table
@@ -87,22 +106,43 @@ class ProductDetailsView(QWidget):
         # Connect Double Click to Expand Column
         self.product_table.cellDoubleClicked.connect(self.handle_cell_double_click)
 
+        # Fetch the next page when scrolled near the bottom
+        self.product_table.verticalScrollBar().valueChanged.connect(self.handle_scroll)
+
         card_layout.addWidget(self.product_table)
         bg_layout.addWidget(card)
         main_layout.addWidget(bg)
 
     def handle_cell_double_click(self, row, column):
+        if self.defective_mode:
+            # Drill down into the reports behind this summary row
+            self.defect_history_requested.emit(int(self.product_table.item(row, 0).text()))
+            return
         self.product_table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeMode.ResizeToContents)
 
+    def handle_scroll(self, value):
+        bar = self.product_table.verticalScrollBar()
+        if bar.maximum() > 0 and value >= bar.maximum() - 3:
+            self.load_more_requested.emit()
+
     def load_products(self, products):
         """Loads standard inventory view (6 columns)"""
+        self.defective_mode = False
         self.product_table.setColumnCount(6)
         self.product_table.setHorizontalHeaderLabels(
             ["Product ID", "Product Name", "Brand", "Model", "Stock", "Status"])
         self.product_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
 
-        self.product_table.setRowCount(len(products))
-        for row, p in enumerate(products):
+        self.product_table.setRowCount(0)
+        self.append_products(products)
+        self.product_table.scrollToTop()
+
+    def append_products(self, products):
+        """Adds the next page of products below the rows already shown"""
+        start = self.product_table.rowCount()
+        self.product_table.setRowCount(start + len(products))
+        for offset, p in enumerate(products):
+            row = start + offset
             self._fill_common_rows(row, p)
             # Status
             status = p['status']
@@ -115,27 +155,47 @@ class ProductDetailsView(QWidget):
                 status_item.setForeground(QColor("#D32F2F"))
             self.product_table.setItem(row, 5, status_item)
 
+    def replace_products(self, products):
+        """Re-fill the standard view in place (after a delta merge), keeping the scroll position"""
+        bar = self.product_table.verticalScrollBar()
+        position = bar.value()
+        self.product_table.setRowCount(0)
+        self.append_products(products)
+        bar.setValue(position)
+
+    def set_product_count(self, shown, total):
+        self.count_lbl.setText(f"Showing {shown} of {total}" if total else "")
+
     def load_defective_table(self, products):
-        """Loads defective items view with REASON column (7 columns)"""
-        self.product_table.setColumnCount(7)
+        """Loads the defective summary: one row per product (9 columns)"""
+        self.defective_mode = True
+        self.product_table.setColumnCount(9)
         self.product_table.setHorizontalHeaderLabels(
-            ["Product ID", "Product Name", "Brand", "Model", "Stock", "Status", "Defect Reason"])
+            ["Product ID", "Product Name", "Brand", "Model", "Stock",
+             "Defective Qty", "Reports", "Last Reported", "Last Reason"])
         self.product_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         # Give reason column more space
-        self.product_table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeMode.ResizeToContents)
+        self.product_table.horizontalHeader().setSectionResizeMode(8, QHeaderView.ResizeMode.ResizeToContents)
 
-        self.product_table.setRowCount(len(products))
-        for row, p in enumerate(products):
-            self._fill_common_rows(row, p)
+        self.product_table.setRowCount(0)
+        self.append_defective_table(products)
+        self.product_table.scrollToTop()
 
-            # Status (Force Red for Defective View)
-            status_item = self.make_item(p['status'], True)
-            self.product_table.setItem(row, 5, status_item)
+    def append_defective_table(self, products):
+        """Adds the next page of the defective summary"""
+        start = self.product_table.rowCount()
+        self.product_table.setRowCount(start + len(products))
+        for offset, p in enumerate(products):
+            row = start + offset
+            self._fill_common_rows(row, p)
+            self.product_table.setItem(row, 5, self.make_item(str(int(p['defective_qty'] or 0)), True))
+            self.product_table.setItem(row, 6, self.make_item(str(p['report_count']), True))
+            self.product_table.setItem(row, 7, self.make_item(str(p['last_reported']), True))
 
-            # Defect Reason
-            reason_item = self.make_item(p.get('defect_reason', 'N/A'))
+            # Defect Reason (latest report)
+            reason_item = self.make_item(p.get('defect_reason') or 'N/A')
             reason_item.setForeground(QColor("#D32F2F"))  # Red text for reason
-            self.product_table.setItem(row, 6, reason_item)
+            self.product_table.setItem(row, 8, reason_item)
 
     def _fill_common_rows(self, row, p):
         """Helper to fill first 5 columns"""
@@ -232,4 +292,36 @@ class AddProductDialog(BaseTransactionDialog):
             'stock_quantity': qty,
             'status': status,
             'description': ""
-        }
\ No newline at end of file
+        }
+
+
+class DefectHistoryDialog(QDialog):
+    """Drill-down from the defective summary: every DEFECT report of one product"""
+
+    def __init__(self, product_name, reports, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Defect History")
+        self.resize(640, 420)
+        self.setStyleSheet("""
+            QDialog { background-color: white; }
+            QLabel#Header { color: #0076aa; font-size: 20px; font-weight: bold; }
+            QTableWidget { border: none; color: black; font-family: Arial; font-size: 13px; }
+            QHeaderView::section { background-color: #000000; color: white; padding: 8px; font-weight: bold; border: none; }
+        """)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        title_lbl = QLabel(f"{product_name} - {len(reports)} report(s)")
+        title_lbl.setObjectName("Header")
+        layout.addWidget(title_lbl)
+
+        table = QTableWidget(len(reports), 4)
+        table.setHorizontalHeaderLabels(["Date", "Qty", "Reason", "Reported By"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for row, r in enumerate(reports):
+            table.setItem(row, 0, QTableWidgetItem(str(r.get('formatted_date', ''))))
+            table.setItem(row, 1, QTableWidgetItem(str(r.get('quantity', ''))))
+            table.setItem(row, 2, QTableWidgetItem(r.get('remarks') or 'N/A'))
+            table.setItem(row, 3, QTableWidgetItem(str(r.get('performed_by') or '')))
+        layout.addWidget(table)
@@ -11,6 +11,35 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
 from reportlab.lib.units import inch
 
+# Max rows shown in the on-screen preview (the export still covers every row)
+PREVIEW_ROWS = 1000
+
+
+class StreamingFlowables(list):
+    """
+    Flowable list for SimpleDocTemplate.build() that is refilled from a
+    generator as the document consumes it, so only a batch of table rows
+    exists at any time instead of the whole report.
+    """
+
+    def __init__(self, head, batches, tail):
+        super().__init__(head)
+        self._batches = batches
+        self._tail = tail
+
+    def __len__(self):
+        # build() checks len() before every flowable - top up from the stream
+        while super().__len__() < 2 and (self._batches or self._tail):
+            if self._batches:
+                try:
+                    self.extend(next(self._batches))
+                    continue
+                except StopIteration:
+                    self._batches = None
+            self.extend(self._tail)
+            self._tail = None
+        return super().__len__()
+
 
 class ReportsController:
     def __init__(self, user_data=None):
@@ -18,8 +47,13 @@ class ReportsController:
         self.view = None
         self.user_data = user_data
         self.current_report_data = []
+        self.current_report_total = 0
         self.current_report_type = ""
         self.current_date_range = {"start": "", "end": ""}
+        # Fixed when the report is generated, so the export reads the rows the preview counted
+        self.current_as_of = None
+        self.current_movement_totals = {}  # Stock Movement: type -> [quantity, transactions]
+        self.current_status_rows = []      # Inventory Status: the full snapshot
 
     def set_view(self, view):
         self.view = view
@@ -44,23 +78,37 @@ class ReportsController:
 
         self.current_report_type = rtype
         self.current_date_range = {"start": start, "end": end}
+        self.current_as_of = datetime.now()
         data = []
+        total = 0
+        totals = {}
+        status_rows = []
 
         try:
-            if rtype == "Stock Movement":
-                data = self.model.get_stock_movement(start, end)
-            elif rtype == "Inventory Status":
-                data = self.model.get_inventory_status()
-            elif rtype == "Defects Report":
-                data = self.model.get_defective_report(start, end)
-            elif rtype == "User Activity":
-                data = self.model.get_user_activity(start, end)
+            # Stream the rows: keep only the preview, count (and for Stock Movement, sum) the rest
+            for batch in self.report_batches(rtype, start, end):
+                if len(data) < PREVIEW_ROWS:
+                    data.extend(batch[:PREVIEW_ROWS - len(data)])
+                total += len(batch)
+                if rtype == "Stock Movement":
+                    for row in batch:
+                        entry = totals.setdefault(row['transaction_type'], [0, 0])
+                        entry[0] += int(row['quantity'] or 0)
+                        entry[1] += 1
+                elif rtype == "Inventory Status":
+                    status_rows.extend(batch)
 
             self.current_report_data = data
+            self.current_report_total = total
+            self.current_movement_totals = totals
+            self.current_status_rows = status_rows
 
             if data:
                 self.view.display_generated_data(data)
-                print(f"✓ Generated {len(data)} rows for {rtype}")
+                if total > len(data):
+                    print(f"✓ Generated {total} rows for {rtype} (previewing first {len(data)})")
+                else:
+                    print(f"✓ Generated {total} rows for {rtype}")
             else:
                 self.view.display_generated_data([])
                 self.show_styled_message("No Data",
@@ -76,6 +124,19 @@ class ReportsController:
             traceback.print_exc()
             self.show_styled_message("Error", f"Failed to generate report: {e}", "Critical")
 
+    def report_batches(self, rtype, start, end):
+        """Row batches for a report type up to current_as_of, streamed from the model where supported"""
+        as_of = self.current_as_of
+        if rtype == "Stock Movement":
+            return self.model.iter_stock_movement(start, end, as_of=as_of)
+        if rtype == "Defects Report":
+            return self.model.iter_defective_report(start, end, as_of=as_of)
+        if rtype == "User Activity":
+            return self.model.iter_user_activity(start, end, as_of=as_of)
+        if rtype == "Inventory Status":
+            return iter([self.model.get_inventory_status()])
+        return iter([])
+
     def handle_export_report(self):
         """Export the currently displayed report to PDF"""
         if not self.current_report_data:
@@ -177,7 +238,13 @@ class ReportsController:
                 f"{self.current_date_range['start']} to {self.current_date_range['end']}"
             ])
 
-        metadata.append(["Total Records:", str(len(self.current_report_data))])
+        metadata.append(["Total Records:", str(self.current_report_total)])
+
+        # Period totals were summed from the same rows when the report was generated
+        if self.current_report_type == "Stock Movement":
+            for label, ttype in (("Total Stock In:", 'IN'), ("Total Stock Out:", 'OUT'), ("Total Defects:", 'DEFECT')):
+                qty, count = self.current_movement_totals.get(ttype, (0, 0))
+                metadata.append([label, f"{qty} unit(s) in {count} transaction(s)"])
 
         # Style the table - First column bold via TableStyle
         meta_table = Table(metadata, colWidths=[2 * inch, 4 * inch])
@@ -194,66 +261,35 @@ class ReportsController:
         elements.append(Spacer(1, 30))
 
         # ============================================
-        # 3. REPORT DATA TABLE
+        # 3. REPORT DATA TABLE (streamed batch by batch)
         # ============================================
 
+        data_tables = None
         if not self.current_report_data:
             no_data = Paragraph("No data available for this selection.", styles['Normal'])
             elements.append(no_data)
         else:
-            # Extract headers and data
-            headers = [k.replace('_', ' ').title() for k in self.current_report_data[0].keys()]
-            data_rows = [headers]
-
-            # Add data rows
-            for row in self.current_report_data:
-                row_data = []
-                for val in row.values():
-                    if val is None:
-                        row_data.append("")
-                    else:
-                        row_data.append(str(val))
-                data_rows.append(row_data)
-
-            # Create table
-            data_table = Table(data_rows)
-            data_table.setStyle(TableStyle([
-                # Header row
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#0076aa")),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('TOPPADDING', (0, 0), (-1, 0), 12),
-
-                # Data rows
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('TOPPADDING', (0, 1), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-
-                # Grid
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-
-                # Alternating row colors
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
-            ]))
-
-            elements.append(data_table)
+            # Extract headers; fixed column widths keep every batch's table aligned
+            columns = list(self.current_report_data[0].keys())
+            headers = [k.replace('_', ' ').title() for k in columns]
+            col_widths = [doc.width / len(columns)] * len(columns)
+            if self.current_report_type == "Inventory Status":
+                batches = iter([self.current_status_rows])
+            else:
+                batches = self.report_batches(self.current_report_type,
+                                              self.current_date_range['start'],
+                                              self.current_date_range['end'])
+            data_tables = self._batch_tables(batches, columns, headers, col_widths)
 
         # ============================================
         # 4. VALIDATION SIGNATURE SECTION
         # ============================================
-        elements.append(Spacer(1, 40))
+        tail_elements = []
+        tail_elements.append(Spacer(1, 40))
 
         validation_section = Paragraph("Validation & Approval", header_style)
-        elements.append(validation_section)
-        elements.append(Spacer(1, 10))
+        tail_elements.append(validation_section)
+        tail_elements.append(Spacer(1, 10))
 
         # Clean signature table - NO HTML
         signature_data = [
@@ -273,12 +309,12 @@ class ReportsController:
             ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
         ]))
 
-        elements.append(sig_table)
+        tail_elements.append(sig_table)
 
         # ============================================
         # 5. FOOTER NOTE
         # ============================================
-        elements.append(Spacer(1, 30))
+        tail_elements.append(Spacer(1, 30))
 
         footer_note = Paragraph(
             "<i>This is a computer-generated report from PyesaTrak Inventory Management System. "
@@ -291,12 +327,57 @@ class ReportsController:
                 alignment=TA_CENTER
             )
         )
-        elements.append(footer_note)
+        tail_elements.append(footer_note)
 
-        # Build PDF
+        # Build PDF - data tables are pulled from the DB while the document is laid out
+        if data_tables:
+            elements = StreamingFlowables(elements, data_tables, tail_elements)
+        else:
+            elements.extend(tail_elements)
         doc.build(elements)
         print(f"✓ PDF exported: {filename}")
 
+    def _batch_tables(self, batches, columns, headers, col_widths):
+        """Yield one styled Table per row batch (header row only on the first)"""
+        first = True
+        for batch in batches:
+            data_rows = [headers] if first else []
+            for row in batch:
+                data_rows.append(["" if row.get(key) is None else str(row.get(key)) for key in columns])
+
+            data_table = Table(data_rows, colWidths=col_widths, repeatRows=1 if first else 0)
+            style = [
+                # Data rows
+                ('BACKGROUND', (0, 0), (-1, -1), colors.white),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 9),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+
+                # Grid
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+                # Alternating row colors
+                ('ROWBACKGROUNDS', (0, 1 if first else 0), (-1, -1), [colors.white, colors.HexColor("#f5f5f5")]),
+            ]
+            if first:
+                style += [
+                    # Header row
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#0076aa")),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                    ('FONTSIZE', (0, 0), (-1, 0), 10),
+                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                    ('TOPPADDING', (0, 0), (-1, 0), 12),
+                ]
+            data_table.setStyle(TableStyle(style))
+            first = False
+            yield [data_table]
+
     def show_styled_message(self, title, text, icon_type):
         """Show styled message dialog"""
         msg = QMessageBox(self.view)
@@ -1,26 +1,73 @@
 # AreportModel.py - UPDATED with Validation Workflow
-import mysql.connector
 from mysql.connector import Error
+from db_pool import get_connection
+from date_ranges import date_range, DATETIME_FORMAT
+import stmt_cache
+import partitions
 
+# Rows per batch for the streaming (iter_*) fetchers
+STREAM_BATCH_SIZE = 500
+
+# Report queries read `{source}`: the live table, or the live table plus the
+# archive tables the date range overlaps (see report_query)
+
+STOCK_MOVEMENT_QUERY = """
+    SELECT 
+        DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as transaction_date,
+        t.transaction_type, 
+        i.product_name, 
+        i.brand,
+        t.quantity, 
+        t.remarks,
+        CONCAT(u.userFname, ' ', u.userLname) as processed_by
+    FROM {source} t
+    JOIN inventory i ON t.product_id = i.product_id
+    LEFT JOIN users u ON t.performed_by = u.user_id
+    WHERE t.transaction_date >= %s AND t.transaction_date < %s
+    ORDER BY t.transaction_date DESC
+"""
+
+DEFECTIVE_REPORT_QUERY = """
+    SELECT 
+        DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as transaction_date,
+        i.product_name, 
+        i.brand, 
+        t.quantity as defective_qty, 
+        t.remarks,
+        CONCAT(u.userFname, ' ', u.userLname) as reported_by
+    FROM {source} t
+    JOIN inventory i ON t.product_id = i.product_id
+    LEFT JOIN users u ON t.performed_by = u.user_id
+    WHERE t.transaction_type = 'DEFECT' 
+      AND t.transaction_date >= %s AND t.transaction_date < %s
+    ORDER BY t.transaction_date DESC
+"""
+
+USER_ACTIVITY_QUERY = """
+    SELECT 
+        l.login_id, 
+        CONCAT(u.userFname, ' ', u.userLname) as user_name,
+        u.role,
+        DATE_FORMAT(l.login_time, '%Y-%m-%d %H:%i') as login_time
+    FROM {source} l
+    JOIN users u ON l.user_id = u.user_id
+    WHERE l.login_time >= %s AND l.login_time < %s
+    ORDER BY l.login_time DESC
+"""
+
+# Columns the templates read from {source}. Archive unions select exactly
+# these, so a column added to a live table later does not break old months.
+SOURCE_COLUMNS = {
+    'stock_transactions': "transaction_id, product_id, transaction_type, quantity, remarks, performed_by, "
+                          "transaction_date",
+    'user_logins': "login_id, user_id, login_time",
+}
 
-class ReportsModel:
-    def __init__(self):
-        self.db_config = {
-            'host': '127.0.0.1',
-            'database': 'pyesatrak',
-            'user': 'root',
-            'password': ''
-        }
 
+class ReportsModel:
     def connect(self):
-        try:
-            conn = mysql.connector.connect(**self.db_config)
-            if conn.is_connected():
-                return conn
-            return None
-        except Error as e:
-            print(f"Error connecting to DB: {e}")
-            return None
+        # Borrowed from the shared pool; conn.close() hands it back
+        return get_connection()
 
     def get_all_saved_reports(self):
         """Fetch report history with proper user tracking"""
@@ -135,32 +182,8 @@ class ReportsModel:
 
     def get_stock_movement(self, start, end):
         """Get stock movement transactions with full user names"""
-        conn = self.connect()
-        if not conn: return []
-        try:
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT 
-                    DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as transaction_date,
-                    t.transaction_type, 
-                    i.product_name, 
-                    i.brand,
-                    t.quantity, 
-                    t.remarks,
-                    CONCAT(u.userFname, ' ', u.userLname) as processed_by
-                FROM stock_transactions t
-                JOIN inventory i ON t.product_id = i.product_id
-                LEFT JOIN users u ON t.performed_by = u.user_id
-                WHERE t.transaction_date BETWEEN %s AND %s
-                ORDER BY t.transaction_date DESC
-            """
-            cursor.execute(query, (f"{start} 00:00:00", f"{end} 23:59:59"))
-            return cursor.fetchall()
-        except Error as e:
-            print(f"Error fetching Stock Movement: {e}")
-            return []
-        finally:
-            if conn: conn.close()
+        return self._fetch_all(*self.report_query(STOCK_MOVEMENT_QUERY, 'stock_transactions', start, end),
+                               "Stock Movement")
 
     def get_inventory_status(self):
         """Get current inventory status"""
@@ -190,54 +213,88 @@ class ReportsModel:
 
     def get_defective_report(self, start, end):
         """Get defective items report with full user names"""
+        return self._fetch_all(*self.report_query(DEFECTIVE_REPORT_QUERY, 'stock_transactions', start, end),
+                               "Defective Report")
+
+    def get_user_activity(self, start, end):
+        """Get user login activity with full names"""
+        return self._fetch_all(*self.report_query(USER_ACTIVITY_QUERY, 'user_logins', start, end),
+                               "User Activity")
+
+    # --- STREAMING FETCHERS (bounded memory for large date ranges) ---
+
+    # as_of (a datetime) leaves out rows dated at or after it, so a preview and
+    # its export streamed later read the same rows
+
+    def iter_stock_movement(self, start, end, batch_size=STREAM_BATCH_SIZE, as_of=None):
+        """Yield Stock Movement rows in lists of at most batch_size"""
+        return self._stream(*self.report_query(STOCK_MOVEMENT_QUERY, 'stock_transactions', start, end, as_of),
+                            "Stock Movement", batch_size)
+
+    def iter_defective_report(self, start, end, batch_size=STREAM_BATCH_SIZE, as_of=None):
+        """Yield Defective Report rows in lists of at most batch_size"""
+        return self._stream(*self.report_query(DEFECTIVE_REPORT_QUERY, 'stock_transactions', start, end, as_of),
+                            "Defective Report", batch_size)
+
+    def iter_user_activity(self, start, end, batch_size=STREAM_BATCH_SIZE, as_of=None):
+        """Yield User Activity rows in lists of at most batch_size"""
+        return self._stream(*self.report_query(USER_ACTIVITY_QUERY, 'user_logins', start, end, as_of),
+                            "User Activity", batch_size)
+
+    def report_query(self, template, table, start, end, as_of=None):
+        """
+        (query, params) for a report over inclusive dates, ending before
+        as_of if given. Months archived by partitions.py are read from their
+        archive tables, unioned with the live table, so the caller never
+        sees the difference.
+        """
+        bounds = date_range(start, end)
+        if as_of is not None:
+            bounds = (bounds[0], min(bounds[1], as_of.strftime(DATETIME_FORMAT)))
+        archives = partitions.archives_for(table, *bounds)
+        if not archives:
+            return template.format(source=table), bounds
+        date_col = partitions.TABLES[table][1]
+        columns = SOURCE_COLUMNS[table]
+        branches = [f"SELECT {columns} FROM {name} WHERE {date_col} >= %s AND {date_col} < %s"
+                    for name in archives + [table]]
+        source = "(" + " UNION ALL ".join(branches) + ")"
+        return template.format(source=source), bounds * len(branches) + bounds
+
+    def _fetch_all(self, query, params, label):
         conn = self.connect()
         if not conn: return []
         try:
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT 
-                    DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as transaction_date,
-                    i.product_name, 
-                    i.brand, 
-                    t.quantity as defective_qty, 
-                    t.remarks,
-                    CONCAT(u.userFname, ' ', u.userLname) as reported_by
-                FROM stock_transactions t
-                JOIN inventory i ON t.product_id = i.product_id
-                LEFT JOIN users u ON t.performed_by = u.user_id
-                WHERE t.transaction_type = 'DEFECT' 
-                  AND t.transaction_date BETWEEN %s AND %s
-                ORDER BY t.transaction_date DESC
-            """
-            cursor.execute(query, (f"{start} 00:00:00", f"{end} 23:59:59"))
+            cursor = stmt_cache.execute(conn, query, params, dictionary=True)
             return cursor.fetchall()
         except Error as e:
-            print(f"Error fetching Defective Report: {e}")
+            print(f"Error fetching {label}: {e}")
             return []
         finally:
             if conn: conn.close()
 
-    def get_user_activity(self, start, end):
-        """Get user login activity with full names"""
+    def _stream(self, query, params, label, batch_size):
+        """
+        Generator over an UNBUFFERED cursor: rows stay on the server until
+        fetched, so only one batch is held in memory at a time.
+        The pooled connection is held until the generator is exhausted or closed.
+        """
         conn = self.connect()
-        if not conn: return []
+        if not conn: return
         try:
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT 
-                    l.login_id, 
-                    CONCAT(u.userFname, ' ', u.userLname) as user_name,
-                    u.role,
-                    DATE_FORMAT(l.login_time, '%Y-%m-%d %H:%i') as login_time
-                FROM user_logins l
-                JOIN users u ON l.user_id = u.user_id
-                WHERE l.login_time BETWEEN %s AND %s
-                ORDER BY l.login_time DESC
-            """
-            cursor.execute(query, (f"{start} 00:00:00", f"{end} 23:59:59"))
-            return cursor.fetchall()
+            cursor = stmt_cache.execute(conn, query, params, dictionary=True)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
         except Error as e:
-            print(f"Error fetching User Activity: {e}")
-            return []
+            print(f"Error streaming {label}: {e}")
         finally:
-            if conn: conn.close()
\ No newline at end of file
+            try:
+                # Consumer stopped early - drain so the connection can go back to the pool
+                if conn.unread_result:
+                    conn.consume_results()
+            except Error:
+                pass
+            conn.close()
@@ -7,10 +7,24 @@ from PyQt6.QtWidgets import QApplication
 from login_model import LoginModel
 from login_view import LoginView
 from login_controller import LoginController
+import db_pool
+import activity_queue
+import stock_journal
+import stock_rollup
+import local_replica
 
 def main():
     app = QApplication(sys.argv)
 
+    # 0. Open the shared database connection pool up front
+    db_pool.warm_up()
+    # Replay stock movements journaled by an earlier session, if any
+    stock_journal.start()
+    # Fold new stock movements into the daily rollup off the UI thread
+    stock_rollup.start()
+    # Start copying the local read mirror, if configured, in the background
+    local_replica.start()
+
     # 1. Initialize the Model (Data)
     model = LoginModel()
 
@@ -25,7 +39,14 @@ def main():
     controller.show()
 
     # 5. Execute the Application Loop
-    sys.exit(app.exec())
+    exit_code = app.exec()
+
+    # 6. Write any queued activity entries before exiting
+    activity_queue.shutdown()
+    stock_journal.shutdown()
+    stock_rollup.shutdown()
+    local_replica.shutdown()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,12 @@
 # ManageUsersController.py - FULLY FUNCTIONAL
 from ManageUsersModel import ManageUsersModel
 from ManageUsersView import ManageUsersView, UserFormDialog
+from user_index import UserDirectoryIndex
 from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtCore import QTimer
+
+SEARCH_DEBOUNCE_MS = 250   # Search runs once typing pauses this long
+DIRECTORY_POLL_MS = 5000   # Version check for changes made on other terminals
 
 
 class ManageUsersController:
@@ -10,10 +15,24 @@ class ManageUsersController:
         self.view = ManageUsersView()
         self.user_data = user_data
 
+        # Searches are served from this in-memory index, not the database
+        self.directory = UserDirectoryIndex(self.model)
+        self.shown_users = None  # Rows on screen, so identical results skip the table rebuild
+
+        # Each keystroke restarts the timer, dropping the search scheduled by the previous one
+        self.search_timer = QTimer(self.view)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.show_results)
+
+        self.poll_timer = QTimer(self.view)
+        self.poll_timer.timeout.connect(self.poll_directory)
+        self.poll_timer.start(DIRECTORY_POLL_MS)
+
         # Filter Connections
-        self.view.search_input.textChanged.connect(self.refresh_data)
-        self.view.role_combo.currentTextChanged.connect(self.refresh_data)
-        self.view.status_combo.currentTextChanged.connect(self.refresh_data)
+        self.view.search_input.textChanged.connect(lambda _: self.search_timer.start())
+        self.view.role_combo.currentTextChanged.connect(self.show_results)
+        self.view.status_combo.currentTextChanged.connect(self.show_results)
 
         # Action Buttons
         self.view.add_user_clicked.connect(self.handle_add_user)
@@ -21,6 +40,16 @@ class ManageUsersController:
         self.view.edit_user_clicked.connect(self.handle_edit_user)
 
     def refresh_data(self):
+        """Sync the directory index (fetches only if it changed), then show the current search"""
+        self.directory.sync()
+        self.show_results()
+
+    def poll_directory(self):
+        if self.view.isVisible() and self.directory.sync():
+            self.show_results()
+
+    def show_results(self):
+        self.search_timer.stop()  # A pending debounced search would repeat this one
         search = self.view.search_input.text()
         role = self.view.role_combo.currentText()
         status = self.view.status_combo.currentText()
@@ -29,7 +58,10 @@ class ManageUsersController:
         if "All" in role: role = "All"
         if "All" in status: status = "All"
 
-        users = self.model.get_users(role, status, search)
+        users = self.directory.search(search, role, status)
+        if users == self.shown_users:
+            return
+        self.shown_users = users
         self.view.load_data(users)
 
     def handle_add_user(self):
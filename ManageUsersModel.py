@@ -1,54 +1,55 @@
 # ManageUsersModel.py
-import mysql.connector
 from mysql.connector import Error
+from db_pool import get_connection
+import activity_queue
+import kpi_counters
+import local_replica
 
 
 class ManageUsersModel:
-    def __init__(self):
-        self.db_config = {
-            'host': '127.0.0.1',
-            'database': 'pyesatrak',
-            'user': 'root',
-            'password': ''
-        }
-
     def connect(self):
+        # Borrowed from the shared pool; conn.close() hands it back
+        return get_connection()
+
+    def get_directory_version(self):
+        """The user_directory_version stamp (one primary-key lookup), None if unreadable"""
+        if local_replica.is_enabled():
+            # The stamp the mirrored rows were copied at (see local_replica.py)
+            version = local_replica.user_directory_version()
+            if version is not None:
+                return version
+        conn = self.connect()
+        if not conn: return None
         try:
-            return mysql.connector.connect(**self.db_config)
+            cursor = conn.cursor()
+            cursor.execute("SELECT counter_value FROM kpi_counters WHERE counter_name = %s",
+                           (kpi_counters.USER_DIRECTORY_VERSION,))
+            row = cursor.fetchone()
+            return row[0] if row else None
         except Error as e:
-            print(f"Database Error: {e}")
+            print(f"Error reading user directory version: {e}")
             return None
+        finally:
+            if conn: conn.close()
 
-    def get_users(self, role="All", status="All", search=""):
+    def get_user_directory(self):
+        """Every user for the search index (user_index.py), newest first; None on error"""
+        if local_replica.is_enabled():
+            rows = local_replica.user_directory()
+            if rows is not None:
+                return rows
         conn = self.connect()
-        if not conn: return []
+        if not conn: return None
         try:
             cursor = conn.cursor(dictionary=True)
-
-            # Using your specific schema: userFname, userLname
-            query = """
-                SELECT user_id, userFname, userLname, username, role, status 
-                FROM users WHERE 1=1
-            """
-            params = []
-
-            if role != "All":
-                query += " AND role = %s"
-                params.append(role)
-
-            if status != "All":
-                query += " AND status = %s"
-                params.append(status)
-
-            if search:
-                query += " AND (userFname LIKE %s OR userLname LIKE %s OR username LIKE %s)"
-                search_term = f"%{search}%"
-                params.extend([search_term, search_term, search_term])
-
-            query += " ORDER BY user_id DESC"
-
-            cursor.execute(query, tuple(params))
+            cursor.execute("""
+                SELECT user_id, userFname, userLname, username, role, status
+                FROM users ORDER BY user_id DESC
+            """)
             return cursor.fetchall()
+        except Error as e:
+            print(f"Error loading user directory: {e}")
+            return None
         finally:
             if conn: conn.close()
 
@@ -81,12 +82,18 @@ class ManageUsersModel:
                 data['role'],
                 data['status']
             ))
+            self.bump_directory_version(cursor)
             conn.commit()  # <--- CRITICAL: Saves to DB
 
             # Optional: Log this action to activity_log
-            self.log_activity(cursor, data.get('performed_by_id', 1), f"Added user: {data['username']}")
-            conn.commit()
-
+            performed_by = data.get('performed_by_id', 1)
+            if activity_queue.is_enabled():
+                activity_queue.log(performed_by, f"Added user: {data['username']}", conn)
+            else:
+                self.log_activity(cursor, performed_by, f"Added user: {data['username']}")
+                conn.commit()
+
+            local_replica.invalidate()  # loads use the primary until the mirror has this user
             return True
         except Error as e:
             print(f"Error adding user: {e}")
@@ -115,7 +122,9 @@ class ManageUsersModel:
             query = f"UPDATE users SET {', '.join(fields)} WHERE user_id = %s"
 
             cursor.execute(query, tuple(values))
+            self.bump_directory_version(cursor)
             conn.commit()  # <--- CRITICAL
+            local_replica.invalidate()
             return True
         except Error as e:
             print(f"Error updating user: {e}")
@@ -129,7 +138,9 @@ class ManageUsersModel:
         try:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM users WHERE user_id = %s", (uid,))
+            self.bump_directory_version(cursor)
             conn.commit()  # <--- CRITICAL
+            local_replica.invalidate()
             return True
         except Error as e:
             print(f"Error deleting user: {e}")
@@ -137,6 +148,10 @@ class ManageUsersModel:
         finally:
             if conn: conn.close()
 
+    def bump_directory_version(self, cursor):
+        """Same transaction as the user write: copies of the directory reload (user_index.py, local_replica.py)"""
+        kpi_counters.apply_deltas(cursor, {kpi_counters.USER_DIRECTORY_VERSION: 1})
+
     def log_activity(self, cursor, user_id, description):
         """Helper to insert into activity_log table"""
         try:
@@ -6,6 +6,7 @@ from PyQt6.QtCore import Qt
 # Sub-Controllers
 from SIModel import InventoryModel
 from SIController import InventoryController
+import activity_queue
 
 
 # --- Custom Frameless Dialog (Matches Admin Design) ---
@@ -119,6 +120,9 @@ class StaffDashboardController:
 
         self.inventory_controller = None
 
+        # Incremental activity feed: newest transaction_id already on screen
+        self.last_activity_id = 0
+
         # Navigation
         self.view.dashboard_clicked.connect(self.handle_dashboard)
         self.view.product_stock_clicked.connect(self.handle_product_stock)
@@ -138,15 +142,11 @@ class StaffDashboardController:
 
     def refresh_dashboard(self):
         print("Refreshing Staff Dashboard Data...")
-        data = {
-            'total_products': self.model.get_total_products(),
-            'low_stock_count': self.model.get_low_stock_items_count(),
-            'out_of_stock_count': self.model.get_out_of_stock_count(),
-            'defective_count': self.model.get_defective_count(),
-            'stock_flow': self.model.get_stock_flow_summary(),
-            'recent_activities': self.model.get_recent_inventory_activities(10)
-        }
+        # All KPIs, today's flow and the activity since the last refresh in a single round trip
+        data = self.model.get_dashboard_snapshot(self.view.ACTIVITY_ROWS, self.last_activity_id)
         self.view.update_analytics(data)
+        if data['recent_activities']:
+            self.last_activity_id = data['recent_activities'][0]['transaction_id']
 
     def handle_dashboard(self):
         self.view.show_dashboard_page()
@@ -160,7 +160,7 @@ class StaffDashboardController:
     def handle_product_stock(self):
         self._ensure_inventory_controller()
         self.view.show_product_page()
-        self.inventory_controller.load_all_products()
+        self.inventory_controller.show_all_products()
 
     def filter_total_products_view(self):
         # Effectively the same as handle_product_stock
@@ -189,6 +189,8 @@ class StaffDashboardController:
     def handle_sign_out(self):
         msg = CustomMessageBox(self.view)
         if msg.exec():
+            # Write any queued activity entries before the session ends
+            activity_queue.flush()
             try:
                 # 1. Open Login Window FIRST
                 from login_controller import LoginController
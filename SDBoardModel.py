@@ -1,22 +1,14 @@
 # SDBoardModel.py
-import mysql.connector
 from mysql.connector import Error
+from db_pool import get_connection
+import kpi_counters
+import stmt_cache
+import stock_rollup
 
 class StaffDashboardModel:
-    def __init__(self):
-        self.db_config = {
-            'host': '127.0.0.1',
-            'database': 'pyesatrak',
-            'user': 'root',
-            'password': ''
-        }
-
     def connect(self):
-        try:
-            return mysql.connector.connect(**self.db_config)
-        except Error as e:
-            print(f"DB Error: {e}")
-            return None
+        # Borrowed from the shared pool; conn.close() hands it back
+        return get_connection()
 
     def get_total_products(self):
         conn = self.connect()
@@ -67,29 +59,31 @@ class StaffDashboardModel:
         conn = self.connect()
         if not conn: return {'in': 0, 'out': 0}
         try:
+            # Today's rollup rows plus the ledger tail not folded in yet
             c = conn.cursor(dictionary=True)
-            c.execute("""
-                SELECT 
-                    SUM(CASE WHEN transaction_type = 'IN' THEN quantity ELSE 0 END) as stock_in,
-                    SUM(CASE WHEN transaction_type = 'OUT' THEN quantity ELSE 0 END) as stock_out
-                FROM stock_transactions 
-                WHERE DATE(transaction_date) = CURDATE()
-            """)
-            res = c.fetchone()
-            if res:
-                return {'in': float(res['stock_in'] or 0), 'out': float(res['stock_out'] or 0)}
-            return {'in': 0, 'out': 0}
+            c.execute(stock_rollup.MOVEMENT_TOTALS_QUERY, stock_rollup.today_params())
+            totals = {r['transaction_type']: float(r['total_qty'] or 0) for r in c.fetchall()}
+            return {'in': totals.get('IN', 0), 'out': totals.get('OUT', 0)}
         finally:
             conn.close()
 
     def get_recent_inventory_activities(self, limit=10):
+        return self.get_activity_feed(0, limit)
+
+    def get_activity_feed(self, last_seen=0, limit=10):
+        """
+        Transactions newer than `last_seen` (a transaction_id), newest first.
+        Walks the primary key backwards, so a refresh with nothing new reads
+        no ledger rows at all.
+        """
         conn = self.connect()
         if not conn: return []
         try:
             c = conn.cursor(dictionary=True)
             query = """
                 SELECT 
-                    t.transaction_id, 
+                    t.transaction_id,
+                    t.transaction_date, 
                     DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as formatted_date,
                     t.transaction_type, 
                     i.product_name, 
@@ -97,10 +91,115 @@ class StaffDashboardModel:
                 FROM stock_transactions t
                 JOIN inventory i ON t.product_id = i.product_id
                 LEFT JOIN users u ON t.performed_by = u.user_id
-                ORDER BY t.transaction_date DESC 
-                LIMIT %s
+                WHERE t.transaction_id > %s
+                ORDER BY t.transaction_id DESC LIMIT %s
             """
-            c.execute(query, (limit,))
+            c.execute(query, (last_seen, limit))
             return c.fetchall()
         finally:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+    def get_dashboard_snapshot(self, limit=10, last_seen=0):
+        """
+        Every dashboard KPI in ONE round trip.
+        The four counts are O(1) reads of `kpi_counters` (see kpi_counters.py);
+        the recent activity rows are LEFT JOINed onto the KPI row so the result
+        always has at least one row even with no transactions.
+        Only activity newer than `last_seen` (a transaction_id) is returned, so
+        the dashboard can prepend it to the rows it already shows.
+        """
+        snapshot = {
+            'total_products': 0,
+            'low_stock_count': 0,
+            'out_of_stock_count': 0,
+            'defective_count': 0,
+            'stock_flow': {'in': 0, 'out': 0},
+            'recent_activities': []
+        }
+        conn = self.connect()
+        if not conn: return snapshot
+        try:
+            query = f"""
+                SELECT
+                    k.total_products,
+                    k.low_stock_count,
+                    k.out_of_stock_count,
+                    k.defective_count,
+                    f.stock_in,
+                    f.stock_out,
+                    a.transaction_id,
+                    a.transaction_date,
+                    a.formatted_date,
+                    a.transaction_type,
+                    a.product_name,
+                    a.performed_by
+                FROM (
+                    SELECT
+                        MAX(CASE WHEN counter_name = 'total_products' THEN counter_value END) as total_products,
+                        MAX(CASE WHEN counter_name = 'low_stock_count' THEN counter_value END) as low_stock_count,
+                        MAX(CASE WHEN counter_name = 'out_of_stock_count' THEN counter_value END) as out_of_stock_count,
+                        MAX(CASE WHEN counter_name = 'defective_count' THEN counter_value END) as defective_count
+                    FROM kpi_counters
+                ) k
+                CROSS JOIN ({stock_rollup.FLOW_QUERY}) f
+                LEFT JOIN (
+                    SELECT 
+                        t.transaction_id,
+                        t.transaction_date, 
+                        DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as formatted_date,
+                        t.transaction_type, 
+                        i.product_name, 
+                        u.username as performed_by
+                    FROM stock_transactions t
+                    JOIN inventory i ON t.product_id = i.product_id
+                    LEFT JOIN users u ON t.performed_by = u.user_id
+                    WHERE t.transaction_id > %s
+                    ORDER BY t.transaction_id DESC LIMIT %s
+                ) a ON 1 = 1
+                ORDER BY a.transaction_id DESC
+            """
+            params = stock_rollup.today_params() + (last_seen, limit)
+            rows = self._snapshot_rows(conn, query, params)
+            if rows is None or (rows and rows[0]['total_products'] is None):
+                # Counters were never seeded (or the table is missing) on this database:
+                # seed them on this same connection and read again
+                conn.rollback()
+                if kpi_counters.rebuild(conn):
+                    rows = self._snapshot_rows(conn, query, params)
+            if not rows:
+                return snapshot
+
+            first = rows[0]
+
+            snapshot['total_products'] = int(first['total_products'] or 0)
+            snapshot['low_stock_count'] = int(first['low_stock_count'] or 0)
+            snapshot['out_of_stock_count'] = int(first['out_of_stock_count'] or 0)
+            snapshot['defective_count'] = int(first['defective_count'] or 0)
+            snapshot['stock_flow'] = {'in': float(first['stock_in'] or 0), 'out': float(first['stock_out'] or 0)}
+            snapshot['recent_activities'] = [
+                {
+                    'transaction_id': r['transaction_id'],
+                    'transaction_date': r['transaction_date'],
+                    'formatted_date': r['formatted_date'],
+                    'transaction_type': r['transaction_type'],
+                    'product_name': r['product_name'],
+                    'performed_by': r['performed_by']
+                }
+                for r in rows if r['transaction_id'] is not None
+            ]
+            return snapshot
+        except Error as e:
+            print(f"Error fetching dashboard snapshot: {e}")
+            return snapshot
+        finally:
+            conn.close()
+
+    def _snapshot_rows(self, conn, query, params):
+        """Rows of the snapshot query, or None if kpi_counters does not exist yet"""
+        try:
+            # Prepared once per pooled connection, re-executed on every refresh
+            return stmt_cache.execute(conn, query, params, dictionary=True).fetchall()
+        except Error as e:
+            if e.errno != kpi_counters.ER_NO_SUCH_TABLE:
+                raise
+            return None
@@ -1,7 +1,13 @@
 # SIController.py
-from SIModel import InventoryModel
-from SIView import InventoryView, StockInDialog, StockOutDialog, DefectDialog
+from SIModel import InventoryModel, PAGE_SIZE, INSUFFICIENT_STOCK
+from SIView import InventoryView, StockInDialog, StockOutDialog, DefectDialog, DefectHistoryDialog
+from product_filter import ProductFilter
+from product_sync import LocalCatalogue, merge_listing
 from PyQt6.QtWidgets import QMessageBox
+from PyQt6.QtCore import QTimer
+import stock_journal
+
+JOURNAL_POLL_MS = 1000  # How often the pending indicator re-reads the stock journal
 
 
 class InventoryController:
@@ -12,34 +18,145 @@ class InventoryController:
         self.view = view
         self.user_data = user_data
 
+        # Keyset pagination state for the product table
+        self.current_filter = ProductFilter.all_products()
+        self.last_product_id = 0
+        self.last_sort_value = None
+        self.has_more = False
+        self.loaded_count = 0
+        self.total_count = 0
+        self.defect_cursor = None  # (last_reported, product_id) of the last defective row shown
+        self.rows = []  # Listing on screen, merged with deltas on refresh
+
+        # Delta sync: the table only fetches changed products on refresh, and
+        # the stock dialogs keep a full local copy instead of reloading it
+        self.catalogue = LocalCatalogue(self.model, full=False)
+        self.dialog_catalogue = LocalCatalogue(self.model, full=True)
+
         # Connect Staff Signals
         self.view.stock_in_clicked.connect(lambda: self.handle_transaction('IN'))
         self.view.stock_out_clicked.connect(lambda: self.handle_transaction('OUT'))
         self.view.defect_clicked.connect(lambda: self.handle_transaction('DEFECT'))
+        self.view.load_more_requested.connect(self.load_next_page)
+        self.view.defect_history_requested.connect(self.show_defect_history)
+
+        # Pending indicator for movements journaled while the database was unavailable
+        self.pending_count = 0
+        if stock_journal.is_enabled():
+            self.journal_timer = QTimer(self.view)
+            self.journal_timer.timeout.connect(self.update_pending_count)
+            self.journal_timer.start(JOURNAL_POLL_MS)
+            self.update_pending_count()
 
         # Initial Load
         self.load_all_products()
 
     def load_all_products(self):
-        products = self.model.get_all_products()
+        self.load_first_page(ProductFilter.all_products())
+
+    def show_all_products(self):
+        if self.current_filter == ProductFilter.all_products():
+            self.refresh_products()
+        else:
+            self.load_all_products()
+
+    def refresh_products(self):
+        """Merge products changed since the last sync into the table on screen"""
+        if self.current_filter is None or self.catalogue.mark is None:
+            self.load_first_page(self.current_filter or ProductFilter.all_products())
+            return
+        changed, deleted_ids = self.catalogue.sync()
+        if not changed and not deleted_ids:
+            return
+        cursor_row = None
+        if self.has_more:
+            cursor_row = self.current_filter.cursor_row(self.last_product_id, self.last_sort_value)
+        self.rows = merge_listing(self.rows, changed, deleted_ids, self.current_filter, cursor_row)
+        self.view.replace_table(self.rows)
+        self.loaded_count = len(self.rows)
+        self.total_count = self.model.count_products(self.current_filter)
+        self.view.set_product_count(self.loaded_count, self.total_count)
+
+    # Pagination: first page now, the rest on scroll
+    def load_first_page(self, product_filter):
+        self.current_filter = product_filter
+        self.catalogue.start()
+        products = self.model.get_products_page(0, PAGE_SIZE, product_filter)
         self.view.load_table(products)
+        self.rows = list(products)
+        self.loaded_count = 0
+        self.total_count = self.model.count_products(product_filter)
+        self._page_loaded(products)
+
+    def load_next_page(self):
+        if not self.has_more:
+            return
+        self.has_more = False  # Block re-entry while this page loads
+        if self.current_filter is None:
+            self._load_next_defect_page()
+            return
+        page = self.model.get_products_page(self.last_product_id, PAGE_SIZE, self.current_filter,
+                                            self.last_sort_value)
+        # Skip rows a delta merge already put on screen
+        shown = {row['product_id'] for row in self.rows}
+        products = [p for p in page if p['product_id'] not in shown]
+        self.view.append_table(products)
+        self.rows.extend(products)
+        self._page_loaded(page, len(products))
+
+    def _page_loaded(self, page, added=None):
+        if page:
+            self.last_product_id = page[-1]['product_id']
+            self.last_sort_value = self.current_filter.sort_value(page[-1])
+        self.loaded_count += len(page) if added is None else added
+        self.has_more = len(page) == PAGE_SIZE
+        self.view.set_product_count(self.loaded_count, self.total_count)
 
     # [NEW] Filter Methods for Dashboard KPIs
     def load_low_stock(self):
-        products = self.model.get_products_by_filter("stock_quantity <= 10 AND stock_quantity > 0")
-        self.view.load_table(products)
+        self.load_first_page(ProductFilter.low_stock())
 
     def load_out_of_stock(self):
-        products = self.model.get_products_by_filter("stock_quantity = 0")
-        self.view.load_table(products)
+        self.load_first_page(ProductFilter.out_of_stock())
 
     def load_defective(self):
-        # [UPDATED] Use specific method to get reasons and load specific table view
-        products = self.model.get_defective_products_with_reason()
+        """Defective summary: one row per product, further pages load on scroll"""
+        self.current_filter = None
+        products = self.model.get_defective_summary_page()
         self.view.load_defective_table(products)
+        self.rows = list(products)
+        self.loaded_count = 0
+        self.total_count = self.model.count_defective_products()
+        self._defect_page_loaded(products)
+
+    def _load_next_defect_page(self):
+        products = self.model.get_defective_summary_page(self.defect_cursor)
+        self.view.append_defective_table(products)
+        self.rows.extend(products)
+        self._defect_page_loaded(products)
+
+    def _defect_page_loaded(self, products):
+        if products:
+            self.defect_cursor = (products[-1]['last_reported'], products[-1]['product_id'])
+        self.loaded_count += len(products)
+        self.has_more = len(products) == PAGE_SIZE
+        self.view.set_product_count(self.loaded_count, self.total_count)
+
+    def update_pending_count(self):
+        pending = stock_journal.pending_count()
+        if pending < self.pending_count:
+            self.refresh_products()  # Replayed movements are now in the database
+        self.pending_count = pending
+        self.view.set_pending_count(pending, stock_journal.rejected_count())
+
+    def show_defect_history(self, product_id):
+        """Drill-down: the individual defect reports behind one summary row"""
+        reports = self.model.get_defect_history(product_id)
+        name = next((r['product_name'] for r in self.rows if r['product_id'] == product_id), f"#{product_id}")
+        DefectHistoryDialog(name, reports, self.view).exec()
 
     def handle_transaction(self, trans_type):
-        all_products = self.model.get_all_products()
+        all_products = self.dialog_catalogue.products()
         if not all_products:
             QMessageBox.warning(self.view, "Inventory Empty", "No products available.")
             return
@@ -70,9 +187,20 @@ class InventoryController:
                 pid, qty, rem = dialog.get_data()
                 success = self.model.update_stock(pid, -qty, trans_type, rem, user_id)
 
-            if success:
+            if success is stock_journal.JOURNALED:
+                # Saved locally; the stock check happens when it reaches the database
+                self.update_pending_count()
+                QMessageBox.information(self.view, "Saved Offline",
+                                        "The database is not reachable right now. The transaction was saved "
+                                        "on this terminal and will be sent automatically.")
+            elif success:
                 QMessageBox.information(self.view, "Success", success_msg)
-                self.load_all_products()
+                self.refresh_products()
+            elif success is INSUFFICIENT_STOCK:
+                # Another terminal took the stock after this dialog was opened
+                QMessageBox.warning(self.view, "Insufficient Stock",
+                                    "Not enough stock left for this transaction. The list has been refreshed.")
+                self.refresh_products()
             else:
                 QMessageBox.critical(self.view, "Error", "Transaction failed.")
 
@@ -1,6 +1,123 @@
 # SIModel.py
-import mysql.connector
 from mysql.connector import Error
+from db_pool import get_connection, using_sqlite
+import kpi_counters
+import stmt_cache
+import activity_queue
+import db_retry
+from product_filter import ProductFilter
+import catalogue_cache
+import local_replica
+import stock_journal
+
+# Rows per page for the keyset-paginated product listing
+PAGE_SIZE = 100
+
+# Delta sync re-reads this many seconds before the last mark, so rows written
+# by transactions that committed just after a sync are never skipped.
+# updated_at is the UPDATE's NOW(), not the commit time: a movement can still
+# wait on row locks after its UPDATE for up to innodb_lock_wait_timeout (50s
+# by default) before it commits, so the overlap must cover that wait.
+SYNC_OVERLAP_SECONDS = 60
+SYNC_COLUMNS = "product_id, product_name, brand, model, stock_quantity, status"
+# No ORDER BY: sorting by product_id would walk the primary key instead of ix_inventory_updated
+CHANGED_SINCE_QUERY = f"SELECT {SYNC_COLUMNS} FROM inventory WHERE updated_at >= %s"
+
+# update_stock statements, kept as module constants so stmt_cache reuses the
+# same prepared statement on every call
+PRODUCT_STOCK_QUERY = "SELECT product_name, stock_quantity FROM inventory WHERE product_id = %s"
+PRODUCT_EXISTS_QUERY = "SELECT 1 FROM inventory WHERE product_id = %s"
+# status is assigned first: MySQL evaluates SET left to right, so it must
+# see the stock level from before this movement. Decrements only match rows
+# with enough stock (params: change x3, product_id, change, abs(change)).
+UPDATE_STOCK_QUERY = """
+    UPDATE inventory 
+    SET status = CASE 
+            WHEN (stock_quantity + %s) <= 0 THEN 'Out of Stock'
+            WHEN (stock_quantity + %s) <= 10 THEN 'Low Stock'
+            ELSE 'Available'
+        END,
+        stock_quantity = stock_quantity + %s,
+        updated_at = NOW()
+    WHERE product_id = %s AND (%s >= 0 OR stock_quantity >= %s)
+"""
+LOG_TRANSACTION_QUERY = """
+    INSERT INTO stock_transactions 
+    (product_id, transaction_type, quantity, remarks, performed_by, transaction_date, idempotency_key)
+    VALUES (%s, %s, %s, %s, %s, NOW(), %s)
+"""
+MOVEMENT_BOOKED_QUERY = "SELECT 1 FROM stock_movement_keys WHERE idempotency_key = %s"
+# Booked right after the ledger row; the primary key refuses a second booking
+BOOK_MOVEMENT_QUERY = """
+    INSERT INTO stock_movement_keys (idempotency_key, transaction_id, booked_at)
+    VALUES (%s, LAST_INSERT_ID(), NOW())
+"""
+LOG_ACTIVITY_QUERY = """
+    INSERT INTO activity_log (user_id, activity_description, activity_time)
+    VALUES (%s, %s, NOW())
+"""
+
+# sp_update_stock (migrate.py, version 3) does a whole movement in ONE round
+# trip. Databases that have not been migrated (and the SQLite backend, which
+# has no stored routines) fall back to the statements above. The backend is
+# checked per call: db_pool.configure() may switch it after this import.
+STOCK_ROUTINE = True
+CALL_UPDATE_STOCK = "CALL sp_update_stock(%s, %s, %s, %s, %s, %s, %s)"
+ER_SP_DOES_NOT_EXIST = 1305
+ER_SP_WRONG_NO_OF_ARGS = 1318  # routine from before version 5 (no idempotency key)
+ROUTINE_COLUMNS = 4  # found, description, insufficient, duplicate
+
+
+
+def _line_quantity(line):
+    """Signed quantity of an update_stock_many line, or None if the line is not a valid movement"""
+    try:
+        qty = int(line.get('quantity_change') or 0)
+    except (TypeError, ValueError):
+        return None
+    ttype = line.get('transaction_type')
+    if (ttype == 'IN' and qty > 0) or (ttype in ('OUT', 'DEFECT') and qty < 0):
+        return qty
+    return None
+
+class InsufficientStock:
+    """update_stock result when an OUT/DEFECT exceeds the stock on hand (falsy, like a failure)"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "INSUFFICIENT_STOCK"
+
+
+INSUFFICIENT_STOCK = InsufficientStock()
+
+# Defective view: one row per product. The page is cut in the inner derived
+# table first, so the last-reason subquery only runs for the rows shown.
+DEFECT_SUMMARY_QUERY = """
+    SELECT p.*,
+           (SELECT t.remarks FROM stock_transactions t
+            WHERE t.transaction_type = 'DEFECT' AND t.product_id = p.product_id
+            ORDER BY t.transaction_date DESC, t.transaction_id DESC
+            LIMIT 1) as defect_reason
+    FROM (
+        SELECT i.product_id, i.product_name, i.brand, i.model, i.stock_quantity, i.status,
+               d.defective_qty, d.report_count, d.last_reported
+        FROM (
+            SELECT product_id, SUM(quantity) as defective_qty, COUNT(*) as report_count,
+                   MAX(transaction_date) as last_reported
+            FROM stock_transactions
+            WHERE transaction_type = 'DEFECT'
+            GROUP BY product_id
+        ) d
+        JOIN inventory i ON i.product_id = d.product_id
+        WHERE {seek}
+        ORDER BY d.last_reported DESC, d.product_id DESC
+        LIMIT %s
+    ) p
+    ORDER BY p.last_reported DESC, p.product_id DESC
+"""
+DEFECT_SUMMARY_SEEK = "(d.last_reported < %s OR (d.last_reported = %s AND d.product_id < %s))"
 
 
 class InventoryModel:
@@ -8,91 +125,338 @@ class InventoryModel:
 
     def __init__(self):
         self.connection = None
-        self.db_config = {
-            'host': '127.0.0.1',
-            'database': 'pyesatrak',
-            'user': 'root',
-            'password': ''
-        }
+        self.reading_replica = False
 
     def connect(self):
-        try:
-            self.connection = mysql.connector.connect(**self.db_config)
-            return self.connection.is_connected()
-        except Error as e:
-            print(f"Database Error: {e}")
-            return False
+        # Borrowed from the shared pool; connection.close() hands it back
+        self.connection = get_connection()
+        return self.connection is not None
+
+    def connect_read(self):
+        """
+        Connection for product reads: the local replica when it is on
+        (see local_replica.py), otherwise the primary
+        """
+        self.connection = local_replica.get_connection()
+        self.reading_replica = self.connection is not None
+        return self.reading_replica or self.connect()
+
+    def _cached(self, key, loader):
+        # The local replica is cheaper to read than the cache's version check
+        if local_replica.is_enabled():
+            return loader()
+        return catalogue_cache.cached(key, loader)
+
+    def _sync_mark(self):
+        """Delta sync high-water mark in the primary's clock"""
+        cursor = self.connection.cursor()
+        if self.reading_replica:
+            return local_replica.inventory_mark(cursor)
+        cursor.execute("SELECT NOW() - INTERVAL %s SECOND", (SYNC_OVERLAP_SECONDS,))
+        return cursor.fetchone()[0]
 
     def get_all_products(self):
-        return self.get_products_by_filter("1=1")
+        return self.get_products_by_filter(ProductFilter.all_products())
+
+    def get_products_by_filter(self, product_filter):
+        """Cached until the catalogue version changes (see catalogue_cache.py)"""
+        return self._cached(('filter', product_filter),
+                            lambda: self._fetch_products_by_filter(product_filter))
+
+    def _fetch_products_by_filter(self, product_filter):
+        if not self.connect_read():
+            return []
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            where, params = product_filter.where()
+            query = f"""
+                SELECT product_id, product_name, brand, model, stock_quantity, status
+                FROM inventory
+                WHERE {where}
+                ORDER BY {product_filter.order_by()}
+            """
+            cursor.execute(query, tuple(params))
+            return cursor.fetchall()
+        except Error:
+            return []
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
 
-    def get_products_by_filter(self, where_clause):
-        self.connect()
+    def get_products_page(self, after_product_id=0, page_size=PAGE_SIZE, product_filter=None,
+                          after_sort_value=None):
+        """Keyset page: next page_size products after the previous page's last row"""
+        product_filter = product_filter or ProductFilter.all_products()
+        return self._cached(
+            ('page', product_filter, after_product_id, after_sort_value, page_size),
+            lambda: self._fetch_products_page(after_product_id, page_size, product_filter, after_sort_value)
+        )
+
+    def _fetch_products_page(self, after_product_id, page_size, product_filter, after_sort_value):
+        if not self.connect_read():
+            return []
         try:
             cursor = self.connection.cursor(dictionary=True)
-            query = f"SELECT product_id, product_name, brand, model, stock_quantity, status FROM inventory WHERE {where_clause} ORDER BY product_id ASC"
-            cursor.execute(query)
+            where, params = product_filter.where()
+            seek, seek_params = product_filter.seek(after_product_id, after_sort_value)
+            query = f"""
+                SELECT product_id, product_name, brand, model, stock_quantity, status
+                FROM inventory
+                WHERE {where} AND {seek}
+                ORDER BY {product_filter.order_by()}
+                LIMIT %s
+            """
+            cursor.execute(query, tuple(params + seek_params + [page_size]))
             return cursor.fetchall()
         except Error:
             return []
         finally:
-            if self.connection: self.connection.close()
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def count_products(self, product_filter=None):
+        product_filter = product_filter or ProductFilter.all_products()
+        return self._cached(('count', product_filter), lambda: self._count_products(product_filter))
+
+    def _count_products(self, product_filter):
+        if not self.connect_read():
+            return 0
+        try:
+            cursor = self.connection.cursor()
+            where, params = product_filter.where()
+            cursor.execute(f"SELECT COUNT(*) FROM inventory WHERE {where}", tuple(params))
+            return cursor.fetchone()[0]
+        except Error:
+            return 0
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def get_products_changed_since(self, since=None):
+        """
+        Delta sync: products added or changed since the high-water mark `since`
+        (None = everything) plus ids deleted since then. Uses the index on
+        inventory.updated_at, so the cost scales with the number of changes.
+        Returns {'changed', 'deleted_ids', 'high_water_mark'} (None on error);
+        pass high_water_mark to the next call. Rows may repeat across calls.
+        """
+        if not self.connect_read():
+            return None
+        try:
+            mark = self._sync_mark()
+            cursor = self.connection.cursor(dictionary=True)
+            if since is None:
+                cursor.execute(f"SELECT {SYNC_COLUMNS} FROM inventory ORDER BY product_id")
+                return {'changed': cursor.fetchall(), 'deleted_ids': [], 'high_water_mark': mark}
+            cursor.execute(CHANGED_SINCE_QUERY, (since,))
+            changed = cursor.fetchall()
+            cursor.execute("SELECT product_id FROM inventory_deletions WHERE deleted_at >= %s", (since,))
+            deleted_ids = [row['product_id'] for row in cursor.fetchall()]
+            return {'changed': changed, 'deleted_ids': deleted_ids, 'high_water_mark': mark}
+        except Error:
+            return None
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def get_sync_mark(self):
+        """High-water mark for 'now', to start delta sync without a full load"""
+        if not self.connect_read():
+            return None
+        try:
+            return self._sync_mark()
+        except Error:
+            return None
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
 
     # --- NEW METHOD FOR DEFECTIVE KPI ---
     def get_defective_products_with_reason(self):
+        """First page of the defective summary (one row per product)"""
+        return self.get_defective_summary_page()
+
+    def get_defective_summary_page(self, after=None, page_size=PAGE_SIZE):
         """
-        Fetches products that have been reported as defective,
-        joining with the transaction log to get the specific REASON (remarks).
+        Products with DEFECT reports, one row each: total defective qty,
+        report count, last reported time and the last reason (defect_reason).
+        Newest report first; `after` is the (last_reported, product_id) of the
+        last row already shown, for the next page.
         """
-        self.connect()
+        if not self.connect():
+            return []
+        try:
+            cursor = self.connection.cursor(dictionary=True)
+            if after is None:
+                cursor.execute(DEFECT_SUMMARY_QUERY.format(seek="1=1"), (page_size,))
+            else:
+                last_reported, product_id = after
+                cursor.execute(DEFECT_SUMMARY_QUERY.format(seek=DEFECT_SUMMARY_SEEK),
+                               (last_reported, last_reported, product_id, page_size))
+            return cursor.fetchall()
+        except Error as e:
+            print(f"Error fetching defective products: {e}")
+            return []
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def count_defective_products(self):
+        if not self.connect():
+            return 0
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "SELECT COUNT(DISTINCT product_id) FROM stock_transactions WHERE transaction_type = 'DEFECT'")
+            return cursor.fetchone()[0]
+        except Error as e:
+            print(f"Error counting defective products: {e}")
+            return 0
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def get_defect_history(self, product_id, limit=PAGE_SIZE):
+        """Drill-down: the individual DEFECT reports of one product, newest first"""
+        if not self.connect():
+            return []
         try:
             cursor = self.connection.cursor(dictionary=True)
             query = """
-                SELECT i.product_id, i.product_name, i.brand, i.model, 
-                       i.stock_quantity, i.status, t.remarks as defect_reason
-                FROM inventory i
-                JOIN stock_transactions t ON i.product_id = t.product_id
-                WHERE t.transaction_type = 'DEFECT'
-                ORDER BY t.transaction_date DESC
+                SELECT t.transaction_id, t.transaction_date,
+                       DATE_FORMAT(t.transaction_date, '%Y-%m-%d %H:%i') as formatted_date,
+                       t.quantity, t.remarks, u.username as performed_by
+                FROM stock_transactions t
+                LEFT JOIN users u ON t.performed_by = u.user_id
+                WHERE t.transaction_type = 'DEFECT' AND t.product_id = %s
+                ORDER BY t.transaction_date DESC, t.transaction_id DESC
+                LIMIT %s
             """
-            cursor.execute(query)
+            cursor.execute(query, (product_id, limit))
             return cursor.fetchall()
         except Error as e:
-            print(f"Error fetching defective products: {e}")
+            print(f"Error fetching defect history: {e}")
             return []
         finally:
-            if self.connection: self.connection.close()
+            if self.connection:
+                self.connection.close()
+                self.connection = None
 
-    def update_stock(self, product_id, quantity_change, transaction_type, remarks, user_id):
-        self.connect()
+    def update_stock(self, product_id, quantity_change, transaction_type, remarks, user_id,
+                     idempotency_key=None):
+        """
+        Apply one stock movement. Returns True, False on error, or
+        INSUFFICIENT_STOCK when a decrement exceeds the stock on hand
+        (checked atomically by the UPDATE itself, so concurrent terminals
+        can never drive stock negative).
+        Deadlocks and lock timeouts are retried with jittered backoff. The
+        idempotency key (generated when omitted) is stored on the ledger row,
+        so a retry after an ambiguous commit is never booked twice.
+        With the stock journal on, a movement the database cannot take (or
+        any movement while earlier ones are still queued) is journaled for
+        replay and JOURNALED is returned instead; its stock check happens
+        on replay (see stock_journal.py).
+        """
+        key = idempotency_key or db_retry.new_key()
+        if stock_journal.has_pending():
+            # Queue behind the movements still waiting, so they reach the database in scan order
+            return stock_journal.append(product_id, quantity_change, transaction_type, remarks, user_id, key)
+        done = db_retry.with_retry(
+            lambda: self._apply_stock_movement(product_id, quantity_change, transaction_type, remarks, user_id, key),
+            "Stock update"
+        )
+        if done is db_retry.UNAVAILABLE and stock_journal.is_enabled():
+            return stock_journal.append(product_id, quantity_change, transaction_type, remarks, user_id, key)
+        if done:
+            local_replica.invalidate()  # reads use the primary until the mirror has this movement
+        return done
+
+    def _apply_stock_movement(self, product_id, quantity_change, transaction_type, remarks, user_id, key):
+        global STOCK_ROUTINE
+        if STOCK_ROUTINE and not using_sqlite():
+            done = self._update_stock_routine(product_id, quantity_change, transaction_type, remarks, user_id, key)
+            if done is not None:
+                return done
+            print("sp_update_stock missing or out of date (run: python -m migrate) - using per-statement path")
+            STOCK_ROUTINE = False
+        return self._update_stock_statements(product_id, quantity_change, transaction_type, remarks, user_id, key)
+
+    def _update_stock_routine(self, product_id, quantity_change, transaction_type, remarks, user_id, key):
+        """One CALL does the update, ledger, activity and KPI counters. None if the routine is missing or too old."""
+        global STOCK_ROUTINE
+        if not self.connect():
+            return db_retry.UNAVAILABLE
+        try:
+            write_behind = activity_queue.is_enabled()
+            cursor = self.connection.cursor()
+            cursor.execute(CALL_UPDATE_STOCK, (product_id, quantity_change, transaction_type, remarks, user_id,
+                                               0 if write_behind else 1, key))
+            rows = cursor.fetchall()
+            while cursor.nextset():
+                pass
+            if not rows or not rows[0][0]:
+                return False  # Unknown product
+            row = rows[0]
+            if len(row) < ROUTINE_COLUMNS:
+                # An older routine already did the movement: read what it reports
+                # and use the statements from the next call on
+                print("sp_update_stock is out of date (run: python -m migrate) - using per-statement path")
+                STOCK_ROUTINE = False
+                row = tuple(row) + (0,) * (ROUTINE_COLUMNS - len(row))
+            if row[3]:
+                return True  # Already booked by an earlier attempt
+            if row[2]:
+                return INSUFFICIENT_STOCK
+            kpi_counters.bump_catalogue_version(self.connection)  # Invalidates cached catalogues
+            if write_behind and row[1]:
+                activity_queue.log(user_id, row[1], self.connection)
+            return True
+        except Error as err:
+            if err.errno in (ER_SP_DOES_NOT_EXIST, ER_SP_WRONG_NO_OF_ARGS):
+                return None
+            if err.errno == db_retry.ER_DUP_ENTRY:
+                return True  # Same idempotency key committed concurrently
+            return self._stock_write_failed(err)
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def _update_stock_statements(self, product_id, quantity_change, transaction_type, remarks, user_id, key):
+        if not self.connect():
+            return db_retry.UNAVAILABLE
         try:
             cursor = self.connection.cursor()
             self.connection.start_transaction()
 
-            # 0. Get product name for activity log
-            cursor.execute("SELECT product_name FROM inventory WHERE product_id = %s", (product_id,))
-            result = cursor.fetchone()
-            product_name = result[0] if result else f"Product #{product_id}"
-
-            update_query = """
-                UPDATE inventory 
-                SET stock_quantity = stock_quantity + %s,
-                    status = CASE 
-                        WHEN (stock_quantity + %s) <= 0 THEN 'Out of Stock'
-                        WHEN (stock_quantity + %s) <= 10 THEN 'Low Stock'
-                        ELSE 'Available'
-                    END,
-                    updated_at = NOW()
-                WHERE product_id = %s
-            """
-            cursor.execute(update_query, (quantity_change, quantity_change, quantity_change, product_id))
+            if stmt_cache.execute(self.connection, MOVEMENT_BOOKED_QUERY, (key,)).fetchall():
+                return True  # Already booked by an earlier attempt
 
-            log_query = """
-                INSERT INTO stock_transactions 
-                (product_id, transaction_type, quantity, remarks, performed_by, transaction_date)
-                VALUES (%s, %s, %s, %s, %s, NOW())
-            """
-            cursor.execute(log_query, (product_id, transaction_type, abs(quantity_change), remarks, user_id))
+            # Conditional update: a decrement only matches while enough stock is on hand.
+            # The row lock it takes is held just until the commit below.
+            updated = stmt_cache.execute(self.connection, UPDATE_STOCK_QUERY,
+                                         (quantity_change, quantity_change, quantity_change, product_id,
+                                          quantity_change, abs(quantity_change))).rowcount
+            if not updated:
+                self.connection.rollback()
+                found = stmt_cache.execute(self.connection, PRODUCT_EXISTS_QUERY, (product_id,)).fetchall()
+                return INSUFFICIENT_STOCK if found else False
+
+            # Product name for the activity log, stock level before this movement for the KPIs
+            rows = stmt_cache.execute(self.connection, PRODUCT_STOCK_QUERY, (product_id,)).fetchall()
+            product_name, new_qty = rows[0]
+            old_qty = new_qty - quantity_change
+
+            stmt_cache.execute(self.connection, LOG_TRANSACTION_QUERY,
+                               (product_id, transaction_type, abs(quantity_change), remarks, user_id, key))
+            stmt_cache.execute(self.connection, BOOK_MOVEMENT_QUERY, (key,))
 
             # Log Activity
             activity_desc = ""
@@ -103,17 +467,193 @@ class InventoryModel:
             elif transaction_type == 'DEFECT':
                 activity_desc = f"Reported DEFECT: {abs(quantity_change)} units of '{product_name}'"
 
-            if activity_desc:
-                activity_query = """
-                    INSERT INTO activity_log (user_id, activity_description, activity_time)
-                    VALUES (%s, %s, NOW())
-                """
-                cursor.execute(activity_query, (user_id, activity_desc))
+            # Written after commit by the background writer when write-behind is on
+            write_behind = activity_queue.is_enabled()
+            if activity_desc and not write_behind:
+                stmt_cache.execute(self.connection, LOG_ACTIVITY_QUERY, (user_id, activity_desc))
+
+            # Keep dashboard KPI counters in step with this movement
+            deltas = kpi_counters.stock_change_deltas(old_qty, new_qty)
+            if transaction_type == 'DEFECT':
+                deltas['defective_count'] = abs(quantity_change)
+            kpi_counters.apply_deltas(cursor, deltas)
 
             self.connection.commit()
+            kpi_counters.bump_catalogue_version(self.connection)  # Invalidates cached catalogues
+            if activity_desc and write_behind:
+                activity_queue.log(user_id, activity_desc, self.connection)
             return True
-        except Error:
+        except Error as err:
+            if err.errno == db_retry.ER_DUP_ENTRY:
+                self._rollback()
+                return True  # Same idempotency key committed concurrently
+            return self._stock_write_failed(err)
+        finally:
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+    def _rollback(self):
+        try:
             self.connection.rollback()
-            return False
+        except Error:
+            pass  # Connection lost - the pool reconnects it on the next checkout
+
+    def _stock_write_failed(self, err):
+        """Roll back; re-raise deadlocks/timeouts so update_stock retries them"""
+        self._rollback()
+        if db_retry.is_retryable(err):
+            raise err
+        return False
+
+    def update_stock_many(self, lines, user_id):
+        """
+        Apply many stock movements (e.g. a whole delivery) in ONE transaction.
+        lines: list of dicts with product_id, quantity_change (positive for IN,
+        negative for OUT/DEFECT), transaction_type and optional remarks and
+        idempotency_key. Returns one result dict per
+        line, in order: {'product_id', 'success', 'message'}. Unknown products,
+        invalid lines and decrements beyond the stock on hand are rejected
+        individually (their result also has 'rejected': True); lines whose key
+        is already booked succeed as "Already booked"; if the database write
+        fails every line fails (with 'retryable': True when the database was
+        unreachable or lost a lock race, so the same batch may succeed later).
+        """
+        lines = list(lines)
+        results = [{'product_id': l.get('product_id'), 'success': False, 'message': ''} for l in lines]
+        if not lines:
+            return results
+        if not self.connect():
+            for r in results:
+                r['message'] = "Database connection failed"
+                r['retryable'] = True
+            return results
+        try:
+            cursor = self.connection.cursor()
+            self.connection.start_transaction()
+
+            # 1. Lock every product touched by the batch (one round trip, id order avoids deadlocks)
+            ids = sorted({l.get('product_id') for l in lines if l.get('product_id') is not None})
+            current = {}
+            if ids:
+                cursor.execute(f"""
+                    SELECT product_id, product_name, stock_quantity FROM inventory
+                    WHERE product_id IN ({', '.join(['%s'] * len(ids))})
+                    ORDER BY product_id FOR UPDATE
+                """, tuple(ids))
+                current = {row[0]: [row[1], row[2]] for row in cursor.fetchall()}
+            before = {pid: state[1] for pid, state in current.items()}
+
+            # Keys booked by an earlier attempt (e.g. a journal replay whose commit was lost)
+            keys = [l['idempotency_key'] for l in lines if l.get('idempotency_key')]
+            booked = set()
+            if keys:
+                cursor.execute(f"""
+                    SELECT idempotency_key FROM stock_movement_keys
+                    WHERE idempotency_key IN ({', '.join(['%s'] * len(keys))})
+                """, tuple(keys))
+                booked = {row[0] for row in cursor.fetchall()}
+
+            # 2. Validate lines and work out each product's final stock
+            accepted = []
+            for line, result in zip(lines, results):
+                pid = line.get('product_id')
+                qty = _line_quantity(line)
+                if line.get('idempotency_key') in booked:
+                    result['success'] = True
+                    result['message'] = "Already booked"
+                    continue
+                if pid not in current:
+                    result['message'] = "Product not found"
+                elif qty is None:
+                    result['message'] = "Invalid transaction"
+                elif current[pid][1] + qty < 0:
+                    result['message'] = "Insufficient stock"
+                else:
+                    current[pid][1] += qty
+                    accepted.append((line, result, qty))
+                    continue
+                result['rejected'] = True
+            if not accepted:
+                self._rollback()
+                return results
+
+            # 3. One UPDATE for all products, joined to a derived table of new stock levels
+            changed = [pid for pid in ids if pid in current and current[pid][1] != before[pid]]
+            if changed:
+                rows = " UNION ALL ".join(["SELECT %s AS product_id, %s AS new_qty"] * len(changed))
+                params = []
+                for pid in changed:
+                    params.extend([pid, current[pid][1]])
+                cursor.execute(f"""
+                    UPDATE inventory i
+                    JOIN ({rows}) d ON i.product_id = d.product_id
+                    SET i.stock_quantity = d.new_qty,
+                        i.status = CASE
+                            WHEN d.new_qty <= 0 THEN 'Out of Stock'
+                            WHEN d.new_qty <= 10 THEN 'Low Stock'
+                            ELSE 'Available'
+                        END,
+                        i.updated_at = NOW()
+                """, tuple(params))
+
+            # 4. Multi-row INSERTs for the ledger and the activity log
+            txn_params, activity_params = [], []
+            for line, _, qty in accepted:
+                ttype = line['transaction_type']
+                txn_params.extend([line['product_id'], ttype, abs(qty), line.get('remarks', ''), user_id,
+                                   line.get('idempotency_key')])
+                verb = {'IN': "Stock IN", 'OUT': "Stock OUT", 'DEFECT': "Reported DEFECT"}[ttype]
+                activity_params.extend([user_id, f"{verb}: {abs(qty)} units of '{current[line['product_id']][0]}'"])
+            cursor.execute(f"""
+                INSERT INTO stock_transactions
+                (product_id, transaction_type, quantity, remarks, performed_by, transaction_date, idempotency_key)
+                VALUES {', '.join(['(%s, %s, %s, %s, %s, NOW(), %s)'] * len(accepted))}
+            """, tuple(txn_params))
+            new_keys = [line['idempotency_key'] for line, _, _ in accepted if line.get('idempotency_key')]
+            if new_keys:
+                # The primary key refuses a second booking, failing the whole batch
+                cursor.execute(f"""
+                    INSERT INTO stock_movement_keys (idempotency_key, transaction_id, booked_at)
+                    SELECT idempotency_key, transaction_id, NOW() FROM stock_transactions
+                    WHERE idempotency_key IN ({', '.join(['%s'] * len(new_keys))})
+                """, tuple(new_keys))
+            write_behind = activity_queue.is_enabled()
+            if not write_behind:
+                cursor.execute(f"""
+                    INSERT INTO activity_log (user_id, activity_description, activity_time)
+                    VALUES {', '.join(['(%s, %s, NOW())'] * len(accepted))}
+                """, tuple(activity_params))
+
+            # 5. KPI counters: net bucket moves per product plus defect units
+            deltas = {}
+            for pid in changed:
+                for name, d in kpi_counters.stock_change_deltas(before[pid], current[pid][1]).items():
+                    deltas[name] = deltas.get(name, 0) + d
+            defects = sum(abs(qty) for line, _, qty in accepted if line['transaction_type'] == 'DEFECT')
+            if defects:
+                deltas['defective_count'] = defects
+            kpi_counters.apply_deltas(cursor, deltas)
+
+            self.connection.commit()
+            kpi_counters.bump_catalogue_version(self.connection)  # Invalidates cached catalogues
+            if write_behind:
+                for k in range(0, len(activity_params), 2):
+                    activity_queue.log(activity_params[k], activity_params[k + 1], self.connection)
+            for _, result, _ in accepted:
+                result['success'] = True
+                result['message'] = "OK"
+            local_replica.invalidate()
+            return results
+        except Error as err:
+            self._rollback()
+            for r in results:
+                r['success'] = False
+                r['message'] = str(err)
+                r['retryable'] = db_retry.is_retryable(err)
+                r.pop('rejected', None)
+            return results
         finally:
-            if self.connection: self.connection.close()
\ No newline at end of file
+            if self.connection:
+                self.connection.close()
+                self.connection = None
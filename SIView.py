@@ -23,9 +23,12 @@ class InventoryView(QWidget):
     stock_in_clicked = pyqtSignal()
     stock_out_clicked = pyqtSignal()
     defect_clicked = pyqtSignal()
+    load_more_requested = pyqtSignal()
+    defect_history_requested = pyqtSignal(int)  # product_id of a defective summary row
 
     def __init__(self, color_scheme=None):
         super().__init__()
+        self.defective_mode = False
         self.init_ui()
 
     def init_ui(self):
@@ -70,6 +73,15 @@ class InventoryView(QWidget):
             btn_layout.addWidget(btn)
 
         btn_layout.addStretch()
+
+        # Stock movements journaled on this terminal while the database was unavailable
+        self.pending_lbl = QLabel("")
+        self.pending_lbl.setStyleSheet("color: #E65100; font-family: Arial; font-weight: bold; border: none;")
+        btn_layout.addWidget(self.pending_lbl)
+        # "Showing X of Y" for paginated loads
+        self.count_lbl = QLabel("")
+        self.count_lbl.setStyleSheet("color: #757575; font-family: Arial; border: none;")
+        btn_layout.addWidget(self.count_lbl)
         card_layout.addLayout(btn_layout)
 
         self.btn_in.clicked.connect(self.stock_in_clicked.emit)
@@ -88,6 +100,7 @@ class InventoryView(QWidget):
         self.product_table.setFocusPolicy(Qt.FocusPolicy.NoFocus)
 
         self.product_table.cellDoubleClicked.connect(self.handle_cell_double_click)
+        self.product_table.verticalScrollBar().valueChanged.connect(self.handle_scroll)
 
         self.product_table.setStyleSheet("""
             QTableWidget { background-color: transparent; border: none; color: black; font-family: Arial; font-size: 13px; outline: 0; }
@@ -102,16 +115,33 @@ class InventoryView(QWidget):
         main_layout.addWidget(bg)
 
     def handle_cell_double_click(self, row, column):
+        if self.defective_mode:
+            # Drill down into the reports behind this summary row
+            self.defect_history_requested.emit(int(self.product_table.item(row, 0).text()))
+            return
         self.product_table.horizontalHeader().setSectionResizeMode(column, QHeaderView.ResizeMode.ResizeToContents)
 
+    def handle_scroll(self, value):
+        bar = self.product_table.verticalScrollBar()
+        if bar.maximum() > 0 and value >= bar.maximum() - 3:
+            self.load_more_requested.emit()
+
     def load_table(self, products):
+        self.defective_mode = False
         self.product_table.setColumnCount(6)
         self.product_table.setHorizontalHeaderLabels(
             ["Product ID", "Product Name", "Brand", "Model", "Stock", "Status"])
         self.product_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
 
-        self.product_table.setRowCount(len(products))
-        for row, p in enumerate(products):
+        self.product_table.setRowCount(0)
+        self.append_table(products)
+        self.product_table.scrollToTop()
+
+    def append_table(self, products):
+        start = self.product_table.rowCount()
+        self.product_table.setRowCount(start + len(products))
+        for offset, p in enumerate(products):
+            row = start + offset
             self._fill_common_rows(row, p)
             status = p['status']
             status_item = self.make_item(status, True)
@@ -124,22 +154,54 @@ class InventoryView(QWidget):
             self.product_table.setItem(row, 5, status_item)
 
     def load_defective_table(self, products):
-        """Loads defective items view with REASON column (7 columns)"""
-        self.product_table.setColumnCount(7)
+        """Loads the defective summary: one row per product (9 columns)"""
+        self.defective_mode = True
+        self.product_table.setColumnCount(9)
         self.product_table.setHorizontalHeaderLabels(
-            ["Product ID", "Product Name", "Brand", "Model", "Stock", "Status", "Defect Reason"])
+            ["Product ID", "Product Name", "Brand", "Model", "Stock",
+             "Defective Qty", "Reports", "Last Reported", "Last Reason"])
         self.product_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.product_table.horizontalHeader().setSectionResizeMode(6, QHeaderView.ResizeMode.ResizeToContents)
-
-        self.product_table.setRowCount(len(products))
-        for row, p in enumerate(products):
+        # Give reason column more space
+        self.product_table.horizontalHeader().setSectionResizeMode(8, QHeaderView.ResizeMode.ResizeToContents)
+
+        self.product_table.setRowCount(0)
+        self.append_defective_table(products)
+        self.product_table.scrollToTop()
+
+    def append_defective_table(self, products):
+        """Adds the next page of the defective summary"""
+        start = self.product_table.rowCount()
+        self.product_table.setRowCount(start + len(products))
+        for offset, p in enumerate(products):
+            row = start + offset
             self._fill_common_rows(row, p)
-            status_item = self.make_item(p['status'], True)
-            self.product_table.setItem(row, 5, status_item)
-
-            reason_item = self.make_item(p.get('defect_reason', 'N/A'))
-            reason_item.setForeground(QColor("#D32F2F"))
-            self.product_table.setItem(row, 6, reason_item)
+            self.product_table.setItem(row, 5, self.make_item(str(int(p['defective_qty'] or 0)), True))
+            self.product_table.setItem(row, 6, self.make_item(str(p['report_count']), True))
+            self.product_table.setItem(row, 7, self.make_item(str(p['last_reported']), True))
+
+            # Defect Reason (latest report)
+            reason_item = self.make_item(p.get('defect_reason') or 'N/A')
+            reason_item.setForeground(QColor("#D32F2F"))  # Red text for reason
+            self.product_table.setItem(row, 8, reason_item)
+
+    def replace_table(self, products):
+        """Re-fill the table in place after a delta merge, keeping the scroll position"""
+        bar = self.product_table.verticalScrollBar()
+        position = bar.value()
+        self.product_table.setRowCount(0)
+        self.append_table(products)
+        bar.setValue(position)
+
+    def set_product_count(self, shown, total):
+        self.count_lbl.setText(f"Showing {shown} of {total}" if total else "")
+
+    def set_pending_count(self, pending, rejected=0):
+        parts = []
+        if pending:
+            parts.append(f"{pending} pending sync")
+        if rejected:
+            parts.append(f"{rejected} rejected")
+        self.pending_lbl.setText(" · ".join(parts))
 
     def _fill_common_rows(self, row, p):
         self.product_table.setItem(row, 0, self.make_item(str(p['product_id']), True))
@@ -359,4 +421,36 @@ class DefectDialog(BaseTransactionDialog):
                 self.qty.setEnabled(False)
 
     def get_data(self):
-        return self.selected_product_id, self.qty.value(), f"{self.type.currentText()} - {self.desc.toPlainText()}"
\ No newline at end of file
+        return self.selected_product_id, self.qty.value(), f"{self.type.currentText()} - {self.desc.toPlainText()}"
+
+
+class DefectHistoryDialog(QDialog):
+    """Drill-down from the defective summary: every DEFECT report of one product"""
+
+    def __init__(self, product_name, reports, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Defect History")
+        self.resize(640, 420)
+        self.setStyleSheet("""
+            QDialog { background-color: white; }
+            QLabel#Header { color: #0076aa; font-size: 20px; font-weight: bold; }
+            QTableWidget { border: none; color: black; font-family: Arial; font-size: 13px; }
+            QHeaderView::section { background-color: #000000; color: white; padding: 8px; font-weight: bold; border: none; }
+        """)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(20, 20, 20, 20)
+        title_lbl = QLabel(f"{product_name} - {len(reports)} report(s)")
+        title_lbl.setObjectName("Header")
+        layout.addWidget(title_lbl)
+
+        table = QTableWidget(len(reports), 4)
+        table.setHorizontalHeaderLabels(["Date", "Qty", "Reason", "Reported By"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        for row, r in enumerate(reports):
+            table.setItem(row, 0, QTableWidgetItem(str(r.get('formatted_date', ''))))
+            table.setItem(row, 1, QTableWidgetItem(str(r.get('quantity', ''))))
+            table.setItem(row, 2, QTableWidgetItem(r.get('remarks') or 'N/A'))
+            table.setItem(row, 3, QTableWidgetItem(str(r.get('performed_by') or '')))
+        layout.addWidget(table)
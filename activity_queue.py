@@ -0,0 +1,186 @@
+# activity_queue.py
+"""
+Optional write-behind queue for `activity_log` rows.
+
+Activity entries are audit data: the stock update is correct without them.
+With write-behind on, models hand entries to log() AFTER their own commit;
+a background worker writes them in batches with one multi-row INSERT each,
+so the user's transaction no longer pays for the audit row.
+
+    PYESATRAK_ACTIVITY_WRITE_BEHIND=1   turn it on (off by default)
+
+The queue is bounded. When it is full, log() reports the back-pressure and
+writes the entry synchronously on the caller's connection instead, so no
+entry is lost. flush() is called on sign-out and shutdown() at app exit.
+"""
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime
+
+from mysql.connector import Error
+from db_pool import get_connection
+
+QUEUE_SIZE = int(os.environ.get("PYESATRAK_ACTIVITY_QUEUE_SIZE", 1000))
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 1.0  # seconds the worker waits before writing a partial batch
+
+_enabled = os.environ.get("PYESATRAK_ACTIVITY_WRITE_BEHIND", "0") == "1"
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_pending = []                   # batch taken off the queue but not yet written
+_write_lock = threading.Lock()  # one writer at a time (worker or flush)
+_start_lock = threading.Lock()
+_worker = None
+_stopping = threading.Event()
+_stats = {'written': 0, 'back_pressure': 0, 'failed_batches': 0}
+
+INSERT_ROW = "(%s, %s, %s)"
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(on=True):
+    """Switch write-behind on or off at runtime (flushes when turning off)"""
+    global _enabled
+    if not on and _enabled:
+        flush()
+    _enabled = on
+
+
+def log(user_id, description, conn=None):
+    """
+    Queue an activity entry, stamped with the current time.
+    Returns True when queued. If the queue is full the back-pressure is
+    reported and the entry is written and committed right away, on `conn`
+    when given or on a pooled connection otherwise.
+    """
+    entry = (user_id, description, datetime.now())
+    _ensure_worker()
+    try:
+        _queue.put_nowait(entry)
+        return True
+    except queue.Full:
+        _stats['back_pressure'] += 1
+        print(f"Activity queue full ({QUEUE_SIZE} entries) - writing synchronously")
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        if not conn: return False
+        try:
+            _write(conn.cursor(), [entry])
+            conn.commit()
+            _stats['written'] += 1
+        except Error as e:
+            print(f"Error writing activity log: {e}")
+        finally:
+            if own_conn:
+                conn.close()
+        return False
+
+
+def _write(cursor, entries):
+    cursor.execute(f"""
+        INSERT INTO activity_log (user_id, activity_description, activity_time)
+        VALUES {', '.join([INSERT_ROW] * len(entries))}
+    """, tuple(value for entry in entries for value in entry))
+
+
+def _drain(limit):
+    items = []
+    while len(items) < limit:
+        try:
+            items.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return items
+
+
+def _write_pending():
+    """Write whatever is in _pending. Caller holds _write_lock."""
+    if not _pending:
+        return True
+    conn = get_connection()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(_pending), BATCH_SIZE):
+            _write(cursor, _pending[start:start + BATCH_SIZE])
+        conn.commit()
+        _stats['written'] += len(_pending)
+        _pending.clear()
+        return True
+    except Error as e:
+        print(f"Error writing activity log batch: {e}")
+        _stats['failed_batches'] += 1
+        conn.rollback()
+        return False
+    finally:
+        conn.close()
+
+
+def _run():
+    while not _stopping.is_set():
+        with _write_lock:
+            retrying = bool(_pending)
+        if not retrying:
+            try:
+                first = _queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+        with _write_lock:
+            if not retrying:
+                _pending.append(first)
+                _pending.extend(_drain(BATCH_SIZE - 1))
+            # A failed batch is retried on its own: new entries wait on the
+            # bounded queue meanwhile, so producers feel the back-pressure
+            written = _write_pending()
+        if not written:
+            _stopping.wait(FLUSH_INTERVAL)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _start_lock:
+            if _worker is None or not _worker.is_alive():
+                _stopping.clear()
+                _worker = threading.Thread(target=_run, name="activity-log-writer", daemon=True)
+                _worker.start()
+
+
+def flush():
+    """Write every queued entry now, on the calling thread"""
+    with _write_lock:
+        while True:
+            if not _pending:
+                _pending.extend(_drain(QUEUE_SIZE))
+            if not _pending:
+                return True
+            if not _write_pending():
+                print(f"Activity log: {len(_pending)} entries could not be written")
+                return False
+
+
+def shutdown():
+    """Stop the worker and flush. Registered with atexit, also called by Main."""
+    _stopping.set()
+    if _worker is not None:
+        _worker.join(timeout=FLUSH_INTERVAL * 2)
+    return flush()
+
+
+def stats():
+    return {
+        'queued': _queue.qsize(),
+        'pending': len(_pending),
+        'written': _stats['written'],
+        'back_pressure': _stats['back_pressure'],
+        'failed_batches': _stats['failed_batches'],
+    }
+
+
+atexit.register(shutdown)
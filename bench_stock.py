@@ -0,0 +1,78 @@
+# bench_stock.py
+"""
+Latency of one stock movement: sp_update_stock vs the per-statement path.
+
+    python bench_stock.py PRODUCT_ID [MOVEMENTS]
+
+Runs MOVEMENTS stock movements (alternating IN +1 / OUT -1, so the stock
+level ends where it started) through InventoryModel.update_stock on each
+path and prints the average latency and client statements per movement.
+Statements are counted from the server's global `Questions` counter, so run
+it on a quiet (development) database. The ledger and activity rows it writes
+are marked with the remark 'benchmark'. On the SQLite backend only the
+per-statement path exists and statements are counted in this process.
+"""
+import sys
+import time
+
+from mysql.connector import Error
+from db_pool import get_connection, using_sqlite
+import SIModel
+
+
+def _questions():
+    conn = get_connection()
+    if not conn: return 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+        return int(cursor.fetchone()[1])
+    finally:
+        conn.close()
+
+
+def run(product_id, movements, use_routine):
+    SIModel.STOCK_ROUTINE = use_routine
+    model = SIModel.InventoryModel()
+    model.update_stock(product_id, 1, 'IN', 'benchmark', 1)  # warm up (prepares statements)
+
+    before = _questions()
+    started = time.perf_counter()
+    for i in range(movements):
+        if i % 2 == 0:
+            model.update_stock(product_id, 1, 'IN', 'benchmark', 1)
+        else:
+            model.update_stock(product_id, -1, 'OUT', 'benchmark', 1)
+    elapsed = time.perf_counter() - started
+    # Minus the two status reads themselves
+    statements = _questions() - before - 1
+
+    model.update_stock(product_id, -1, 'OUT', 'benchmark', 1)  # undo the warm up
+    return elapsed / movements * 1000, statements / movements
+
+
+def main(argv):
+    if not argv:
+        print("Usage: python bench_stock.py PRODUCT_ID [MOVEMENTS]")
+        return 1
+    product_id = int(argv[0])
+    movements = int(argv[1]) if len(argv) > 1 else 200
+    try:
+        print(f"{movements} movements on product #{product_id}")
+        for label, use_routine in (("per-statement", False), ("sp_update_stock", True)):
+            if use_routine and using_sqlite():
+                continue
+            ms, statements = run(product_id, movements, use_routine)
+            if use_routine and not SIModel.STOCK_ROUTINE:
+                print("  sp_update_stock is not installed - run: python -m migrate")
+                return 1
+            print(f"  {label:<16} {ms:7.2f} ms/movement  {statements:4.1f} statements/movement")
+        print("  (statement counts include the pool's ROLLBACK on checkout)")
+        return 0
+    except Error as e:
+        print(f"Benchmark Error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
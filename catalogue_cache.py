@@ -0,0 +1,81 @@
+# catalogue_cache.py
+"""
+In-process read-through cache for product listings.
+
+Every write to inventory bumps the `catalogue_version` row in kpi_counters
+right after it commits. Before serving a cached listing, cached() reads that
+one row (a primary-key lookup); only when the version moved is the listing
+fetched again. Dialogs and reloads that follow no change cost one tiny query.
+"""
+import threading
+
+from mysql.connector import Error
+from db_pool import get_connection
+import kpi_counters
+import stmt_cache
+
+# Listings kept (filters x pages) before the oldest is dropped
+MAX_ENTRIES = 64
+
+VERSION_QUERY = "SELECT counter_value FROM kpi_counters WHERE counter_name = %s"
+
+_entries = {}  # key -> (version, value)
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def current_version():
+    """The catalogue version stamp, or None if it cannot be read"""
+    conn = get_connection()
+    if not conn: return None
+    try:
+        rows = stmt_cache.execute(conn, VERSION_QUERY, (kpi_counters.CATALOGUE_VERSION,)).fetchall()
+        return rows[0][0] if rows else None
+    except Error as e:
+        print(f"Error reading catalogue version: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def cached(key, loader):
+    """
+    Value for `key`, reusing the cached one while the catalogue version is
+    unchanged; otherwise loader() is called and its result stored.
+    Empty results are not cached (they may be a failed query).
+    """
+    version = current_version()
+    if version is not None:
+        with _lock:
+            entry = _entries.get(key)
+            if entry and entry[0] == version:
+                _stats['hits'] += 1
+                return _copy(entry[1])
+    with _lock:
+        _stats['misses'] += 1
+
+    # Version is read BEFORE loading: a write in between only makes the
+    # stored entry look older than it is, so it is refetched next time
+    value = loader()
+    if version is not None and value:
+        with _lock:
+            _entries.pop(key, None)
+            _entries[key] = (version, value)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.pop(next(iter(_entries)))
+    return _copy(value)
+
+
+def _copy(value):
+    # Callers get their own list; the row dicts are shared and treated as read-only
+    return list(value) if isinstance(value, list) else value
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def stats():
+    with _lock:
+        return {'hits': _stats['hits'], 'misses': _stats['misses'], 'entries': len(_entries)}
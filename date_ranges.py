@@ -0,0 +1,76 @@
+# date_ranges.py
+"""
+Half-open datetime bounds for date-bucketed queries.
+
+Always filter as `col >= %s AND col < %s` with these bounds instead of
+`DATE(col) = CURDATE()` or `BETWEEN 'x 00:00:00' AND 'y 23:59:59'`:
+wrapping the column in a function rules out its index, and BETWEEN drops
+rows stamped in the last second of the day.
+
+Check that the stock-flow query still uses an index range scan:
+    python date_ranges.py --explain
+"""
+import sys
+from datetime import date, datetime, timedelta
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value), "%Y-%m-%d").date()
+
+
+def date_range(start, end):
+    """(start 00:00:00, day after end 00:00:00) for inclusive report dates 'YYYY-MM-DD'"""
+    lower = _as_date(start)
+    upper = _as_date(end) + timedelta(days=1)
+    return lower.strftime(DATETIME_FORMAT), upper.strftime(DATETIME_FORMAT)
+
+
+def today_range():
+    """(today 00:00:00, tomorrow 00:00:00)"""
+    today = date.today()
+    return date_range(today, today)
+
+
+def explain_stock_flow(conn):
+    """
+    EXPLAIN today's stock flow as the dashboards run it (rollup rows plus the
+    unfolded ledger tail, stock_rollup.MOVEMENT_TOTALS_QUERY).
+    Returns (ok, plan_rows); ok is True when the ledger tail is read with an
+    index range scan rather than a full table scan.
+    """
+    import stock_rollup  # stock_rollup imports this module
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + stock_rollup.MOVEMENT_TOTALS_QUERY, stock_rollup.today_params())
+    plan = cursor.fetchall()
+    ok = any(row.get('table') == 't' and row.get('type') == 'range' and row.get('key') for row in plan)
+    return ok, plan
+
+
+if __name__ == "__main__":
+    if "--explain" not in sys.argv:
+        print("Usage: python date_ranges.py --explain")
+        sys.exit(1)
+
+    from db_pool import get_connection
+
+    conn = get_connection()
+    if not conn:
+        sys.exit(1)
+    try:
+        ok, plan = explain_stock_flow(conn)
+    finally:
+        conn.close()
+    for row in plan:
+        print(f"  table={row.get('table')} type={row.get('type')} key={row.get('key')} rows={row.get('rows')}")
+    if ok:
+        print("✓ stock flow uses an index range scan")
+    else:
+        print("✗ stock flow is NOT using an index range scan on transaction_date")
+        sys.exit(1)
@@ -0,0 +1,136 @@
+# db_pool.py
+import os
+import time
+import threading
+
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
+
+import sqlite_backend
+
+# Shared connection settings for every model
+DB_CONFIG = {
+    'host': '127.0.0.1',
+    'database': 'pyesatrak',
+    'user': 'root',
+    'password': ''
+}
+
+# "mysql" (server) or "sqlite" (embedded file database, see sqlite_backend.py)
+BACKEND = os.environ.get("PYESATRAK_DB_BACKEND", "mysql").lower()
+SQLITE_PATH = os.environ.get("PYESATRAK_SQLITE_PATH", "pyesatrak.db")
+
+POOL_NAME = "pyesatrak_pool"
+POOL_SIZE = int(os.environ.get("PYESATRAK_POOL_SIZE", 5))
+CHECKOUT_TIMEOUT = float(os.environ.get("PYESATRAK_POOL_TIMEOUT", 5))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(pool_size=None, backend=None, sqlite_path=None, **db_overrides):
+    """
+    Change pool size, storage backend or connection settings.
+    Only takes effect before the pool is created (i.e. before warm_up()).
+    """
+    global POOL_SIZE, BACKEND, SQLITE_PATH
+    if _pool is not None:
+        print("DB Pool: already started, configuration unchanged")
+        return False
+    if pool_size:
+        POOL_SIZE = int(pool_size)
+    if backend:
+        BACKEND = backend.lower()
+    if sqlite_path:
+        SQLITE_PATH = sqlite_path
+    DB_CONFIG.update(db_overrides)
+    return True
+
+
+def using_sqlite():
+    return BACKEND == "sqlite"
+
+
+def get_pool():
+    """Create the process-wide pool on first use (opens POOL_SIZE connections)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None and using_sqlite():
+                _pool = sqlite_backend.SQLitePool(SQLITE_PATH, POOL_SIZE)
+            elif _pool is None:
+                # Sessions are NOT reset on return so server-side prepared
+                # statements (stmt_cache.py) survive between checkouts;
+                # _validate() rolls back whatever the last borrower left open.
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=False,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+def warm_up():
+    """Open all pooled connections up front. Called once at app start."""
+    try:
+        get_pool()
+        print(f"DB Pool: {POOL_SIZE} {BACKEND} connections ready")
+        return True
+    except Error as e:
+        print(f"DB Pool Error: {e}")
+        return False
+
+
+def _validate(conn):
+    """
+    Make sure a borrowed connection is still alive, reconnecting once if not.
+    The ROLLBACK doubles as the liveness check and ends any read snapshot
+    the previous borrower left open, so every checkout sees fresh data.
+    """
+    try:
+        conn.rollback()
+        return True
+    except Error:
+        pass
+    try:
+        conn.reconnect(attempts=1, delay=0)
+        return True
+    except Error as e:
+        print(f"DB Pool: dropping dead connection ({e})")
+        try:
+            conn.close()
+        except Error:
+            pass
+        return False
+
+
+def get_connection():
+    """
+    Borrow a validated connection from the pool.
+    Calling close() on it returns it to the pool.
+    Returns None if the database is unreachable or the pool stays exhausted.
+    """
+    deadline = time.monotonic() + CHECKOUT_TIMEOUT
+    delay = 0.05
+    while True:
+        try:
+            conn = get_pool().get_connection()
+        except PoolError as e:
+            # Pool exhausted - wait for another model to give one back
+            if time.monotonic() >= deadline:
+                print(f"DB Pool Error: {e}")
+                return None
+            time.sleep(0.05)
+            continue
+        except Error as e:
+            print(f"DB Error: {e}")
+            return None
+
+        if _validate(conn):
+            return conn
+        if time.monotonic() >= deadline:
+            return None
+        # Server unreachable - back off before the next reconnect attempt
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        delay = min(delay * 2, 1.0)
@@ -0,0 +1,76 @@
+# db_retry.py
+"""
+Retry helper for stock writes that lose a lock race.
+
+Deadlocks (1213) and lock-wait timeouts (1205) roll the transaction back,
+so simply running it again is safe. A dropped connection during COMMIT
+(2006 / 2013) is ambiguous - the write may or may not have landed - so it is
+only retried because every stock movement carries an idempotency key that
+the database refuses to book twice (stock_movement_keys, migrate.py
+version 10).
+"""
+import random
+import time
+import uuid
+
+from mysql.connector import Error
+
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+ER_DUP_ENTRY = 1062
+CR_SERVER_GONE_ERROR = 2006
+CR_SERVER_LOST = 2013
+
+RETRYABLE_ERRORS = (ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT, CR_SERVER_GONE_ERROR, CR_SERVER_LOST)
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.05  # seconds; doubles per attempt
+MAX_DELAY = 1.0
+
+
+class Unavailable:
+    """Stock write result when the database could not be reached or kept failing (falsy, like a failure)"""
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "UNAVAILABLE"
+
+
+UNAVAILABLE = Unavailable()
+
+
+def new_key():
+    """Client-generated idempotency key for one stock movement"""
+    return str(uuid.uuid4())
+
+
+def is_retryable(err):
+    return isinstance(err, Error) and err.errno in RETRYABLE_ERRORS
+
+
+def backoff(attempt):
+    """Sleep with full jitter so colliding terminals spread out (attempt starts at 1)"""
+    time.sleep(random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** (attempt - 1))))
+
+
+def with_retry(operation, label):
+    """
+    Run operation() until it returns, retrying retryable MySQL errors with
+    jittered backoff. operation must roll back and re-raise those errors.
+    Returns UNAVAILABLE (falsy) once the attempts are used up, so callers
+    can tell a database stall from a refused movement (stock_journal.py).
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return operation()
+        except Error as err:
+            if not is_retryable(err):
+                raise
+            if attempt == MAX_ATTEMPTS:
+                print(f"{label} failed after {attempt} attempts: {err}")
+                return UNAVAILABLE
+            print(f"{label}: {err.msg} (errno {err.errno}) - retrying")
+            backoff(attempt)
+    return UNAVAILABLE
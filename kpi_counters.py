@@ -0,0 +1,151 @@
+# kpi_counters.py
+"""
+Pre-computed dashboard KPIs stored in the `kpi_counters` table.
+
+update_stock / add_new_product adjust these rows in the SAME transaction as
+the stock change, so the dashboards read four rows instead of scanning
+`inventory` and summing `stock_transactions`.
+
+The extra `catalogue_version` row is bumped by every write to inventory;
+catalogue_cache.py compares it to decide whether its cached product lists
+are still current. Stock movements bump it in a transaction of its own
+AFTER they commit (bump_catalogue_version), so terminals do not queue on
+that one row's lock. `user_directory_version` is bumped
+by every write to users, for copies of the user directory (local_replica.py).
+
+Rebuild from scratch (e.g. after manual DB edits):
+    python kpi_counters.py --rebuild
+"""
+import sys
+
+from mysql.connector import Error
+from db_pool import get_connection
+
+COUNTER_NAMES = ('total_products', 'low_stock_count', 'out_of_stock_count', 'defective_count')
+CATALOGUE_VERSION = 'catalogue_version'
+USER_DIRECTORY_VERSION = 'user_directory_version'
+ER_NO_SUCH_TABLE = 1146
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS kpi_counters (
+        counter_name VARCHAR(50) NOT NULL PRIMARY KEY,
+        counter_value BIGINT NOT NULL DEFAULT 0,
+        updated_at DATETIME NULL
+    )
+"""
+
+
+def stock_bucket(qty):
+    """Which stock KPI a quantity falls under (same rules as the dashboard counts)"""
+    if qty == 0:
+        return 'out_of_stock_count'
+    if 0 < qty <= 10:
+        return 'low_stock_count'
+    return None
+
+
+def stock_change_deltas(old_qty, new_qty):
+    """Counter deltas caused by a product's stock moving from old_qty to new_qty"""
+    deltas = {}
+    old_bucket, new_bucket = stock_bucket(old_qty), stock_bucket(new_qty)
+    if old_bucket != new_bucket:
+        if old_bucket:
+            deltas[old_bucket] = deltas.get(old_bucket, 0) - 1
+        if new_bucket:
+            deltas[new_bucket] = deltas.get(new_bucket, 0) + 1
+    return deltas
+
+
+def apply_deltas(cursor, deltas):
+    """
+    Add deltas to the counter rows using the caller's cursor,
+    so the change commits or rolls back with the stock update.
+    """
+    deltas = {name: d for name, d in deltas.items() if d}
+    if not deltas:
+        return
+    cases = " ".join("WHEN %s THEN %s" for _ in deltas)
+    placeholders = ", ".join(["%s"] * len(deltas))
+    query = f"""
+        UPDATE kpi_counters
+        SET counter_value = counter_value + CASE counter_name {cases} ELSE 0 END,
+            updated_at = NOW()
+        WHERE counter_name IN ({placeholders})
+    """
+    params = []
+    for name, d in deltas.items():
+        params.extend([name, d])
+    params.extend(deltas.keys())
+    cursor.execute(query, tuple(params))
+
+
+def bump_catalogue_version(conn):
+    """
+    Move the catalogue stamp in its own short transaction, after the caller
+    committed its change. A bump lost here (connection dropped) leaves
+    cached catalogues stale until the next write moves the stamp again.
+    """
+    try:
+        conn.cursor().execute("""
+            UPDATE kpi_counters SET counter_value = counter_value + 1, updated_at = NOW()
+            WHERE counter_name = %s
+        """, (CATALOGUE_VERSION,))
+        conn.commit()
+    except Error as e:
+        print(f"Error bumping catalogue version: {e}")
+
+
+def rebuild(conn=None):
+    """
+    Recompute every counter from inventory / stock_transactions.
+    Run while terminals are idle; movements committed mid-rebuild may be missed.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    if not conn: return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_TABLE)
+        conn.start_transaction()
+        cursor.execute(
+            f"DELETE FROM kpi_counters WHERE counter_name IN ({', '.join(['%s'] * len(COUNTER_NAMES))})",
+            COUNTER_NAMES
+        )
+        cursor.execute("""
+            INSERT INTO kpi_counters (counter_name, counter_value, updated_at)
+            SELECT 'total_products', COUNT(*), NOW() FROM inventory
+            UNION ALL
+            SELECT 'low_stock_count', COUNT(*), NOW() FROM inventory
+            WHERE stock_quantity <= 10 AND stock_quantity > 0
+            UNION ALL
+            SELECT 'out_of_stock_count', COUNT(*), NOW() FROM inventory
+            WHERE stock_quantity = 0
+            UNION ALL
+            SELECT 'defective_count', COALESCE(SUM(quantity), 0), NOW() FROM stock_transactions
+            WHERE transaction_type = 'DEFECT'
+        """)
+        # Manual edits may have changed products too: invalidate cached catalogues
+        cursor.execute("""
+            INSERT INTO kpi_counters (counter_name, counter_value, updated_at) VALUES (%s, 1, NOW())
+            ON DUPLICATE KEY UPDATE counter_value = counter_value + 1, updated_at = NOW()
+        """, (CATALOGUE_VERSION,))
+        conn.commit()
+        return True
+    except Error as e:
+        print(f"Error rebuilding KPI counters: {e}")
+        conn.rollback()
+        return False
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    if "--rebuild" not in sys.argv:
+        print("Usage: python kpi_counters.py --rebuild")
+        sys.exit(1)
+    if rebuild():
+        print("✓ KPI counters rebuilt")
+    else:
+        sys.exit(1)
@@ -0,0 +1,398 @@
+# local_replica.py
+"""
+Optional local SQLite mirror of `inventory` and the user directory for
+staff terminals.
+
+    PYESATRAK_LOCAL_REPLICA=replica.db python Main.py
+    python local_replica.py --sync | --status
+
+With the mirror on, InventoryModel reads products and ManageUsersModel
+reads the user directory from the local file (through sqlite_backend, so
+their queries run unchanged); stock movements and every other write still
+go to the primary. Reads only open the local file, and go to the primary
+instead until this session's first sync has finished (a file left by an
+earlier session may be any age).
+
+A background thread keeps it current with one primary-key lookup per
+POLL_INTERVAL: the catalogue_version and user_directory_version rows in
+kpi_counters. After this terminal writes, invalidate() wakes the thread
+without waiting for it; reads go to the primary until that sync is done, so
+they show the write.
+Only when a version moved is anything copied:
+- inventory: rows with updated_at at or after the mark plus tombstones from
+  inventory_deletions, with the same overlap as SIModel delta sync;
+- users: the whole directory (a few dozen rows; passwords are never copied).
+A delta is also fetched every MAX_STALE_SECONDS to pick up manual edits
+that bypass the version stamps. While the primary is unreachable, reads
+carry on from the last synced state.
+"""
+import os
+import sys
+import threading
+import time
+
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+from db_pool import get_connection as get_primary_connection
+import kpi_counters
+import sqlite_backend
+
+REPLICA_PATH = os.environ.get("PYESATRAK_LOCAL_REPLICA", "")
+POOL_SIZE = 3
+POLL_INTERVAL = 2.0        # seconds between version checks against the primary
+MAX_STALE_SECONDS = 300    # fetch an inventory delta at least this often
+SYNC_OVERLAP_SECONDS = 60  # same overlap as SIModel delta sync (covers the lock wait timeout)
+FETCH_BATCH = 1000         # rows copied per round trip
+
+INVENTORY_COLUMNS = ("product_id", "product_name", "brand", "model", "description",
+                     "stock_quantity", "status", "created_at", "updated_at")
+USER_COLUMNS = ("user_id", "userFname", "userMname", "userLname", "username", "role", "status")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS inventory (
+        product_id INTEGER PRIMARY KEY,
+        product_name VARCHAR(255) NOT NULL COLLATE NOCASE,
+        brand VARCHAR(100) NULL COLLATE NOCASE,
+        model VARCHAR(100) NULL COLLATE NOCASE,
+        description TEXT NULL,
+        stock_quantity INT NOT NULL DEFAULT 0,
+        status VARCHAR(30) NULL COLLATE NOCASE,
+        created_at DATETIME NULL,
+        updated_at DATETIME NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_inventory_stock ON inventory (stock_quantity);
+    CREATE INDEX IF NOT EXISTS ix_inventory_updated ON inventory (updated_at);
+
+    CREATE TABLE IF NOT EXISTS inventory_deletions (
+        product_id INT NOT NULL PRIMARY KEY,
+        deleted_at DATETIME NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_deletions_time ON inventory_deletions (deleted_at);
+
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        userFname VARCHAR(100) NOT NULL COLLATE NOCASE,
+        userMname VARCHAR(100) NULL COLLATE NOCASE,
+        userLname VARCHAR(100) NOT NULL COLLATE NOCASE,
+        username VARCHAR(50) NOT NULL COLLATE NOCASE,
+        role VARCHAR(20) NOT NULL COLLATE NOCASE,
+        status VARCHAR(20) NOT NULL COLLATE NOCASE
+    );
+
+    -- Per synced table: the primary's version stamp and (inventory) delta mark
+    CREATE TABLE IF NOT EXISTS replica_state (
+        name VARCHAR(50) NOT NULL PRIMARY KEY,
+        version BIGINT NULL,
+        mark DATETIME NULL
+    );
+"""
+
+VERSIONS_QUERY = "SELECT counter_name, counter_value FROM kpi_counters WHERE counter_name IN (%s, %s)"
+MARK_QUERY = "SELECT NOW() - INTERVAL %s SECOND"
+INVENTORY_QUERY = f"SELECT {', '.join(INVENTORY_COLUMNS)} FROM inventory"
+DELETIONS_QUERY = "SELECT product_id, deleted_at FROM inventory_deletions WHERE deleted_at >= %s"
+USERS_QUERY = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+
+_pool = None
+_pool_lock = threading.Lock()
+_sync_lock = threading.Lock()   # one sync at a time
+_last_delta = 0.0
+_ready = threading.Event()      # synced at least once in this session
+_worker = None
+_start_lock = threading.Lock()
+_stopping = threading.Event()
+_cond = threading.Condition()   # guards _requested / _completed
+_requested = 0                  # syncs asked for by invalidate()
+_completed = 0                  # requests covered by a finished sync
+_stats = {'polls': 0, 'inventory_rows': 0, 'user_syncs': 0, 'failed': 0}
+
+
+def configure(path):
+    """Turn the mirror on (file path) or off (None). Only before the first read."""
+    global REPLICA_PATH
+    if _pool is not None:
+        print("Local replica: already open, configuration unchanged")
+        return False
+    REPLICA_PATH = path or ""
+    return True
+
+
+def is_enabled():
+    return bool(REPLICA_PATH)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = sqlite_backend.SQLitePool(REPLICA_PATH, POOL_SIZE)
+                conn = pool.get_connection()
+                try:
+                    conn.executescript(SCHEMA)
+                finally:
+                    conn.close()
+                _pool = pool
+    return _pool
+
+
+def _read_state(cursor):
+    cursor.execute("SELECT name, version, mark FROM replica_state")
+    return {name: (version, mark) for name, version, mark in cursor.fetchall()}
+
+
+def _write_state(cursor, name, version, mark=None):
+    cursor.execute("REPLACE INTO replica_state (name, version, mark) VALUES (%s, %s, %s)",
+                   (name, version, mark))
+
+
+def _copy(primary, query, params, local_cursor, table, columns):
+    """Stream query's rows from the primary into the local table. Returns the row count."""
+    cursor = primary.cursor(buffered=False)
+    cursor.execute(query, params)
+    insert = f"REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    copied = 0
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH)
+        if not batch:
+            break
+        local_cursor.executemany(insert, batch)
+        copied += len(batch)
+    cursor.close()
+    return copied
+
+
+def _sync_inventory(primary, local_cursor, mark):
+    """Full copy when mark is None, otherwise the delta since mark. Returns the new mark."""
+    cursor = primary.cursor()
+    # Taken BEFORE reading rows, like SIModel.get_products_changed_since
+    cursor.execute(MARK_QUERY, (SYNC_OVERLAP_SECONDS,))
+    new_mark = cursor.fetchone()[0]
+    if mark is None:
+        local_cursor.execute("DELETE FROM inventory")
+        copied = _copy(primary, INVENTORY_QUERY, (), local_cursor, "inventory", INVENTORY_COLUMNS)
+    else:
+        copied = _copy(primary, INVENTORY_QUERY + " WHERE updated_at >= %s", (mark,),
+                       local_cursor, "inventory", INVENTORY_COLUMNS)
+        cursor.execute(DELETIONS_QUERY, (mark,))
+        deleted = cursor.fetchall()
+        if deleted:
+            local_cursor.executemany("DELETE FROM inventory WHERE product_id = %s", [(pid,) for pid, _ in deleted])
+            local_cursor.executemany("REPLACE INTO inventory_deletions (product_id, deleted_at) VALUES (%s, %s)",
+                                     deleted)
+    _stats['inventory_rows'] += copied
+    return new_mark
+
+
+def _sync(force=False):
+    global _last_delta
+    primary = get_primary_connection()
+    if not primary:
+        _stats['failed'] += 1
+        return False
+    local = None
+    try:
+        cursor = primary.cursor()
+        # Versions are read BEFORE copying: a write in between only makes the
+        # stored version look older than the rows, so it is copied again
+        cursor.execute(VERSIONS_QUERY, (kpi_counters.CATALOGUE_VERSION, kpi_counters.USER_DIRECTORY_VERSION))
+        versions = dict(cursor.fetchall())
+        _stats['polls'] += 1
+
+        local = _get_pool().get_connection()
+        local_cursor = local.cursor()
+        state = _read_state(local_cursor)
+        local.start_transaction()
+
+        inventory_version, mark = state.get(kpi_counters.CATALOGUE_VERSION, (None, None))
+        stale = time.monotonic() - _last_delta >= MAX_STALE_SECONDS
+        if force or stale or mark is None or inventory_version != versions.get(kpi_counters.CATALOGUE_VERSION):
+            mark = _sync_inventory(primary, local_cursor, mark)
+            _write_state(local_cursor, kpi_counters.CATALOGUE_VERSION,
+                         versions.get(kpi_counters.CATALOGUE_VERSION), mark)
+            _last_delta = time.monotonic()
+
+        users = state.get(kpi_counters.USER_DIRECTORY_VERSION)
+        if force or users is None or users[0] != versions.get(kpi_counters.USER_DIRECTORY_VERSION):
+            local_cursor.execute("DELETE FROM users")
+            _copy(primary, USERS_QUERY, (), local_cursor, "users", USER_COLUMNS)
+            _write_state(local_cursor, kpi_counters.USER_DIRECTORY_VERSION,
+                         versions.get(kpi_counters.USER_DIRECTORY_VERSION))
+            _stats['user_syncs'] += 1
+
+        local.commit()
+        _ready.set()
+        return True
+    except Error as e:
+        print(f"Local replica sync failed: {e}")
+        _stats['failed'] += 1
+        if local:
+            local.rollback()
+        return False
+    finally:
+        primary.close()
+        if local:
+            local.close()
+
+
+def sync(force=False):
+    """
+    Bring the mirror up to date with the primary (force=True fetches both
+    tables even if their versions did not move). Returns False if the
+    primary could not be read.
+    """
+    with _sync_lock:
+        return _sync(force)
+
+
+def _run():
+    global _completed
+    while not _stopping.is_set():
+        with _cond:
+            target = _requested
+        try:
+            sync()
+        except Exception as e:  # keep the thread alive; the next poll retries
+            print(f"Local replica sync failed: {e}")
+        with _cond:
+            # Requests made before this sync started are covered by it
+            _completed = target
+            _cond.notify_all()
+            if _requested == _completed and not _stopping.is_set():
+                _cond.wait(POLL_INTERVAL)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _start_lock:
+            if _worker is None or not _worker.is_alive():
+                _stopping.clear()
+                _worker = threading.Thread(target=_run, name="local-replica-sync", daemon=True)
+                _worker.start()
+
+
+def start():
+    """Open the mirror and start syncing it in the background (no-op when the mirror is off)"""
+    if not is_enabled():
+        return
+    try:
+        _get_pool()
+    except Error as e:
+        print(f"Local replica unavailable: {e}")
+        return
+    _ensure_worker()
+
+
+def shutdown():
+    """Stop the background sync (a sync in progress finishes first)"""
+    _stopping.set()
+    with _cond:
+        _cond.notify_all()
+    if _worker is not None:
+        _worker.join(timeout=POLL_INTERVAL * 2)
+
+
+def invalidate():
+    """Sync now (called after this terminal writes); reads use the primary until it is done"""
+    global _requested
+    if not is_enabled() or _pool is None:
+        return
+    _ensure_worker()
+    with _cond:
+        _requested += 1
+        _cond.notify_all()
+
+
+def _caught_up():
+    """True once every sync asked for by invalidate() has finished"""
+    with _cond:
+        return _completed >= _requested
+
+
+def get_connection():
+    """
+    A mirror connection for reads; close() hands it back. Never contacts
+    the primary. None when the mirror is off or cannot be opened, before
+    this session's first sync, and while a sync after a local write is due.
+    """
+    if not is_enabled():
+        return None
+    try:
+        _get_pool()
+    except Error as e:
+        print(f"Local replica unavailable: {e}")
+        return None
+    _ensure_worker()
+    if not _ready.is_set() or not _caught_up():
+        return None
+    try:
+        return _get_pool().get_connection()
+    except PoolError:
+        return None
+
+
+def inventory_mark(cursor):
+    """
+    The mirror's inventory delta mark (primary clock), for delta sync of
+    screens reading the mirror: every change before it has been copied.
+    """
+    cursor.execute("SELECT mark FROM replica_state WHERE name = %s", (kpi_counters.CATALOGUE_VERSION,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def user_directory_version():
+    """The user_directory_version the mirrored users were copied at, None if unavailable"""
+    conn = get_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM replica_state WHERE name = %s", (kpi_counters.USER_DIRECTORY_VERSION,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except Error as e:
+        print(f"Error reading local user directory version: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def user_directory():
+    """Every user (no passwords) from the mirror, newest first; None if unavailable"""
+    conn = get_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(USERS_QUERY + " ORDER BY user_id DESC")
+        return cursor.fetchall()
+    except Error as e:
+        print(f"Error reading local user directory: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def stats():
+    return dict(_stats)
+
+
+if __name__ == "__main__":
+    if not is_enabled() or not ({"--sync", "--status"} & set(sys.argv)):
+        print("Usage: PYESATRAK_LOCAL_REPLICA=replica.db python local_replica.py --sync | --status")
+        sys.exit(1)
+    if "--sync" in sys.argv:
+        started = time.perf_counter()
+        if not sync(force=True):
+            sys.exit(1)
+        print(f"✓ Replica synced in {time.perf_counter() - started:.1f}s: {stats()}")
+    conn = _get_pool().get_connection()
+    try:
+        cursor = conn.cursor()
+        for table in ("inventory", "users"):
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            print(f"  {table:<10} {cursor.fetchone()[0]} row(s)")
+        for name, (version, mark) in _read_state(cursor).items():
+            print(f"  {name:<25} version={version} mark={mark}")
+    finally:
+        conn.close()
@@ -1,6 +1,21 @@
 # login_model.py
-import mysql.connector
 from mysql.connector import Error
+from db_pool import get_connection
+
+# Uses ux_users_username (checked by python -m migrate --explain)
+LOGIN_QUERY = """
+    SELECT user_id, 
+           username, 
+           password, 
+           userFname, 
+           userMname,
+           userLname, 
+           role, 
+           status
+    FROM users
+    WHERE username = %s 
+      AND status = 'Active'
+"""
 
 
 class LoginModel:
@@ -14,17 +29,10 @@ class LoginModel:
 
     def connect_to_database(self):
         """Establish connection to MySQL database"""
-        try:
-            self.connection = mysql.connector.connect(
-                host='127.0.0.1',
-                database='pyesatrak',
-                user='root',
-                password=''
-            )
-            if self.connection.is_connected():
-                return True, "Connected to database"
-        except Error as e:
-            return False, f"Database connection error: {str(e)}"
+        # Borrowed from the shared pool; connection.close() hands it back
+        self.connection = get_connection()
+        if self.connection:
+            return True, "Connected to database"
         return False, "Unable to connect to database"
 
     def validate_credentials(self, username, password):
@@ -44,21 +52,7 @@ class LoginModel:
             cursor = self.connection.cursor(dictionary=True)
 
             # Query to get user by username
-            query = """
-                SELECT user_id, 
-                       username, 
-                       password, 
-                       userFname, 
-                       userMname,
-                       userLname, 
-                       role, 
-                       status
-                FROM users
-                WHERE username = %s 
-                  AND status = 'Active'
-            """
-
-            cursor.execute(query, (username,))
+            cursor.execute(LOGIN_QUERY, (username,))
             user = cursor.fetchone()
             cursor.close()
 
@@ -97,8 +91,9 @@ class LoginModel:
             print(f"Database error during login: {e}")
             return False, f"Database error: {str(e)}", None
         finally:
-            if self.connection and self.connection.is_connected():
+            if self.connection:
                 self.connection.close()
+                self.connection = None
 
     def reset_credentials(self):
         """Clear stored credentials"""
@@ -107,6 +102,7 @@ class LoginModel:
         self.user_data = None
 
     def __del__(self):
-        """Cleanup database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
\ No newline at end of file
+        """Return any borrowed connection to the pool"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
\ No newline at end of file
@@ -0,0 +1,1018 @@
+# migrate.py
+"""
+Versioned schema migrations for the pyesatrak database.
+
+    python -m migrate            apply every pending migration
+    python -m migrate --status   list applied / pending versions
+    python -m migrate --explain  EXPLAIN the hot queries and check their indexes
+
+Each migration is (version, name, steps). A step is either a DDL string,
+an index tuple ('index', table, index_name, columns, unique) or a column
+tuple ('column', table, column, definition). Index steps are skipped when
+the table already has an index on the same leading columns (a UNIQUE one
+on exactly those columns, for unique steps), and column steps
+when the column exists, so hand-built databases converge on the same layout
+as fresh ones.
+
+On the embedded SQLite backend (PYESATRAK_DB_BACKEND=sqlite) pending
+versions are satisfied by sqlite_backend.SCHEMA, the same layout in SQLite
+DDL; there is no sp_update_stock there.
+"""
+import sys
+
+from mysql.connector import Error
+from db_pool import get_connection, using_sqlite
+import sqlite_backend
+from date_ranges import date_range, today_range
+
+# sp_update_stock (see SIModel.update_stock): one CALL per movement does the
+# stock update, ledger row, activity text, KPI counters and COMMIT on the
+# server. Each migration that installs it has its own FROZEN definition, so
+# what a version number installed never changes after the fact: change the
+# routine by adding a migration with a new constant, never by editing one.
+
+# v3. Returns one row: (found, activity_description); an unknown product
+# is refused before anything is written.
+SP_UPDATE_STOCK_V3 = """
+    CREATE PROCEDURE sp_update_stock(
+        IN p_product_id INT,
+        IN p_quantity_change INT,
+        IN p_transaction_type VARCHAR(10),
+        IN p_remarks TEXT,
+        IN p_user_id INT,
+        IN p_log_activity TINYINT
+    )
+    proc: BEGIN
+        DECLARE v_name VARCHAR(255) DEFAULT NULL;
+        DECLARE v_old INT DEFAULT NULL;
+        DECLARE v_new INT;
+        DECLARE v_old_bucket VARCHAR(50);
+        DECLARE v_new_bucket VARCHAR(50);
+        DECLARE v_qty INT DEFAULT ABS(p_quantity_change);
+        DECLARE v_desc TEXT DEFAULT NULL;
+
+        DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+        START TRANSACTION;
+
+        SELECT product_name, stock_quantity INTO v_name, v_old
+        FROM inventory WHERE product_id = p_product_id FOR UPDATE;
+        IF v_old IS NULL THEN
+            -- Unknown product: nothing is written
+            ROLLBACK;
+            SELECT 0 AS found, NULL AS activity_description;
+            LEAVE proc;
+        END IF;
+        SET v_new = v_old + p_quantity_change;
+
+        UPDATE inventory
+        SET stock_quantity = v_new,
+            status = CASE
+                WHEN v_new <= 0 THEN 'Out of Stock'
+                WHEN v_new <= 10 THEN 'Low Stock'
+                ELSE 'Available'
+            END,
+            updated_at = NOW()
+        WHERE product_id = p_product_id;
+
+        INSERT INTO stock_transactions
+        (product_id, transaction_type, quantity, remarks, performed_by, transaction_date)
+        VALUES (p_product_id, p_transaction_type, v_qty, p_remarks, p_user_id, NOW());
+
+        SET v_desc = CONCAT(
+            CASE p_transaction_type
+                WHEN 'IN' THEN 'Stock IN: '
+                WHEN 'OUT' THEN 'Stock OUT: '
+                WHEN 'DEFECT' THEN 'Reported DEFECT: '
+            END,
+            v_qty, ' units of ''', v_name, '''');
+
+        IF v_desc IS NOT NULL AND p_log_activity THEN
+            INSERT INTO activity_log (user_id, activity_description, activity_time)
+            VALUES (p_user_id, v_desc, NOW());
+        END IF;
+
+        -- Same rules as kpi_counters.stock_bucket / stock_change_deltas
+        SET v_old_bucket = CASE WHEN v_old = 0 THEN 'out_of_stock_count'
+                                WHEN v_old > 0 AND v_old <= 10 THEN 'low_stock_count' END;
+        SET v_new_bucket = CASE WHEN v_new = 0 THEN 'out_of_stock_count'
+                                WHEN v_new > 0 AND v_new <= 10 THEN 'low_stock_count' END;
+        IF NOT (v_old_bucket <=> v_new_bucket) THEN
+            UPDATE kpi_counters
+            SET counter_value = counter_value + CASE
+                    WHEN counter_name = v_old_bucket THEN -1
+                    WHEN counter_name = v_new_bucket THEN 1
+                    ELSE 0 END,
+                updated_at = NOW()
+            WHERE counter_name IN (v_old_bucket, v_new_bucket);
+        END IF;
+        IF p_transaction_type = 'DEFECT' THEN
+            UPDATE kpi_counters
+            SET counter_value = counter_value + v_qty, updated_at = NOW()
+            WHERE counter_name = 'defective_count';
+        END IF;
+
+        COMMIT;
+        SELECT 1 AS found, v_desc AS activity_description;
+    END
+"""
+
+# v4: decrements only apply while enough stock is on hand; the row lock is
+# held from the UPDATE to the COMMIT.
+# Returns one row: (found, activity_description, insufficient).
+SP_UPDATE_STOCK_V4 = """
+    CREATE PROCEDURE sp_update_stock(
+        IN p_product_id INT,
+        IN p_quantity_change INT,
+        IN p_transaction_type VARCHAR(10),
+        IN p_remarks TEXT,
+        IN p_user_id INT,
+        IN p_log_activity TINYINT
+    )
+    BEGIN
+        DECLARE v_name VARCHAR(255) DEFAULT NULL;
+        DECLARE v_old INT;
+        DECLARE v_new INT;
+        DECLARE v_found INT DEFAULT 0;
+        DECLARE v_old_bucket VARCHAR(50);
+        DECLARE v_new_bucket VARCHAR(50);
+        DECLARE v_qty INT DEFAULT ABS(p_quantity_change);
+        DECLARE v_desc TEXT DEFAULT NULL;
+
+        DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+        START TRANSACTION;
+
+        UPDATE inventory
+        SET status = CASE
+                WHEN (stock_quantity + p_quantity_change) <= 0 THEN 'Out of Stock'
+                WHEN (stock_quantity + p_quantity_change) <= 10 THEN 'Low Stock'
+                ELSE 'Available'
+            END,
+            stock_quantity = stock_quantity + p_quantity_change,
+            updated_at = NOW()
+        WHERE product_id = p_product_id
+          AND (p_quantity_change >= 0 OR stock_quantity >= v_qty);
+
+        IF ROW_COUNT() = 0 THEN
+            -- Unknown product, or not enough stock for this decrement
+            ROLLBACK;
+            SELECT COUNT(*) INTO v_found FROM inventory WHERE product_id = p_product_id;
+            SELECT v_found > 0 AS found, NULL AS activity_description, v_found > 0 AS insufficient;
+        ELSE
+            SELECT product_name, stock_quantity INTO v_name, v_new
+            FROM inventory WHERE product_id = p_product_id;
+            SET v_old = v_new - p_quantity_change;
+
+            INSERT INTO stock_transactions
+            (product_id, transaction_type, quantity, remarks, performed_by, transaction_date)
+            VALUES (p_product_id, p_transaction_type, v_qty, p_remarks, p_user_id, NOW());
+
+            SET v_desc = CONCAT(
+                CASE p_transaction_type
+                    WHEN 'IN' THEN 'Stock IN: '
+                    WHEN 'OUT' THEN 'Stock OUT: '
+                    WHEN 'DEFECT' THEN 'Reported DEFECT: '
+                END,
+                v_qty, ' units of ''', v_name, '''');
+
+            IF v_desc IS NOT NULL AND p_log_activity THEN
+                INSERT INTO activity_log (user_id, activity_description, activity_time)
+                VALUES (p_user_id, v_desc, NOW());
+            END IF;
+
+            -- Same rules as kpi_counters.stock_bucket / stock_change_deltas
+            SET v_old_bucket = CASE WHEN v_old = 0 THEN 'out_of_stock_count'
+                                    WHEN v_old > 0 AND v_old <= 10 THEN 'low_stock_count' END;
+            SET v_new_bucket = CASE WHEN v_new = 0 THEN 'out_of_stock_count'
+                                    WHEN v_new > 0 AND v_new <= 10 THEN 'low_stock_count' END;
+            IF NOT (v_old_bucket <=> v_new_bucket) THEN
+                UPDATE kpi_counters
+                SET counter_value = counter_value + CASE
+                        WHEN counter_name = v_old_bucket THEN -1
+                        WHEN counter_name = v_new_bucket THEN 1
+                        ELSE 0 END,
+                    updated_at = NOW()
+                WHERE counter_name IN (v_old_bucket, v_new_bucket);
+            END IF;
+            IF p_transaction_type = 'DEFECT' THEN
+                UPDATE kpi_counters
+                SET counter_value = counter_value + v_qty, updated_at = NOW()
+                WHERE counter_name = 'defective_count';
+            END IF;
+
+            COMMIT;
+            SELECT 1 AS found, v_desc AS activity_description, 0 AS insufficient;
+        END IF;
+    END"""
+
+# v5: a movement whose idempotency key is already on the ledger is not
+# applied again. Returns one row: (found, activity_description, insufficient, duplicate).
+SP_UPDATE_STOCK_V5 = """
+    CREATE PROCEDURE sp_update_stock(
+        IN p_product_id INT,
+        IN p_quantity_change INT,
+        IN p_transaction_type VARCHAR(10),
+        IN p_remarks TEXT,
+        IN p_user_id INT,
+        IN p_log_activity TINYINT,
+        IN p_idempotency_key VARCHAR(36)
+    )
+    BEGIN
+        DECLARE v_name VARCHAR(255) DEFAULT NULL;
+        DECLARE v_old INT;
+        DECLARE v_new INT;
+        DECLARE v_found INT DEFAULT 0;
+        DECLARE v_old_bucket VARCHAR(50);
+        DECLARE v_new_bucket VARCHAR(50);
+        DECLARE v_qty INT DEFAULT ABS(p_quantity_change);
+        DECLARE v_desc TEXT DEFAULT NULL;
+
+        DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+        START TRANSACTION;
+
+        IF p_idempotency_key IS NOT NULL AND EXISTS (
+            SELECT 1 FROM stock_transactions WHERE idempotency_key = p_idempotency_key
+        ) THEN
+            -- Retry of a movement that already committed
+            ROLLBACK;
+            SELECT 1 AS found, NULL AS activity_description, 0 AS insufficient, 1 AS duplicate;
+        ELSE
+            UPDATE inventory
+            SET status = CASE
+                    WHEN (stock_quantity + p_quantity_change) <= 0 THEN 'Out of Stock'
+                    WHEN (stock_quantity + p_quantity_change) <= 10 THEN 'Low Stock'
+                    ELSE 'Available'
+                END,
+                stock_quantity = stock_quantity + p_quantity_change,
+                updated_at = NOW()
+            WHERE product_id = p_product_id
+              AND (p_quantity_change >= 0 OR stock_quantity >= v_qty);
+
+            IF ROW_COUNT() = 0 THEN
+                -- Unknown product, or not enough stock for this decrement
+                ROLLBACK;
+                SELECT COUNT(*) INTO v_found FROM inventory WHERE product_id = p_product_id;
+                SELECT v_found > 0 AS found, NULL AS activity_description, v_found > 0 AS insufficient, 0 AS duplicate;
+            ELSE
+                SELECT product_name, stock_quantity INTO v_name, v_new
+                FROM inventory WHERE product_id = p_product_id;
+                SET v_old = v_new - p_quantity_change;
+
+                INSERT INTO stock_transactions
+                (product_id, transaction_type, quantity, remarks, performed_by, transaction_date, idempotency_key)
+                VALUES (p_product_id, p_transaction_type, v_qty, p_remarks, p_user_id, NOW(), p_idempotency_key);
+
+                SET v_desc = CONCAT(
+                    CASE p_transaction_type
+                        WHEN 'IN' THEN 'Stock IN: '
+                        WHEN 'OUT' THEN 'Stock OUT: '
+                        WHEN 'DEFECT' THEN 'Reported DEFECT: '
+                    END,
+                    v_qty, ' units of ''', v_name, '''');
+
+                IF v_desc IS NOT NULL AND p_log_activity THEN
+                    INSERT INTO activity_log (user_id, activity_description, activity_time)
+                    VALUES (p_user_id, v_desc, NOW());
+                END IF;
+
+                -- Same rules as kpi_counters.stock_bucket / stock_change_deltas
+                SET v_old_bucket = CASE WHEN v_old = 0 THEN 'out_of_stock_count'
+                                        WHEN v_old > 0 AND v_old <= 10 THEN 'low_stock_count' END;
+                SET v_new_bucket = CASE WHEN v_new = 0 THEN 'out_of_stock_count'
+                                        WHEN v_new > 0 AND v_new <= 10 THEN 'low_stock_count' END;
+                IF NOT (v_old_bucket <=> v_new_bucket) THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + CASE
+                            WHEN counter_name = v_old_bucket THEN -1
+                            WHEN counter_name = v_new_bucket THEN 1
+                            ELSE 0 END,
+                        updated_at = NOW()
+                    WHERE counter_name IN (v_old_bucket, v_new_bucket);
+                END IF;
+                IF p_transaction_type = 'DEFECT' THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + v_qty, updated_at = NOW()
+                    WHERE counter_name = 'defective_count';
+                END IF;
+
+                COMMIT;
+                SELECT 1 AS found, v_desc AS activity_description, 0 AS insufficient, 0 AS duplicate;
+            END IF;
+        END IF;
+    END"""
+
+# v6: also bumps the catalogue_version stamp.
+SP_UPDATE_STOCK_V6 = """
+    CREATE PROCEDURE sp_update_stock(
+        IN p_product_id INT,
+        IN p_quantity_change INT,
+        IN p_transaction_type VARCHAR(10),
+        IN p_remarks TEXT,
+        IN p_user_id INT,
+        IN p_log_activity TINYINT,
+        IN p_idempotency_key VARCHAR(36)
+    )
+    BEGIN
+        DECLARE v_name VARCHAR(255) DEFAULT NULL;
+        DECLARE v_old INT;
+        DECLARE v_new INT;
+        DECLARE v_found INT DEFAULT 0;
+        DECLARE v_old_bucket VARCHAR(50);
+        DECLARE v_new_bucket VARCHAR(50);
+        DECLARE v_qty INT DEFAULT ABS(p_quantity_change);
+        DECLARE v_desc TEXT DEFAULT NULL;
+
+        DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+        START TRANSACTION;
+
+        IF p_idempotency_key IS NOT NULL AND EXISTS (
+            SELECT 1 FROM stock_transactions WHERE idempotency_key = p_idempotency_key
+        ) THEN
+            -- Retry of a movement that already committed
+            ROLLBACK;
+            SELECT 1 AS found, NULL AS activity_description, 0 AS insufficient, 1 AS duplicate;
+        ELSE
+            UPDATE inventory
+            SET status = CASE
+                    WHEN (stock_quantity + p_quantity_change) <= 0 THEN 'Out of Stock'
+                    WHEN (stock_quantity + p_quantity_change) <= 10 THEN 'Low Stock'
+                    ELSE 'Available'
+                END,
+                stock_quantity = stock_quantity + p_quantity_change,
+                updated_at = NOW()
+            WHERE product_id = p_product_id
+              AND (p_quantity_change >= 0 OR stock_quantity >= v_qty);
+
+            IF ROW_COUNT() = 0 THEN
+                -- Unknown product, or not enough stock for this decrement
+                ROLLBACK;
+                SELECT COUNT(*) INTO v_found FROM inventory WHERE product_id = p_product_id;
+                SELECT v_found > 0 AS found, NULL AS activity_description, v_found > 0 AS insufficient, 0 AS duplicate;
+            ELSE
+                SELECT product_name, stock_quantity INTO v_name, v_new
+                FROM inventory WHERE product_id = p_product_id;
+                SET v_old = v_new - p_quantity_change;
+
+                INSERT INTO stock_transactions
+                (product_id, transaction_type, quantity, remarks, performed_by, transaction_date, idempotency_key)
+                VALUES (p_product_id, p_transaction_type, v_qty, p_remarks, p_user_id, NOW(), p_idempotency_key);
+
+                SET v_desc = CONCAT(
+                    CASE p_transaction_type
+                        WHEN 'IN' THEN 'Stock IN: '
+                        WHEN 'OUT' THEN 'Stock OUT: '
+                        WHEN 'DEFECT' THEN 'Reported DEFECT: '
+                    END,
+                    v_qty, ' units of ''', v_name, '''');
+
+                IF v_desc IS NOT NULL AND p_log_activity THEN
+                    INSERT INTO activity_log (user_id, activity_description, activity_time)
+                    VALUES (p_user_id, v_desc, NOW());
+                END IF;
+
+                -- Same rules as kpi_counters.stock_bucket / stock_change_deltas
+                SET v_old_bucket = CASE WHEN v_old = 0 THEN 'out_of_stock_count'
+                                        WHEN v_old > 0 AND v_old <= 10 THEN 'low_stock_count' END;
+                SET v_new_bucket = CASE WHEN v_new = 0 THEN 'out_of_stock_count'
+                                        WHEN v_new > 0 AND v_new <= 10 THEN 'low_stock_count' END;
+                IF NOT (v_old_bucket <=> v_new_bucket) THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + CASE
+                            WHEN counter_name = v_old_bucket THEN -1
+                            WHEN counter_name = v_new_bucket THEN 1
+                            ELSE 0 END,
+                        updated_at = NOW()
+                    WHERE counter_name IN (v_old_bucket, v_new_bucket);
+                END IF;
+                IF p_transaction_type = 'DEFECT' THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + v_qty, updated_at = NOW()
+                    WHERE counter_name = 'defective_count';
+                END IF;
+                -- Invalidates cached catalogues (catalogue_cache.py)
+                UPDATE kpi_counters
+                SET counter_value = counter_value + 1, updated_at = NOW()
+                WHERE counter_name = 'catalogue_version';
+
+                COMMIT;
+                SELECT 1 AS found, v_desc AS activity_description, 0 AS insufficient, 0 AS duplicate;
+            END IF;
+        END IF;
+    END"""
+
+# v10: keys are booked in stock_movement_keys (the ledger's key index is no
+# longer unique once partitioned).
+SP_UPDATE_STOCK_V10 = """
+    CREATE PROCEDURE sp_update_stock(
+        IN p_product_id INT,
+        IN p_quantity_change INT,
+        IN p_transaction_type VARCHAR(10),
+        IN p_remarks TEXT,
+        IN p_user_id INT,
+        IN p_log_activity TINYINT,
+        IN p_idempotency_key VARCHAR(36)
+    )
+    BEGIN
+        DECLARE v_name VARCHAR(255) DEFAULT NULL;
+        DECLARE v_old INT;
+        DECLARE v_new INT;
+        DECLARE v_found INT DEFAULT 0;
+        DECLARE v_old_bucket VARCHAR(50);
+        DECLARE v_new_bucket VARCHAR(50);
+        DECLARE v_qty INT DEFAULT ABS(p_quantity_change);
+        DECLARE v_desc TEXT DEFAULT NULL;
+
+        DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+        START TRANSACTION;
+
+        IF p_idempotency_key IS NOT NULL AND EXISTS (
+            SELECT 1 FROM stock_movement_keys WHERE idempotency_key = p_idempotency_key
+        ) THEN
+            -- Retry of a movement that already committed
+            ROLLBACK;
+            SELECT 1 AS found, NULL AS activity_description, 0 AS insufficient, 1 AS duplicate;
+        ELSE
+            UPDATE inventory
+            SET status = CASE
+                    WHEN (stock_quantity + p_quantity_change) <= 0 THEN 'Out of Stock'
+                    WHEN (stock_quantity + p_quantity_change) <= 10 THEN 'Low Stock'
+                    ELSE 'Available'
+                END,
+                stock_quantity = stock_quantity + p_quantity_change,
+                updated_at = NOW()
+            WHERE product_id = p_product_id
+              AND (p_quantity_change >= 0 OR stock_quantity >= v_qty);
+
+            IF ROW_COUNT() = 0 THEN
+                -- Unknown product, or not enough stock for this decrement
+                ROLLBACK;
+                SELECT COUNT(*) INTO v_found FROM inventory WHERE product_id = p_product_id;
+                SELECT v_found > 0 AS found, NULL AS activity_description, v_found > 0 AS insufficient, 0 AS duplicate;
+            ELSE
+                SELECT product_name, stock_quantity INTO v_name, v_new
+                FROM inventory WHERE product_id = p_product_id;
+                SET v_old = v_new - p_quantity_change;
+
+                INSERT INTO stock_transactions
+                (product_id, transaction_type, quantity, remarks, performed_by, transaction_date, idempotency_key)
+                VALUES (p_product_id, p_transaction_type, v_qty, p_remarks, p_user_id, NOW(), p_idempotency_key);
+                IF p_idempotency_key IS NOT NULL THEN
+                    -- Duplicate key here (a concurrent retry) rolls the whole movement back
+                    INSERT INTO stock_movement_keys (idempotency_key, transaction_id, booked_at)
+                    VALUES (p_idempotency_key, LAST_INSERT_ID(), NOW());
+                END IF;
+
+                SET v_desc = CONCAT(
+                    CASE p_transaction_type
+                        WHEN 'IN' THEN 'Stock IN: '
+                        WHEN 'OUT' THEN 'Stock OUT: '
+                        WHEN 'DEFECT' THEN 'Reported DEFECT: '
+                    END,
+                    v_qty, ' units of ''', v_name, '''');
+
+                IF v_desc IS NOT NULL AND p_log_activity THEN
+                    INSERT INTO activity_log (user_id, activity_description, activity_time)
+                    VALUES (p_user_id, v_desc, NOW());
+                END IF;
+
+                -- Same rules as kpi_counters.stock_bucket / stock_change_deltas
+                SET v_old_bucket = CASE WHEN v_old = 0 THEN 'out_of_stock_count'
+                                        WHEN v_old > 0 AND v_old <= 10 THEN 'low_stock_count' END;
+                SET v_new_bucket = CASE WHEN v_new = 0 THEN 'out_of_stock_count'
+                                        WHEN v_new > 0 AND v_new <= 10 THEN 'low_stock_count' END;
+                IF NOT (v_old_bucket <=> v_new_bucket) THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + CASE
+                            WHEN counter_name = v_old_bucket THEN -1
+                            WHEN counter_name = v_new_bucket THEN 1
+                            ELSE 0 END,
+                        updated_at = NOW()
+                    WHERE counter_name IN (v_old_bucket, v_new_bucket);
+                END IF;
+                IF p_transaction_type = 'DEFECT' THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + v_qty, updated_at = NOW()
+                    WHERE counter_name = 'defective_count';
+                END IF;
+                -- Invalidates cached catalogues (catalogue_cache.py)
+                UPDATE kpi_counters
+                SET counter_value = counter_value + 1, updated_at = NOW()
+                WHERE counter_name = 'catalogue_version';
+
+                COMMIT;
+                SELECT 1 AS found, v_desc AS activity_description, 0 AS insufficient, 0 AS duplicate;
+            END IF;
+        END IF;
+    END"""
+
+# v12: no catalogue_version bump. Every movement updating that one row
+# serialized all terminals on its lock; the caller bumps it after COMMIT
+# (kpi_counters.bump_catalogue_version).
+SP_UPDATE_STOCK_V12 = """
+    CREATE PROCEDURE sp_update_stock(
+        IN p_product_id INT,
+        IN p_quantity_change INT,
+        IN p_transaction_type VARCHAR(10),
+        IN p_remarks TEXT,
+        IN p_user_id INT,
+        IN p_log_activity TINYINT,
+        IN p_idempotency_key VARCHAR(36)
+    )
+    BEGIN
+        DECLARE v_name VARCHAR(255) DEFAULT NULL;
+        DECLARE v_old INT;
+        DECLARE v_new INT;
+        DECLARE v_found INT DEFAULT 0;
+        DECLARE v_old_bucket VARCHAR(50);
+        DECLARE v_new_bucket VARCHAR(50);
+        DECLARE v_qty INT DEFAULT ABS(p_quantity_change);
+        DECLARE v_desc TEXT DEFAULT NULL;
+
+        DECLARE EXIT HANDLER FOR SQLEXCEPTION
+        BEGIN
+            ROLLBACK;
+            RESIGNAL;
+        END;
+
+        START TRANSACTION;
+
+        IF p_idempotency_key IS NOT NULL AND EXISTS (
+            SELECT 1 FROM stock_movement_keys WHERE idempotency_key = p_idempotency_key
+        ) THEN
+            -- Retry of a movement that already committed
+            ROLLBACK;
+            SELECT 1 AS found, NULL AS activity_description, 0 AS insufficient, 1 AS duplicate;
+        ELSE
+            UPDATE inventory
+            SET status = CASE
+                    WHEN (stock_quantity + p_quantity_change) <= 0 THEN 'Out of Stock'
+                    WHEN (stock_quantity + p_quantity_change) <= 10 THEN 'Low Stock'
+                    ELSE 'Available'
+                END,
+                stock_quantity = stock_quantity + p_quantity_change,
+                updated_at = NOW()
+            WHERE product_id = p_product_id
+              AND (p_quantity_change >= 0 OR stock_quantity >= v_qty);
+
+            IF ROW_COUNT() = 0 THEN
+                -- Unknown product, or not enough stock for this decrement
+                ROLLBACK;
+                SELECT COUNT(*) INTO v_found FROM inventory WHERE product_id = p_product_id;
+                SELECT v_found > 0 AS found, NULL AS activity_description, v_found > 0 AS insufficient, 0 AS duplicate;
+            ELSE
+                SELECT product_name, stock_quantity INTO v_name, v_new
+                FROM inventory WHERE product_id = p_product_id;
+                SET v_old = v_new - p_quantity_change;
+
+                INSERT INTO stock_transactions
+                (product_id, transaction_type, quantity, remarks, performed_by, transaction_date, idempotency_key)
+                VALUES (p_product_id, p_transaction_type, v_qty, p_remarks, p_user_id, NOW(), p_idempotency_key);
+                IF p_idempotency_key IS NOT NULL THEN
+                    -- Duplicate key here (a concurrent retry) rolls the whole movement back
+                    INSERT INTO stock_movement_keys (idempotency_key, transaction_id, booked_at)
+                    VALUES (p_idempotency_key, LAST_INSERT_ID(), NOW());
+                END IF;
+
+                SET v_desc = CONCAT(
+                    CASE p_transaction_type
+                        WHEN 'IN' THEN 'Stock IN: '
+                        WHEN 'OUT' THEN 'Stock OUT: '
+                        WHEN 'DEFECT' THEN 'Reported DEFECT: '
+                    END,
+                    v_qty, ' units of ''', v_name, '''');
+
+                IF v_desc IS NOT NULL AND p_log_activity THEN
+                    INSERT INTO activity_log (user_id, activity_description, activity_time)
+                    VALUES (p_user_id, v_desc, NOW());
+                END IF;
+
+                -- Same rules as kpi_counters.stock_bucket / stock_change_deltas
+                SET v_old_bucket = CASE WHEN v_old = 0 THEN 'out_of_stock_count'
+                                        WHEN v_old > 0 AND v_old <= 10 THEN 'low_stock_count' END;
+                SET v_new_bucket = CASE WHEN v_new = 0 THEN 'out_of_stock_count'
+                                        WHEN v_new > 0 AND v_new <= 10 THEN 'low_stock_count' END;
+                IF NOT (v_old_bucket <=> v_new_bucket) THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + CASE
+                            WHEN counter_name = v_old_bucket THEN -1
+                            WHEN counter_name = v_new_bucket THEN 1
+                            ELSE 0 END,
+                        updated_at = NOW()
+                    WHERE counter_name IN (v_old_bucket, v_new_bucket);
+                END IF;
+                IF p_transaction_type = 'DEFECT' THEN
+                    UPDATE kpi_counters
+                    SET counter_value = counter_value + v_qty, updated_at = NOW()
+                    WHERE counter_name = 'defective_count';
+                END IF;
+
+                COMMIT;
+                SELECT 1 AS found, v_desc AS activity_description, 0 AS insufficient, 0 AS duplicate;
+            END IF;
+        END IF;
+    END"""
+
+# The definition the models expect (four result columns)
+SP_UPDATE_STOCK = SP_UPDATE_STOCK_V12
+
+MIGRATIONS = [
+    (1, "base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INT AUTO_INCREMENT PRIMARY KEY,
+            userFname VARCHAR(100) NOT NULL,
+            userMname VARCHAR(100) NULL,
+            userLname VARCHAR(100) NOT NULL,
+            username VARCHAR(50) NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            role VARCHAR(20) NOT NULL DEFAULT 'Staff',
+            status VARCHAR(20) NOT NULL DEFAULT 'Active'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS inventory (
+            product_id INT AUTO_INCREMENT PRIMARY KEY,
+            product_name VARCHAR(255) NOT NULL,
+            brand VARCHAR(100) NULL,
+            model VARCHAR(100) NULL,
+            description TEXT NULL,
+            stock_quantity INT NOT NULL DEFAULT 0,
+            status VARCHAR(30) NULL,
+            created_at DATETIME NULL,
+            updated_at DATETIME NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS stock_transactions (
+            transaction_id INT AUTO_INCREMENT PRIMARY KEY,
+            product_id INT NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            quantity INT NOT NULL,
+            remarks TEXT NULL,
+            performed_by INT NULL,
+            transaction_date DATETIME NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS activity_log (
+            log_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NULL,
+            activity_description TEXT NOT NULL,
+            activity_time DATETIME NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_logins (
+            login_id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            login_time DATETIME NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS saved_reports (
+            report_id INT AUTO_INCREMENT PRIMARY KEY,
+            report_name VARCHAR(255) NOT NULL,
+            report_type VARCHAR(50) NOT NULL,
+            start_date DATE NULL,
+            end_date DATE NULL,
+            requested_by INT NULL,
+            processed_by INT NULL,
+            validated_by INT NULL,
+            validated_at DATETIME NULL,
+            transaction_id INT NULL,
+            created_at DATETIME NOT NULL,
+            report_status VARCHAR(20) NOT NULL DEFAULT 'Processed'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS kpi_counters (
+            counter_name VARCHAR(50) NOT NULL PRIMARY KEY,
+            counter_value BIGINT NOT NULL DEFAULT 0,
+            updated_at DATETIME NULL
+        )
+        """,
+    ]),
+    (2, "hot query indexes", [
+        # LoginModel.validate_credentials: WHERE username = %s
+        ('index', 'users', 'ux_users_username', ('username',), True),
+        # Today's stock flow, Stock Movement report range, recent activity ORDER BY ... LIMIT
+        ('index', 'stock_transactions', 'ix_st_date', ('transaction_date',), False),
+        # Defects report (type = 'DEFECT' AND date range), defective KPI rebuild
+        ('index', 'stock_transactions', 'ix_st_type_date', ('transaction_type', 'transaction_date'), False),
+        # Per-product history joins (defective products with reason)
+        ('index', 'stock_transactions', 'ix_st_product_date', ('product_id', 'transaction_date'), False),
+        # User Activity report range
+        ('index', 'user_logins', 'ix_logins_time', ('login_time',), False),
+        # Low / out of stock filters and KPI rebuild
+        ('index', 'inventory', 'ix_inventory_stock', ('stock_quantity',), False),
+    ]),
+    (3, "sp_update_stock routine", [
+        "DROP PROCEDURE IF EXISTS sp_update_stock",
+        SP_UPDATE_STOCK_V3,
+    ]),
+    (4, "sp_update_stock conditional decrement", [
+        "DROP PROCEDURE IF EXISTS sp_update_stock",
+        SP_UPDATE_STOCK_V4,
+    ]),
+    (5, "stock movement idempotency keys", [
+        ('column', 'stock_transactions', 'idempotency_key', "CHAR(36) NULL"),
+        # Unique: a retried movement can never be booked twice (NULLs allowed for old rows)
+        ('index', 'stock_transactions', 'ux_st_idempotency', ('idempotency_key',), True),
+        "DROP PROCEDURE IF EXISTS sp_update_stock",
+        SP_UPDATE_STOCK_V5,
+    ]),
+    (6, "catalogue version stamp", [
+        """
+        INSERT IGNORE INTO kpi_counters (counter_name, counter_value, updated_at)
+        VALUES ('catalogue_version', 1, NOW())
+        """,
+        "DROP PROCEDURE IF EXISTS sp_update_stock",
+        SP_UPDATE_STOCK_V6,
+    ]),
+    (7, "inventory delta sync", [
+        # get_products_changed_since: WHERE updated_at >= %s
+        ('index', 'inventory', 'ix_inventory_updated', ('updated_at',), False),
+        # Tombstones so deleted products reach terminals syncing deltas
+        """
+        CREATE TABLE IF NOT EXISTS inventory_deletions (
+            product_id INT NOT NULL PRIMARY KEY,
+            deleted_at DATETIME NOT NULL,
+            INDEX ix_deletions_time (deleted_at)
+        )
+        """,
+        "DROP TRIGGER IF EXISTS trg_inventory_deleted",
+        """
+        CREATE TRIGGER trg_inventory_deleted AFTER DELETE ON inventory
+        FOR EACH ROW
+            INSERT INTO inventory_deletions (product_id, deleted_at)
+            VALUES (OLD.product_id, NOW())
+            ON DUPLICATE KEY UPDATE deleted_at = NOW()
+        """,
+    ]),
+    (8, "defective summary index", [
+        # Covers the per-product DEFECT aggregate (sum, count, last date)
+        # and the last-reason lookup of the defective view
+        ('index', 'stock_transactions', 'ix_st_type_product',
+         ('transaction_type', 'product_id', 'transaction_date', 'quantity'), False),
+    ]),
+    (9, "daily stock rollup", [
+        # Folded in by stock_rollup.catch_up(); fill with: python stock_rollup.py --backfill
+        """
+        CREATE TABLE IF NOT EXISTS stock_daily_rollup (
+            day DATE NOT NULL,
+            product_id INT NOT NULL,
+            transaction_type VARCHAR(10) NOT NULL,
+            qty BIGINT NOT NULL DEFAULT 0,
+            txn_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, product_id, transaction_type),
+            INDEX ix_rollup_product_day (product_id, day)
+        )
+        """,
+        # High-water mark: last transaction_id folded into the rollup
+        """
+        INSERT IGNORE INTO kpi_counters (counter_name, counter_value, updated_at)
+        VALUES ('rollup_transaction_id', 0, NOW())
+        """,
+    ]),
+    (10, "partition-ready keys and archive catalogue", [
+        # Unique keys of a partitioned table must include the partition column,
+        # so idempotency keys get their own table (partitions.py then relaxes
+        # ux_st_idempotency to a plain index)
+        """
+        CREATE TABLE IF NOT EXISTS stock_movement_keys (
+            idempotency_key CHAR(36) NOT NULL PRIMARY KEY,
+            transaction_id INT NULL,
+            booked_at DATETIME NOT NULL,
+            INDEX ix_keys_booked (booked_at)
+        )
+        """,
+        """
+        INSERT IGNORE INTO stock_movement_keys (idempotency_key, transaction_id, booked_at)
+        SELECT idempotency_key, transaction_id, transaction_date
+        FROM stock_transactions WHERE idempotency_key IS NOT NULL
+        """,
+        # Months moved out of the live tables by partitions.py --archive
+        """
+        CREATE TABLE IF NOT EXISTS archive_catalog (
+            archive_table VARCHAR(64) NOT NULL PRIMARY KEY,
+            source_table VARCHAR(64) NOT NULL,
+            range_start DATETIME NOT NULL,
+            range_end DATETIME NOT NULL,
+            row_count INT NOT NULL DEFAULT 0,
+            archived_at DATETIME NOT NULL,
+            INDEX ix_catalog_source (source_table, range_start)
+        )
+        """,
+        "DROP PROCEDURE IF EXISTS sp_update_stock",
+        SP_UPDATE_STOCK_V10,
+    ]),
+    (11, "user directory version stamp", [
+        # Bumped by ManageUsersModel writes; local replicas re-copy users when it moves
+        """
+        INSERT IGNORE INTO kpi_counters (counter_name, counter_value, updated_at)
+        VALUES ('user_directory_version', 1, NOW())
+        """,
+    ]),
+    (12, "catalogue version bumped outside stock movements", [
+        "DROP PROCEDURE IF EXISTS sp_update_stock",
+        SP_UPDATE_STOCK_V12,
+    ]),
+    (13, "stock rollup gaps", [
+        # Ids the rollup mark passed before their movement committed (stock_rollup.py)
+        """
+        CREATE TABLE IF NOT EXISTS stock_rollup_gaps (
+            transaction_id INT NOT NULL PRIMARY KEY,
+            seen_at DATETIME NOT NULL
+        )
+        """,
+    ]),
+]
+
+def hot_queries():
+    """
+    (description, query, params, table alias, expected index) checked by
+    --explain. Built from the models' own SQL constants, so a query that
+    drifts away from its index fails the check.
+    """
+    # Imported here: the models import db_pool, which must be configured first
+    from login_model import LOGIN_QUERY
+    from AreportModel import STOCK_MOVEMENT_QUERY, DEFECTIVE_REPORT_QUERY, USER_ACTIVITY_QUERY
+    from ADBModel import ACTIVITY_FEED_QUERY
+    from SIModel import DEFECT_SUMMARY_QUERY, CHANGED_SINCE_QUERY, PAGE_SIZE
+    import stock_rollup
+
+    month = date_range('2026-01-01', '2026-01-31')
+    return [
+        ("Login lookup", LOGIN_QUERY, ('admin',), 'users', 'ux_users_username'),
+        ("Today's stock flow", stock_rollup.MOVEMENT_TOTALS_QUERY, stock_rollup.today_params(), 't', 'ix_st_date'),
+        ("Stock Movement report", STOCK_MOVEMENT_QUERY.format(source='stock_transactions'), month,
+         't', 'ix_st_date'),
+        ("Defects report", DEFECTIVE_REPORT_QUERY.format(source='stock_transactions'), month,
+         't', 'ix_st_type_date'),
+        ("User Activity report", USER_ACTIVITY_QUERY.format(source='user_logins'), month,
+         'l', 'ix_logins_time'),
+        ("Recent activity", ACTIVITY_FEED_QUERY, (0, 10), 't', 'PRIMARY'),
+        ("Defective summary", DEFECT_SUMMARY_QUERY.format(seek="1=1"), (PAGE_SIZE,),
+         'stock_transactions', 'ix_st_type_product'),
+        ("Rollup date range", stock_rollup.MOVEMENT_TOTALS_QUERY,
+         stock_rollup.totals_params('2026-01-01', '2026-12-31'), 'r', 'PRIMARY'),
+        ("Inventory delta sync", CHANGED_SINCE_QUERY, (today_range()[0],), 'inventory', 'ix_inventory_updated'),
+    ]
+
+
+def _ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            name VARCHAR(100) NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _index_exists(cursor, table, columns, unique=False):
+    """
+    True if `table` already has an index whose leading columns are `columns`
+    (for unique=True: a UNIQUE index on exactly those columns)
+    """
+    cursor.execute("""
+        SELECT index_name, column_name, non_unique
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY index_name, seq_in_index
+    """, (table,))
+    existing = {}
+    for index_name, column_name, non_unique in cursor.fetchall():
+        existing.setdefault(index_name, (int(non_unique) == 0, []))[1].append(column_name.lower())
+    wanted = [c.lower() for c in columns]
+    if unique:
+        return any(is_unique and cols == wanted for is_unique, cols in existing.values())
+    return any(cols[:len(wanted)] == wanted for _, cols in existing.values())
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone()[0] > 0
+
+
+def _run_step(cursor, step):
+    if isinstance(step, str):
+        cursor.execute(step)
+        return
+    if step[0] == 'column':
+        _, table, column, definition = step
+        if _column_exists(cursor, table, column):
+            print(f"  - {table}.{column} already exists")
+            return
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        print(f"  + {table}.{column}")
+        return
+    _, table, name, columns, unique = step
+    if _index_exists(cursor, table, columns, unique):
+        print(f"  - {table}({', '.join(columns)}) already indexed")
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})")
+    print(f"  + {name} ON {table}({', '.join(columns)})")
+
+
+def migrate(conn):
+    """Apply pending migrations in order. Returns the number applied."""
+    cursor = conn.cursor()
+    done = applied_versions(cursor)
+    count = 0
+    if using_sqlite() and len(done) < len(MIGRATIONS):
+        sqlite_backend.create_schema(conn)
+    for version, name, steps in MIGRATIONS:
+        if version in done:
+            continue
+        print(f"Applying {version:03d} {name}")
+        if not using_sqlite():
+            for step in steps:
+                _run_step(cursor, step)
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, applied_at) VALUES (%s, %s, NOW())",
+            (version, name)
+        )
+        conn.commit()
+        count += 1
+    return count
+
+
+def status(conn):
+    done = applied_versions(conn.cursor())
+    for version, name, _ in MIGRATIONS:
+        mark = "applied" if version in done else "PENDING"
+        print(f"  {version:03d} {name:<40} {mark}")
+
+
+def explain(conn):
+    """EXPLAIN every hot query and report whether it uses the expected index"""
+    cursor = conn.cursor(dictionary=True)
+    all_ok = True
+    for desc, query, params, table, index in hot_queries():
+        cursor.execute("EXPLAIN " + query, params)
+        plan = cursor.fetchall()
+        row = next((r for r in plan if r.get('table') == table), {})
+        ok = row.get('key') == index
+        all_ok = all_ok and ok
+        print(f"  {'✓' if ok else '✗'} {desc:<25} type={row.get('type')} key={row.get('key')} (want {index})")
+    return all_ok
+
+
+def main(argv):
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        if "--status" in argv:
+            status(conn)
+        elif "--explain" in argv:
+            return 0 if explain(conn) else 1
+        else:
+            applied = migrate(conn)
+            print(f"✓ {applied} migration(s) applied")
+        return 0
+    except Error as e:
+        print(f"Migration Error: {e}")
+        conn.rollback()
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,289 @@
+# partitions.py
+"""
+Monthly RANGE partitions for the append-only tables, and archival of old months.
+
+    python partitions.py --status
+    python partitions.py --partition          one-time conversion (terminals idle)
+    python partitions.py --extend [MONTHS]    add upcoming months (run monthly)
+    python partitions.py --archive YYYY-MM    move months before YYYY-MM to archive tables
+    python partitions.py --export DIR         write every archive table to DIR as .csv.gz
+    python partitions.py --explain            show partition pruning of the report queries
+
+Each table is partitioned by RANGE COLUMNS on its date column, one partition
+per month plus `pmax`, so report queries filtered by date only open the
+months they cover (the `partitions` column of EXPLAIN).
+
+--archive swaps whole months out with EXCHANGE PARTITION (no row copying)
+into `<table>_archive_YYYYMM` tables, compresses them and records them in
+`archive_catalog`. ReportsModel unions the archive tables a date range
+overlaps back in (archives_for), so old reports still work. Movement totals
+keep coming from stock_daily_rollup, which archiving leaves untouched.
+"""
+import csv
+import gzip
+import os
+import sys
+from datetime import date, datetime
+
+from mysql.connector import Error
+from db_pool import get_connection, using_sqlite
+import migrate
+
+# table -> (id column, date column)
+TABLES = {
+    'stock_transactions': ('transaction_id', 'transaction_date'),
+    'activity_log': ('log_id', 'activity_time'),
+    'user_logins': ('login_id', 'login_time'),
+}
+MONTHS_AHEAD = 3
+# Migration that moved idempotency keys to stock_movement_keys
+KEYS_MIGRATION = 10
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def _partition_def(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{_add_months(month, 1):%Y-%m-%d}')"
+
+
+def existing_partitions(cursor, table):
+    """[(partition name, upper bound text)] in order; empty if not partitioned"""
+    cursor.execute("""
+        SELECT partition_name, partition_description
+        FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (table,))
+    return [(name, bound) for name, bound in cursor.fetchall()]
+
+
+def _months(start, end):
+    month = start
+    while month < end:
+        yield month
+        month = _add_months(month, 1)
+
+
+def partition_table(conn, table, months_ahead=MONTHS_AHEAD):
+    """Convert `table` to monthly partitions. Rebuilds the table: run while terminals are idle."""
+    id_col, date_col = TABLES[table]
+    cursor = conn.cursor()
+    if existing_partitions(cursor, table):
+        print(f"  - {table} is already partitioned")
+        return extend(conn, table, months_ahead)
+    if table == 'stock_transactions' and KEYS_MIGRATION not in migrate.applied_versions(cursor):
+        # Without stock_movement_keys nothing would refuse a second booking
+        print(f"  ✗ {table}: apply migration {KEYS_MIGRATION:03d} first (python -m migrate)")
+        return 0
+
+    cursor.execute(f"SELECT MIN({date_col}) FROM {table}")
+    oldest = cursor.fetchone()[0]
+    first = _month_start(oldest or date.today())
+    end = _add_months(_month_start(date.today()), months_ahead + 1)
+
+    if table == 'stock_transactions':
+        # Unique keys must include the partition column; stock_movement_keys
+        # (migration 10, checked above) now enforces idempotency instead
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = 'ux_st_idempotency'
+        """, (table,))
+        if cursor.fetchone()[0]:
+            cursor.execute("ALTER TABLE stock_transactions DROP INDEX ux_st_idempotency, "
+                           "ADD INDEX ix_st_idempotency (idempotency_key)")
+    # The primary key must contain the date column too
+    cursor.execute(f"ALTER TABLE {table} DROP PRIMARY KEY, ADD PRIMARY KEY ({id_col}, {date_col})")
+    definitions = [_partition_def(m) for m in _months(first, end)]
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS({date_col}) ({', '.join(definitions)})")
+    print(f"  + {table}: {len(definitions) - 1} monthly partition(s) from {first:%Y-%m}")
+    return len(definitions) - 1
+
+
+def extend(conn, table, months_ahead=MONTHS_AHEAD):
+    """Split pmax so partitions exist up to `months_ahead` months from now. Returns months added."""
+    cursor = conn.cursor()
+    parts = existing_partitions(cursor, table)
+    if not parts:
+        print(f"  ✗ {table} is not partitioned (run --partition)")
+        return 0
+    named = [name for name, _ in parts if name != 'pmax']
+    last = datetime.strptime(named[-1][1:], "%Y%m").date() if named else _month_start(date.today())
+    start = _add_months(last, 1) if named else last
+    end = _add_months(_month_start(date.today()), months_ahead + 1)
+    definitions = [_partition_def(m) for m in _months(start, end)]
+    if not definitions:
+        return 0
+    definitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({', '.join(definitions)})")
+    print(f"  + {table}: partitions up to {_add_months(end, -1):%Y-%m}")
+    return len(definitions) - 1
+
+
+def archive(conn, table, before):
+    """
+    Move every whole month before `before` (a date) out of `table` into its
+    own compressed archive table. Returns the archive tables created.
+    """
+    id_col, date_col = TABLES[table]
+    cursor = conn.cursor()
+    created = []
+    for name, _ in existing_partitions(cursor, table):
+        if name == 'pmax':
+            continue
+        month = datetime.strptime(name[1:], "%Y%m").date()
+        if _add_months(month, 1) > before:
+            break
+        target = f"{table}_archive_{month:%Y%m}"
+        cursor.execute(f"DROP TABLE IF EXISTS {target}")
+        cursor.execute(f"CREATE TABLE {target} LIKE {table}")
+        cursor.execute(f"ALTER TABLE {target} REMOVE PARTITIONING")
+        # Metadata-only swap: the month's rows now belong to the archive table
+        cursor.execute(f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {target}")
+        cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+        try:
+            cursor.execute(f"ALTER TABLE {target} ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8")
+        except Error as e:
+            print(f"  ! {target} left uncompressed: {e.msg}")
+        cursor.execute(f"SELECT COUNT(*) FROM {target}")
+        rows = cursor.fetchone()[0]
+        cursor.execute("""
+            REPLACE INTO archive_catalog
+            (archive_table, source_table, range_start, range_end, row_count, archived_at)
+            VALUES (%s, %s, %s, %s, %s, NOW())
+        """, (target, table, month, _add_months(month, 1), rows))
+        conn.commit()
+        print(f"  + {target}: {rows} row(s)")
+        created.append(target)
+    return created
+
+
+def archives_for(table, lower, upper):
+    """Archive tables of `table` holding rows in [lower, upper), oldest first"""
+    conn = get_connection()
+    if not conn: return []
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT archive_table FROM archive_catalog
+            WHERE source_table = %s AND range_start < %s AND range_end > %s
+            ORDER BY range_start
+        """, (table, upper, lower))
+        return [row[0] for row in cursor.fetchall()]
+    except Error as e:
+        print(f"Error reading archive catalogue: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def export(conn, directory):
+    """Write every archive table to `directory`/<table>.csv.gz. Returns the files written."""
+    os.makedirs(directory, exist_ok=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT archive_table FROM archive_catalog ORDER BY source_table, range_start")
+    written = []
+    for (name,) in cursor.fetchall():
+        path = os.path.join(directory, f"{name}.csv.gz")
+        rows = conn.cursor(buffered=False)
+        rows.execute(f"SELECT * FROM {name}")
+        with gzip.open(path, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(rows.column_names)
+            while True:
+                batch = rows.fetchmany(1000)
+                if not batch:
+                    break
+                writer.writerows(batch)
+        rows.close()
+        print(f"  + {path}")
+        written.append(path)
+    return written
+
+
+def status(conn):
+    cursor = conn.cursor()
+    for table in TABLES:
+        parts = existing_partitions(cursor, table)
+        if parts:
+            print(f"  {table:<20} {len(parts)} partition(s): {parts[0][0]} .. {parts[-1][0]}")
+        else:
+            print(f"  {table:<20} not partitioned")
+    cursor.execute("SELECT source_table, COUNT(*), SUM(row_count) FROM archive_catalog GROUP BY source_table")
+    for table, count, rows in cursor.fetchall():
+        print(f"  {table:<20} {count} archived month(s), {rows} row(s)")
+
+
+def explain(conn):
+    """EXPLAIN the date-filtered report queries for last month and show the partitions read"""
+    from AreportModel import STOCK_MOVEMENT_QUERY, DEFECTIVE_REPORT_QUERY, USER_ACTIVITY_QUERY
+
+    month = _add_months(_month_start(date.today()), -1)
+    bounds = (month.strftime(DATETIME_FORMAT), _add_months(month, 1).strftime(DATETIME_FORMAT))
+    cursor = conn.cursor(dictionary=True)
+    all_ok = True
+    for label, query, table in (("Stock Movement", STOCK_MOVEMENT_QUERY, 'stock_transactions'),
+                                ("Defective Report", DEFECTIVE_REPORT_QUERY, 'stock_transactions'),
+                                ("User Activity", USER_ACTIVITY_QUERY, 'user_logins')):
+        cursor.execute("EXPLAIN " + query.format(source=table), bounds)
+        plan = cursor.fetchall()
+        alias = 'l' if table == 'user_logins' else 't'
+        row = next((r for r in plan if r.get('table') == alias), {})
+        partitions = row.get('partitions') or ""
+        ok = partitions == partition_name(month)
+        all_ok = all_ok and ok
+        print(f"  {'✓' if ok else '✗'} {label:<18} partitions={partitions or '-'} (want {partition_name(month)})")
+    return all_ok
+
+
+def main(argv):
+    if using_sqlite():
+        print("Partitioning needs the MySQL backend (PYESATRAK_DB_BACKEND=mysql)")
+        return 1
+    conn = get_connection()
+    if not conn:
+        return 1
+    try:
+        if "--partition" in argv:
+            for table in TABLES:
+                partition_table(conn, table)
+        elif "--extend" in argv:
+            i = argv.index("--extend")
+            months = int(argv[i + 1]) if len(argv) > i + 1 else MONTHS_AHEAD
+            for table in TABLES:
+                extend(conn, table, months)
+        elif "--archive" in argv:
+            before = datetime.strptime(argv[argv.index("--archive") + 1], "%Y-%m").date()
+            for table in TABLES:
+                archive(conn, table, before)
+        elif "--export" in argv:
+            export(conn, argv[argv.index("--export") + 1])
+        elif "--explain" in argv:
+            return 0 if explain(conn) else 1
+        elif "--status" in argv:
+            status(conn)
+        else:
+            print(__doc__)
+            return 1
+        return 0
+    except (Error, IndexError, ValueError) as e:
+        print(f"Partition Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
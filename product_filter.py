@@ -0,0 +1,130 @@
+# product_filter.py
+"""
+Structured product filter compiled to parameterised SQL.
+
+Filter VALUES are always bound as %s parameters, so the statement text only
+depends on which fields are set (its "shape"), never on what the user typed.
+The server sees a handful of stable statements it can prepare and cache,
+instead of a new SQL string per filter.
+"""
+
+
+class ProductFilter:
+    # sort key -> inventory column (whitelist; never interpolate user input).
+    # Only NOT NULL columns: the keyset seek compares against the last value.
+    SORT_COLUMNS = {
+        'product_id': 'product_id',
+        'name': 'product_name',
+        'stock': 'stock_quantity',
+    }
+
+    def __init__(self, statuses=None, min_stock=None, max_stock=None,
+                 brand=None, search=None, sort_key='product_id'):
+        if sort_key not in self.SORT_COLUMNS:
+            raise ValueError(f"Unknown sort key: {sort_key}")
+        self.statuses = tuple(sorted(statuses)) if statuses else ()
+        self.min_stock = None if min_stock is None else int(min_stock)
+        self.max_stock = None if max_stock is None else int(max_stock)
+        self.brand = brand or None
+        self.search = (search or "").strip() or None
+        self.sort_key = sort_key
+
+    # --- Presets used by the dashboard KPI cards ---
+    @classmethod
+    def all_products(cls):
+        return cls()
+
+    @classmethod
+    def low_stock(cls):
+        """stock <= 10 but > 0"""
+        return cls(min_stock=1, max_stock=10)
+
+    @classmethod
+    def out_of_stock(cls):
+        """stock = 0"""
+        return cls(min_stock=0, max_stock=0)
+
+    def where(self):
+        """(sql, params) for the WHERE clause body; '1=1' when nothing is set"""
+        clauses, params = [], []
+        if self.statuses:
+            clauses.append(f"status IN ({', '.join(['%s'] * len(self.statuses))})")
+            params.extend(self.statuses)
+        if self.min_stock is not None and self.min_stock == self.max_stock:
+            clauses.append("stock_quantity = %s")
+            params.append(self.min_stock)
+        else:
+            if self.min_stock is not None:
+                clauses.append("stock_quantity >= %s")
+                params.append(self.min_stock)
+            if self.max_stock is not None:
+                clauses.append("stock_quantity <= %s")
+                params.append(self.max_stock)
+        if self.brand:
+            clauses.append("brand = %s")
+            params.append(self.brand)
+        if self.search:
+            term = f"%{self.search}%"
+            clauses.append("(product_name LIKE %s OR brand LIKE %s OR model LIKE %s)")
+            params.extend([term, term, term])
+        return (" AND ".join(clauses) or "1=1"), params
+
+    def order_by(self):
+        column = self.SORT_COLUMNS[self.sort_key]
+        if column == 'product_id':
+            return "product_id ASC"
+        # product_id breaks ties so keyset pages never skip or repeat rows
+        return f"{column} ASC, product_id ASC"
+
+    def sort_value(self, row):
+        """Value of the sort column in a fetched row (the keyset cursor)"""
+        return row.get(self.SORT_COLUMNS[self.sort_key])
+
+    def seek(self, after_product_id, after_sort_value=None):
+        """(sql, params) selecting rows after the keyset cursor"""
+        column = self.SORT_COLUMNS[self.sort_key]
+        if column == 'product_id' or after_sort_value is None:
+            return "product_id > %s", [after_product_id]
+        return (f"({column} > %s OR ({column} = %s AND product_id > %s))",
+                [after_sort_value, after_sort_value, after_product_id])
+
+    def matches(self, row):
+        """Python twin of where(), for merging changed rows into a loaded listing"""
+        qty = row.get('stock_quantity')
+        if self.statuses and row.get('status') not in self.statuses:
+            return False
+        if self.min_stock is not None and qty < self.min_stock:
+            return False
+        if self.max_stock is not None and qty > self.max_stock:
+            return False
+        if self.brand and (row.get('brand') or "").lower() != self.brand.lower():
+            return False
+        if self.search:
+            term = self.search.lower()
+            if not any(term in (row.get(col) or "").lower() for col in ('product_name', 'brand', 'model')):
+                return False
+        return True
+
+    def sort_tuple(self, row):
+        """Local sort key matching order_by() (strings case-insensitive, like the server collation)"""
+        column = self.SORT_COLUMNS[self.sort_key]
+        if column == 'product_id':
+            return (row['product_id'],)
+        value = row.get(column)
+        return (value.lower() if isinstance(value, str) else value, row['product_id'])
+
+    def cursor_row(self, after_product_id, after_sort_value=None):
+        """A keyset cursor shaped like a row, so it can be compared with sort_tuple()"""
+        row = {'product_id': after_product_id}
+        row[self.SORT_COLUMNS[self.sort_key]] = after_sort_value
+        return row
+
+    def __eq__(self, other):
+        return isinstance(other, ProductFilter) and vars(self) == vars(other)
+
+    def __hash__(self):
+        return hash(tuple(sorted(vars(self).items())))
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v not in (None, ()))
+        return f"ProductFilter({fields})"
@@ -0,0 +1,224 @@
+# product_import.py
+"""
+Bulk product import from a supplier CSV.
+
+    python product_import.py catalogue.csv [--user-id N]
+
+The file is streamed and handled CHUNK_SIZE rows at a time: each chunk is
+validated, inserted into `inventory` with one multi-row INSERT, and its
+initial 'IN' transactions, activity entries and KPI counter changes are
+written in bulk in the same transaction. Only one chunk is held in memory.
+
+Expected header: product_name, brand, model, stock_quantity[, description]
+"""
+import csv
+import sys
+import time
+from itertools import islice
+
+from mysql.connector import Error
+from db_pool import get_connection
+import kpi_counters
+
+# Rows validated and committed per transaction
+CHUNK_SIZE = 500
+
+# Column widths from the inventory table (see migrate.py)
+MAX_LENGTHS = {'product_name': 255, 'brand': 100, 'model': 100}
+
+
+def stock_status(qty):
+    """Same rule as ProductDetailsModel.add_new_product"""
+    if qty == 0:
+        return 'Out of Stock'
+    if qty <= 10:
+        return 'Low Stock'
+    return 'Available'
+
+
+def validate_row(row):
+    """(product dict, None) for a good CSV row, (None, reason) otherwise"""
+    name = (row.get('product_name') or "").strip()
+    if not name:
+        return None, "product_name is required"
+    product = {
+        'product_name': name,
+        'brand': (row.get('brand') or "").strip(),
+        'model': (row.get('model') or "").strip(),
+        'description': (row.get('description') or "").strip(),
+    }
+    for column, limit in MAX_LENGTHS.items():
+        if len(product[column]) > limit:
+            return None, f"{column} longer than {limit} characters"
+    raw_qty = (row.get('stock_quantity') or "0").strip()
+    try:
+        qty = int(raw_qty)
+    except ValueError:
+        return None, f"stock_quantity '{raw_qty}' is not a whole number"
+    if qty < 0:
+        return None, "stock_quantity cannot be negative"
+    product['stock_quantity'] = qty
+    product['status'] = stock_status(qty)
+    return product, None
+
+
+def _insert_products(cursor, products):
+    """
+    Insert a chunk with ONE statement and return the new product_ids in order.
+    MySQL reports the first generated id; the rest follow consecutively unless
+    a concurrent insert interleaved (innodb_autoinc_lock_mode = 2), which is
+    checked by reading the range back. On a mismatch the caller falls back.
+    """
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, NOW(), NOW())"] * len(products))
+    params = []
+    for p in products:
+        params.extend([p['product_name'], p['brand'], p['model'], p['description'],
+                       p['stock_quantity'], p['status']])
+    cursor.execute(f"""
+        INSERT INTO inventory (product_name, brand, model, description, stock_quantity, status, created_at, updated_at)
+        VALUES {values}
+    """, tuple(params))
+
+    first_id = cursor.lastrowid
+    ids = list(range(first_id, first_id + len(products)))
+    cursor.execute(
+        "SELECT product_id, product_name FROM inventory WHERE product_id BETWEEN %s AND %s ORDER BY product_id",
+        (ids[0], ids[-1])
+    )
+    names = [row[1] for row in cursor.fetchall()]
+    if names != [p['product_name'] for p in products]:
+        return None
+    return ids
+
+
+def _insert_products_one_by_one(cursor, products):
+    ids = []
+    for p in products:
+        cursor.execute("""
+            INSERT INTO inventory (product_name, brand, model, description, stock_quantity, status, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
+        """, (p['product_name'], p['brand'], p['model'], p['description'], p['stock_quantity'], p['status']))
+        ids.append(cursor.lastrowid)
+    return ids
+
+
+def _write_chunk(conn, products, user_id):
+    """Insert one validated chunk and its ledger/activity rows in one transaction"""
+    cursor = conn.cursor()
+    conn.start_transaction()
+    ids = _insert_products(cursor, products)
+    if ids is None:
+        # Ids were not consecutive - redo this chunk row by row
+        conn.rollback()
+        conn.start_transaction()
+        ids = _insert_products_one_by_one(cursor, products)
+
+    stocked = [(pid, p) for pid, p in zip(ids, products) if p['stock_quantity'] > 0]
+    if stocked:
+        txn_params, activity_params = [], []
+        for pid, p in stocked:
+            txn_params.extend([pid, 'IN', p['stock_quantity'], 'Initial stock - Product imported', user_id])
+            activity_params.extend([
+                user_id,
+                f"Added product '{p['product_name']}' with initial stock: {p['stock_quantity']}"
+            ])
+        cursor.execute(f"""
+            INSERT INTO stock_transactions
+            (product_id, transaction_type, quantity, remarks, performed_by, transaction_date)
+            VALUES {', '.join(['(%s, %s, %s, %s, %s, NOW())'] * len(stocked))}
+        """, tuple(txn_params))
+        cursor.execute(f"""
+            INSERT INTO activity_log (user_id, activity_description, activity_time)
+            VALUES {', '.join(['(%s, %s, NOW())'] * len(stocked))}
+        """, tuple(activity_params))
+
+    deltas = {'total_products': len(products)}
+    for p in products:
+        bucket = kpi_counters.stock_bucket(p['stock_quantity'])
+        if bucket:
+            deltas[bucket] = deltas.get(bucket, 0) + 1
+    kpi_counters.apply_deltas(cursor, deltas)
+    conn.commit()
+    kpi_counters.bump_catalogue_version(conn)  # Invalidates cached catalogues
+
+
+def import_csv(path, user_id, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Stream `path` into the inventory. Returns a summary dict:
+    imported, rejected [(line number, reason)], seconds, rows_per_second,
+    and error (set if the database stopped the import part-way).
+    Chunks committed before an error stay imported.
+    progress(imported, rejected_count) is called after every chunk.
+    """
+    summary = {'imported': 0, 'rejected': [], 'seconds': 0.0, 'rows_per_second': 0.0, 'error': None}
+    started = time.monotonic()
+    conn = get_connection()
+    if not conn:
+        summary['error'] = "Database connection failed"
+        return summary
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or 'product_name' not in reader.fieldnames:
+                summary['error'] = "CSV header must include product_name"
+                return summary
+            line_no = 1  # header; data rows are numbered as a spreadsheet shows them
+            while True:
+                rows = list(islice(reader, chunk_size))
+                if not rows:
+                    break
+                products = []
+                for row in rows:
+                    line_no += 1
+                    product, reason = validate_row(row)
+                    if product:
+                        products.append(product)
+                    else:
+                        summary['rejected'].append((line_no, reason))
+                if products:
+                    _write_chunk(conn, products, user_id)
+                    summary['imported'] += len(products)
+                if progress:
+                    progress(summary['imported'], len(summary['rejected']))
+    except (Error, OSError, csv.Error) as e:
+        print(f"Error importing products: {e}")
+        summary['error'] = str(e)
+        try:
+            conn.rollback()
+        except Error:
+            pass
+    finally:
+        conn.close()
+        summary['seconds'] = time.monotonic() - started
+        if summary['seconds'] > 0:
+            summary['rows_per_second'] = summary['imported'] / summary['seconds']
+    return summary
+
+
+def format_summary(summary, max_rejected=10):
+    """Human-readable report used by the CLI and the import dialog"""
+    lines = [
+        f"Imported {summary['imported']} product(s) in {summary['seconds']:.1f}s "
+        f"({summary['rows_per_second']:.0f} rows/s)",
+        f"Rejected {len(summary['rejected'])} row(s)",
+    ]
+    for line_no, reason in summary['rejected'][:max_rejected]:
+        lines.append(f"  line {line_no}: {reason}")
+    if len(summary['rejected']) > max_rejected:
+        lines.append(f"  ... and {len(summary['rejected']) - max_rejected} more")
+    if summary['error']:
+        lines.append(f"Stopped early: {summary['error']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print("Usage: python product_import.py catalogue.csv [--user-id N]")
+        sys.exit(1)
+    user = 1
+    if "--user-id" in args:
+        user = int(args[args.index("--user-id") + 1])
+    result = import_csv(args[0], user)
+    print(format_summary(result, max_rejected=50))
+    sys.exit(1 if result['error'] else 0)
@@ -0,0 +1,70 @@
+# product_sync.py
+"""
+Client-side copy of the product catalogue kept current with deltas.
+
+LocalCatalogue asks the model for rows changed since its high-water mark
+(get_products_changed_since) and merges them, so a refresh costs one query
+whose size depends on how much changed, not on how many products exist.
+
+merge_listing() applies the same delta to a paginated, filtered listing
+already on screen without refetching its pages.
+"""
+
+
+class LocalCatalogue:
+    def __init__(self, model, full=True):
+        """
+        full=True keeps every product (first sync loads them all, e.g. for the
+        stock dialogs). full=False only tracks changes from the first sync on,
+        for screens that page through the catalogue themselves.
+        """
+        self.model = model
+        self.full = full
+        self.rows = {}
+        self.mark = None
+
+    def start(self):
+        """Begin tracking changes from now (call before loading the first page)"""
+        if not self.full:
+            self.mark = self.model.get_sync_mark()
+
+    def sync(self):
+        """Merge changes since the last sync. Returns (changed rows, deleted ids)."""
+        if self.mark is None and not self.full:
+            self.start()
+            return [], []
+        delta = self.model.get_products_changed_since(self.mark)
+        if delta is None:
+            return [], []
+        for pid in delta['deleted_ids']:
+            self.rows.pop(pid, None)
+        if self.full:
+            for row in delta['changed']:
+                self.rows[row['product_id']] = row
+        self.mark = delta['high_water_mark']
+        return delta['changed'], delta['deleted_ids']
+
+    def products(self):
+        """Every product, in product_id order (full mode)"""
+        self.sync()
+        return [self.rows[pid] for pid in sorted(self.rows)]
+
+
+def merge_listing(rows, changed, deleted_ids, product_filter, cursor_row=None):
+    """
+    Apply a delta to `rows`, a listing loaded page by page in product_filter
+    order. Changed rows that no longer match the filter drop out; new or
+    newly-matching rows are added if they sort before the keyset cursor
+    (cursor_row; None means every page is already loaded). Returns the new list.
+    """
+    by_id = {row['product_id']: row for row in rows}
+    for pid in deleted_ids:
+        by_id.pop(pid, None)
+    limit = product_filter.sort_tuple(cursor_row) if cursor_row else None
+    for row in changed:
+        pid = row['product_id']
+        if not product_filter.matches(row):
+            by_id.pop(pid, None)
+        elif pid in by_id or limit is None or product_filter.sort_tuple(row) <= limit:
+            by_id[pid] = row
+    return sorted(by_id.values(), key=product_filter.sort_tuple)
@@ -0,0 +1,687 @@
+# sqlite_backend.py
+"""
+Embedded SQLite engine behind the same connection API as the MySQL pool.
+
+    PYESATRAK_DB_BACKEND=sqlite PYESATRAK_SQLITE_PATH=pyesatrak.db python -m migrate
+    python sqlite_backend.py --add-admin USERNAME PASSWORD
+
+db_pool.get_connection() hands out SQLiteConnection objects from a
+SQLitePool when the backend is "sqlite", so every model, cache and CLI runs
+unchanged against a local file (laptops, test boxes, benchmarks):
+
+- cursors take the same arguments (dictionary / prepared / buffered) and
+  return datetime / date objects for DATETIME / DATE columns;
+- errors are raised as mysql.connector errors with the MySQL errno the
+  models already branch on (1062 duplicate key, 1205 lock timeout, 1305
+  missing routine - sp_update_stock does not exist here, so update_stock
+  takes its per-statement path);
+- translate() rewrites the MySQL dialect the app uses (%s placeholders,
+  NOW(), INTERVAL, DATE_FORMAT, CONCAT, ON DUPLICATE KEY UPDATE,
+  UPDATE ... JOIN, FOR UPDATE, ...) once per SQL text;
+- EXPLAIN returns MySQL-shaped plan rows (table, type, key) built from
+  EXPLAIN QUERY PLAN, and SHOW GLOBAL STATUS LIKE 'Questions' reports the
+  statements run in this process, so the --explain checks and
+  bench_stock.py work too.
+
+Transactions: start_transaction() is BEGIN IMMEDIATE, which takes the
+database write lock up front - the closest match to SELECT ... FOR UPDATE.
+Writers queue behind it for LOCK_TIMEOUT seconds (WAL mode keeps readers
+unblocked), then get errno 1205 and db_retry tries again.
+
+SCHEMA is the layout migrate.py produces on MySQL (latest version). A new
+migration needs its SQLite counterpart added here. Partitioning and
+archival (partitions.py) are MySQL-only. Needs SQLite 3.35 or newer.
+"""
+import queue
+import re
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import count
+
+from mysql.connector import errors
+from mysql.connector.errors import PoolError
+
+LOCK_TIMEOUT = 5  # seconds a writer waits for the database lock
+
+ER_DUP_ENTRY = 1062
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_NO_SUCH_TABLE = 1146
+ER_BAD_FIELD_ERROR = 1054
+ER_PARSE_ERROR = 1064
+ER_SP_DOES_NOT_EXIST = 1305
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        userFname VARCHAR(100) NOT NULL COLLATE NOCASE,
+        userMname VARCHAR(100) NULL COLLATE NOCASE,
+        userLname VARCHAR(100) NOT NULL COLLATE NOCASE,
+        username VARCHAR(50) NOT NULL COLLATE NOCASE,
+        password VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL DEFAULT 'Staff' COLLATE NOCASE,
+        status VARCHAR(20) NOT NULL DEFAULT 'Active' COLLATE NOCASE
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_users_username ON users (username);
+
+    CREATE TABLE IF NOT EXISTS inventory (
+        product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_name VARCHAR(255) NOT NULL COLLATE NOCASE,
+        brand VARCHAR(100) NULL COLLATE NOCASE,
+        model VARCHAR(100) NULL COLLATE NOCASE,
+        description TEXT NULL,
+        stock_quantity INT NOT NULL DEFAULT 0,
+        status VARCHAR(30) NULL COLLATE NOCASE,
+        created_at DATETIME NULL,
+        updated_at DATETIME NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_inventory_stock ON inventory (stock_quantity);
+    CREATE INDEX IF NOT EXISTS ix_inventory_updated ON inventory (updated_at);
+
+    CREATE TABLE IF NOT EXISTS stock_transactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INT NOT NULL,
+        transaction_type VARCHAR(10) NOT NULL,
+        quantity INT NOT NULL,
+        remarks TEXT NULL,
+        performed_by INT NULL,
+        transaction_date DATETIME NOT NULL,
+        idempotency_key CHAR(36) NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_st_date ON stock_transactions (transaction_date);
+    CREATE INDEX IF NOT EXISTS ix_st_type_date ON stock_transactions (transaction_type, transaction_date);
+    CREATE INDEX IF NOT EXISTS ix_st_product_date ON stock_transactions (product_id, transaction_date);
+    CREATE INDEX IF NOT EXISTS ix_st_type_product
+        ON stock_transactions (transaction_type, product_id, transaction_date, quantity);
+    CREATE INDEX IF NOT EXISTS ix_st_idempotency ON stock_transactions (idempotency_key);
+
+    CREATE TABLE IF NOT EXISTS activity_log (
+        log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INT NULL,
+        activity_description TEXT NOT NULL,
+        activity_time DATETIME NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS user_logins (
+        login_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INT NOT NULL,
+        login_time DATETIME NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_logins_time ON user_logins (login_time);
+
+    CREATE TABLE IF NOT EXISTS saved_reports (
+        report_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        report_name VARCHAR(255) NOT NULL,
+        report_type VARCHAR(50) NOT NULL,
+        start_date DATE NULL,
+        end_date DATE NULL,
+        requested_by INT NULL,
+        processed_by INT NULL,
+        validated_by INT NULL,
+        validated_at DATETIME NULL,
+        transaction_id INT NULL,
+        created_at DATETIME NOT NULL,
+        report_status VARCHAR(20) NOT NULL DEFAULT 'Processed'
+    );
+
+    CREATE TABLE IF NOT EXISTS kpi_counters (
+        counter_name VARCHAR(50) NOT NULL PRIMARY KEY,
+        counter_value BIGINT NOT NULL DEFAULT 0,
+        updated_at DATETIME NULL
+    );
+    INSERT OR IGNORE INTO kpi_counters (counter_name, counter_value, updated_at)
+    VALUES ('catalogue_version', 1, datetime('now', 'localtime')),
+           ('rollup_transaction_id', 0, datetime('now', 'localtime')),
+           ('user_directory_version', 1, datetime('now', 'localtime'));
+
+    CREATE TABLE IF NOT EXISTS inventory_deletions (
+        product_id INT NOT NULL PRIMARY KEY,
+        deleted_at DATETIME NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_deletions_time ON inventory_deletions (deleted_at);
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_deleted AFTER DELETE ON inventory
+    FOR EACH ROW BEGIN
+        INSERT INTO inventory_deletions (product_id, deleted_at)
+        VALUES (OLD.product_id, datetime('now', 'localtime'))
+        ON CONFLICT (product_id) DO UPDATE SET deleted_at = excluded.deleted_at;
+    END;
+
+    CREATE TABLE IF NOT EXISTS stock_daily_rollup (
+        day DATE NOT NULL,
+        product_id INT NOT NULL,
+        transaction_type VARCHAR(10) NOT NULL,
+        qty BIGINT NOT NULL DEFAULT 0,
+        txn_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, product_id, transaction_type)
+    );
+    CREATE INDEX IF NOT EXISTS ix_rollup_product_day ON stock_daily_rollup (product_id, day);
+
+    CREATE TABLE IF NOT EXISTS stock_rollup_gaps (
+        transaction_id INT NOT NULL PRIMARY KEY,
+        seen_at DATETIME NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS stock_movement_keys (
+        idempotency_key CHAR(36) NOT NULL PRIMARY KEY,
+        transaction_id INT NULL,
+        booked_at DATETIME NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_keys_booked ON stock_movement_keys (booked_at);
+
+    CREATE TABLE IF NOT EXISTS archive_catalog (
+        archive_table VARCHAR(64) NOT NULL PRIMARY KEY,
+        source_table VARCHAR(64) NOT NULL,
+        range_start DATETIME NOT NULL,
+        range_end DATETIME NOT NULL,
+        row_count INT NOT NULL DEFAULT 0,
+        archived_at DATETIME NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_catalog_source ON archive_catalog (source_table, range_start);
+"""
+
+_statements = 0  # reported as the 'Questions' status counter
+_stats_lock = threading.Lock()
+_connection_ids = count(-1, -1)  # negative: never equal to a MySQL connection id
+
+
+# --- Values in and out -------------------------------------------------------
+
+def _adapt_datetime(value):
+    # Same text NOW() produces, so stored values compare and sort as text
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _convert_datetime(value):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_date(value):
+    text = value.decode()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter("DATETIME", _convert_datetime)
+sqlite3.register_converter("DATE", _convert_date)
+
+
+# --- Dialect translation ------------------------------------------------------
+
+DATE_FORMAT_CODES = {'i': '%M', 's': '%S'}  # MySQL code -> strftime; the rest are the same
+
+_CALL = re.compile(r"^\s*CALL\s+(\w+)", re.I)
+_SHOW_QUESTIONS = re.compile(r"^\s*SHOW\s+GLOBAL\s+STATUS\s+LIKE\s+'Questions'\s*$", re.I)
+_EXPLAIN = re.compile(r"^\s*EXPLAIN\s+", re.I)
+_INSERT = re.compile(r"^\s*(INSERT|REPLACE)\b", re.I)
+_UPDATE_JOIN = re.compile(r"^\s*UPDATE\s+(\w+)\s+(?:AS\s+)?(\w+)\s+JOIN\s*\(", re.I)
+_JOIN_TAIL = re.compile(r"\s*(?:AS\s+)?(\w+)\s+ON\s+(.*?)\s+SET\s+", re.I | re.S)
+
+# (pattern, replacement) applied outside string literals, in order
+_REWRITES = [
+    (re.compile(r"\bNOW\(\)\s*-\s*INTERVAL\s+(%s|\d+)\s+(SECOND|MINUTE|HOUR|DAY)\b", re.I),
+     lambda m: f"datetime('now', 'localtime', '-' || {m.group(1)} || ' {m.group(2).lower()}s')"),
+    (re.compile(r"\bNOW\(\)", re.I), lambda m: "datetime('now', 'localtime')"),
+    (re.compile(r"\bCURDATE\(\)", re.I), lambda m: "date('now', 'localtime')"),
+    (re.compile(r"\bLAST_INSERT_ID\(\)", re.I), lambda m: "last_insert_rowid()"),
+    (re.compile(r"\bINSERT\s+IGNORE\b", re.I), lambda m: "INSERT OR IGNORE"),
+    (re.compile(r"\s+FOR\s+UPDATE\b", re.I), lambda m: ""),
+    (re.compile(r"%s"), lambda m: "?"),
+]
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_REF = re.compile(r"\bVALUES\((\w+)\)", re.I)
+
+
+def _mask(sql):
+    """
+    `sql` with the inside of every '...' literal and -- comment blanked out
+    (same length), so keywords, commas and parentheses are only matched in
+    SQL text. Positions in the mask are positions in `sql`.
+    """
+    out = []
+    i, n = 0, len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch == "'":
+            out.append(ch)
+            i += 1
+            while i < n:
+                if sql[i] == "\\" or (sql[i] == "'" and sql[i + 1:i + 2] == "'"):
+                    out.append("__")
+                    i += 2
+                elif sql[i] == "'":
+                    break
+                else:
+                    out.append("_")
+                    i += 1
+            if i < n:
+                out.append("'")
+                i += 1
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = n if end < 0 else end
+            out.append(" " * (end - i))
+            i = end
+        else:
+            out.append(ch)
+            i += 1
+    return "".join(out)[:n]
+
+
+def _closing_paren(masked, open_pos):
+    depth = 0
+    for i in range(open_pos, len(masked)):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise errors.ProgrammingError(msg="Unbalanced parentheses in SQL", errno=ER_PARSE_ERROR)
+
+
+def _top_level(masked, start, end, pattern):
+    """First match of `pattern` in masked[start:end] outside parentheses, or None"""
+    depth = 0
+    for i in range(start, end):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+        elif depth == 0:
+            m = pattern.match(masked, i, end)
+            if m:
+                return m
+    return None
+
+
+def _split_args(masked, start, end):
+    """(start, end) spans of the comma-separated arguments in masked[start:end]"""
+    spans, depth, begin = [], 0, start
+    for i in range(start, end):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+        elif masked[i] == "," and depth == 0:
+            spans.append((begin, i))
+            begin = i + 1
+    spans.append((begin, end))
+    return spans
+
+
+def _rewrite_calls(sql, name, build):
+    """Replace every call name(args...) with build([arg sql, ...])"""
+    pattern = re.compile(r"\b%s\s*\(" % name, re.I)
+    while True:
+        masked = _mask(sql)
+        m = pattern.search(masked)
+        if not m:
+            return sql
+        close = _closing_paren(masked, m.end() - 1)
+        args = [sql[a:b].strip() for a, b in _split_args(masked, m.end(), close)]
+        sql = sql[:m.start()] + build(args) + sql[close + 1:]
+
+
+def _date_format(args):
+    value, fmt = args
+    fmt = re.sub(r"%(\w)", lambda m: DATE_FORMAT_CODES.get(m.group(1), m.group(0)), fmt)
+    return f"strftime({fmt}, {value})"
+
+
+def _concat(args):
+    return "(" + " || ".join(args) + ")"
+
+
+def _rewrite_update_join(sql):
+    """
+    UPDATE t a JOIN (derived) d ON cond SET a.col = ... [WHERE w]
+    -> UPDATE t AS a SET col = ... FROM (derived) AS d WHERE cond [AND (w)]
+    """
+    masked = _mask(sql)
+    head = _UPDATE_JOIN.match(masked)
+    if not head:
+        return sql
+    table, alias = head.group(1), head.group(2)
+    close = _closing_paren(masked, head.end() - 1)
+    derived = sql[head.end() - 1:close + 1]
+    tail = _JOIN_TAIL.match(masked, close + 1)
+    if not tail:
+        return sql
+    derived_alias = tail.group(1)
+    condition = sql[tail.start(2):tail.end(2)]
+    where = _top_level(masked, tail.end(), len(sql), re.compile(r"\bWHERE\b", re.I))
+    set_end = where.start() if where else len(sql)
+    assignments = re.sub(r"\b%s\.(\w+)(\s*=)" % alias, r"\1\2", sql[tail.end():set_end])
+    extra = f" AND ({sql[where.end():].strip()})" if where else ""
+    return (f"UPDATE {table} AS {alias} SET {assignments.rstrip()} "
+            f"FROM {derived} AS {derived_alias} WHERE {condition}{extra}")
+
+
+def _rewrite_upsert(sql):
+    """ON DUPLICATE KEY UPDATE c = VALUES(c) -> ON CONFLICT DO UPDATE SET c = excluded.c"""
+    m = _ON_DUPLICATE.search(_mask(sql))
+    if not m:
+        return sql
+    updates = _VALUES_REF.sub(r"excluded.\1", sql[m.end():])
+    return sql[:m.start()] + "ON CONFLICT DO UPDATE SET" + updates
+
+
+@lru_cache(maxsize=512)
+def translate(sql):
+    """MySQL statement text -> SQLite statement text (cached per SQL string)"""
+    sql = _rewrite_update_join(sql)
+    sql = _rewrite_calls(sql, "DATE_FORMAT", _date_format)
+    sql = _rewrite_calls(sql, "CONCAT", _concat)
+    sql = _rewrite_upsert(sql)
+    for pattern, build in _REWRITES:
+        masked = _mask(sql)
+        pieces, last = [], 0
+        for m in pattern.finditer(masked):
+            pieces.append(sql[last:m.start()])
+            pieces.append(build(m))
+            last = m.end()
+        sql = "".join(pieces) + sql[last:]
+    return sql
+
+
+# --- Errors -------------------------------------------------------------------
+
+def _error(exc):
+    """sqlite3 exception -> mysql.connector error carrying the matching MySQL errno"""
+    msg = str(exc)
+    if isinstance(exc, sqlite3.IntegrityError):
+        if "UNIQUE" in msg or "PRIMARY KEY" in msg:
+            return errors.IntegrityError(msg=msg, errno=ER_DUP_ENTRY, sqlstate="23000")
+        return errors.IntegrityError(msg=msg, sqlstate="23000")
+    if "locked" in msg or "busy" in msg:
+        return errors.OperationalError(msg=msg, errno=ER_LOCK_WAIT_TIMEOUT, sqlstate="HY000")
+    if "no such table" in msg:
+        return errors.ProgrammingError(msg=msg, errno=ER_NO_SUCH_TABLE, sqlstate="42S02")
+    if "no such column" in msg:
+        return errors.ProgrammingError(msg=msg, errno=ER_BAD_FIELD_ERROR, sqlstate="42S22")
+    if "syntax error" in msg:
+        return errors.ProgrammingError(msg=msg, errno=ER_PARSE_ERROR, sqlstate="42000")
+    return errors.DatabaseError(msg=msg)
+
+
+def _count_statement():
+    global _statements
+    with _stats_lock:
+        _statements += 1
+
+
+def statements():
+    """Statements run on SQLite connections in this process"""
+    with _stats_lock:
+        return _statements
+
+
+# --- Connections --------------------------------------------------------------
+
+_PLAN_ROW = re.compile(
+    r"^(SCAN|SEARCH)(?: TABLE)? (\w+)(?: AS (\w+))?"
+    r"(?: USING (?:(?:COVERING )?INDEX (\w+)|(INTEGER PRIMARY KEY|PRIMARY KEY)))?")
+
+
+def _plan_rows(raw_rows):
+    """EXPLAIN QUERY PLAN rows -> MySQL-style EXPLAIN rows (table, type, key, ...)"""
+    rows = []
+    for _, _, _, detail in raw_rows:
+        m = _PLAN_ROW.match(detail)
+        if not m:
+            continue
+        kind, table, alias, index, pk = m.groups()
+        key = "PRIMARY" if pk or (index or "").startswith("sqlite_autoindex_") else index
+        if kind == "SCAN":
+            access = "index" if key else "ALL"
+        else:
+            access = "range" if re.search(r"[<>]", detail) else "ref"
+        rows.append({'id': len(rows) + 1, 'select_type': 'SIMPLE', 'table': alias or table,
+                     'partitions': None, 'type': access, 'possible_keys': key, 'key': key,
+                     'rows': None, 'Extra': detail})
+    return rows
+
+
+class SQLiteCursor:
+    """The part of the mysql.connector cursor API the models use"""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._dictionary = dictionary
+        self._cursor = None
+        self._rows = None  # emulated result set
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self.description or ())
+
+    def execute(self, operation, params=()):
+        _count_statement()
+        self._rows = None
+        params = params if isinstance(params, dict) else tuple(params or ())
+        call = _CALL.match(operation)
+        if call:
+            raise errors.ProgrammingError(msg=f"PROCEDURE {call.group(1)} does not exist",
+                                          errno=ER_SP_DOES_NOT_EXIST, sqlstate="42000")
+        if _SHOW_QUESTIONS.match(operation):
+            operation, params = "SELECT 'Questions' AS Variable_name, %s AS Value", (statements(),)
+        explain = _EXPLAIN.match(operation)
+        if explain:
+            operation = operation[explain.end():]
+        sql = translate(operation)
+        try:
+            raw = self._connection._raw
+            if explain:
+                self._set_rows(_plan_rows(raw.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()))
+                return
+            self._cursor = raw.execute(sql, params)
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        if self.rowcount > 1 and _INSERT.match(sql):
+            # MySQL reports the FIRST id of a multi-row INSERT (product_import relies on it)
+            self.lastrowid -= self.rowcount - 1
+
+    def executemany(self, operation, seq_params):
+        _count_statement()
+        self._rows = None
+        try:
+            self._cursor = self._connection._raw.executemany(translate(operation),
+                                                             [tuple(p) for p in seq_params])
+        except sqlite3.Error as e:
+            raise _error(e) from e
+        self.description = None
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = None
+
+    def _set_rows(self, dict_rows):
+        names = tuple(dict_rows[0]) if dict_rows else ('id', 'table', 'type', 'key')
+        self.description = tuple((name, None, None, None, None, None, None) for name in names)
+        self._rows = iter([tuple(r.values()) for r in dict_rows])
+        self.rowcount = len(dict_rows)
+        self._cursor = None
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._row(next(self._rows, None))
+        return self._row(self._cursor.fetchone()) if self._cursor else None
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            rows = [r for _, r in zip(range(size), self._rows)]
+        else:
+            rows = self._cursor.fetchmany(size) if self._cursor else []
+        return [self._row(r) for r in rows]
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows = list(self._rows)
+        else:
+            rows = self._cursor.fetchall() if self._cursor else []
+        return [self._row(r) for r in rows]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def nextset(self):
+        return None
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        return True
+
+
+class SQLiteConnection:
+    """A pooled SQLite connection; close() hands it back to its pool"""
+
+    unread_result = False
+
+    def __init__(self, pool):
+        self._pool = pool
+        self._raw = None
+        self._checked_out = False
+        self.connection_id = None
+        self.reconnect()
+
+    def reconnect(self, attempts=1, delay=0):
+        if self._raw is not None:
+            self._raw.close()
+        try:
+            raw = sqlite3.connect(self._pool.path, timeout=LOCK_TIMEOUT, check_same_thread=False,
+                                  detect_types=sqlite3.PARSE_DECLTYPES)
+            raw.execute("PRAGMA journal_mode = WAL")
+            raw.execute("PRAGMA synchronous = NORMAL")
+        except sqlite3.Error as e:
+            raise errors.InterfaceError(msg=f"Cannot open {self._pool.path}: {e}") from e
+        self._raw = raw
+        # A new id per physical connection (stmt_cache keys its cursors on it)
+        self.connection_id = next(_connection_ids)
+
+    def cursor(self, dictionary=False, prepared=False, buffered=None):
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    def start_transaction(self):
+        if self._raw.in_transaction:
+            raise errors.ProgrammingError(msg="Transaction already in progress")
+        _count_statement()
+        try:
+            self._raw.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def commit(self):
+        _count_statement()
+        try:
+            self._raw.commit()
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def rollback(self):
+        _count_statement()
+        try:
+            self._raw.rollback()
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def is_connected(self):
+        return self._raw is not None
+
+    def consume_results(self):
+        pass
+
+    def executescript(self, script):
+        """Run DDL / seed statements as they are (no dialect translation)"""
+        try:
+            self._raw.executescript(script)
+        except sqlite3.Error as e:
+            raise _error(e) from e
+
+    def close(self):
+        if not self._checked_out:
+            return
+        self._checked_out = False
+        try:
+            self._raw.rollback()
+        except sqlite3.Error:
+            self.reconnect()
+        self._pool._release(self)
+
+
+class SQLitePool:
+    """Fixed-size pool with the get_connection() contract of MySQLConnectionPool"""
+
+    def __init__(self, path, pool_size):
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._idle.put(SQLiteConnection(self))
+
+    def get_connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            raise PoolError("Failed getting connection; pool exhausted")
+        conn._checked_out = True
+        return conn
+
+    def _release(self, conn):
+        self._idle.put(conn)
+
+
+def create_schema(conn):
+    """Create every table, index and trigger that is missing (idempotent)"""
+    conn.executescript(SCHEMA)
+
+
+def add_admin(conn, username, password):
+    """First Admin account for a fresh database (plain text, like LoginModel expects)"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO users (userFname, userLname, username, password, role, status)
+        VALUES (%s, %s, %s, %s, 'Admin', 'Active')
+    """, ("Admin", username, username, password))
+    conn.commit()
+
+
+if __name__ == "__main__":
+    from db_pool import get_connection, using_sqlite
+
+    i = sys.argv.index("--add-admin") if "--add-admin" in sys.argv else len(sys.argv)
+    if len(sys.argv) < i + 3 or not using_sqlite():
+        print("Usage: PYESATRAK_DB_BACKEND=sqlite python sqlite_backend.py --add-admin USERNAME PASSWORD")
+        sys.exit(1)
+    conn = get_connection()
+    if not conn:
+        sys.exit(1)
+    try:
+        create_schema(conn)
+        add_admin(conn, sys.argv[i + 1], sys.argv[i + 2])
+        print(f"✓ Admin account '{sys.argv[i + 1]}' created")
+    except errors.Error as e:
+        print(f"SQLite Error: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
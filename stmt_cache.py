@@ -0,0 +1,76 @@
+# stmt_cache.py
+"""
+Server-side prepared statements cached per pooled connection.
+
+The first time a connection runs a given SQL text it is prepared once
+(cursor(prepared=True)); after that the same cursor re-executes it with new
+parameters, so the server skips parsing. Prepared statements live in the
+server session, which is why db_pool does not reset sessions on checkout.
+
+stats() exposes hit/miss counters to confirm the cache is being used.
+"""
+import threading
+from collections import OrderedDict
+
+# Cached sessions kept before the least recently used one is dropped
+MAX_SESSIONS = 32
+
+_sessions = OrderedDict()   # server connection_id -> {(sql, dictionary): (sql, cursor)}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def _session_cache(conn):
+    key = conn.connection_id
+    with _lock:
+        cache = _sessions.get(key)
+        if cache is None:
+            cache = _sessions[key] = {}
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+        else:
+            _sessions.move_to_end(key)
+        return cache
+
+
+def prepared(conn, sql, dictionary=False):
+    """
+    (cursor, sql) for a statement on this connection.
+    Always execute the returned sql object: the connector only skips
+    re-preparing when it sees the identical string it prepared.
+    """
+    cache = _session_cache(conn)
+    entry = cache.get((sql, dictionary))
+    with _lock:
+        if entry is None:
+            _stats['misses'] += 1
+        else:
+            _stats['hits'] += 1
+    if entry is None:
+        entry = (sql, conn.cursor(prepared=True, dictionary=dictionary))
+        cache[(sql, dictionary)] = entry
+    return entry[1], entry[0]
+
+
+def execute(conn, sql, params=(), dictionary=False):
+    """Execute through the cached prepared cursor and return it for fetching"""
+    cursor, sql = prepared(conn, sql, dictionary)
+    cursor.execute(sql, tuple(params))
+    return cursor
+
+
+def stats():
+    """Hit/miss counters plus how many statements are currently prepared"""
+    with _lock:
+        return {
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'sessions': len(_sessions),
+            'statements': sum(len(c) for c in _sessions.values()),
+        }
+
+
+def reset_stats():
+    with _lock:
+        _stats['hits'] = 0
+        _stats['misses'] = 0
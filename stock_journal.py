@@ -0,0 +1,323 @@
+# stock_journal.py
+"""
+Durable local journal for stock movements the database cannot take right now.
+
+    PYESATRAK_STOCK_JOURNAL=stock_journal.db python Main.py   (off when unset)
+    python stock_journal.py --status | --replay
+
+When update_stock finds the database unreachable, or still timing out after
+db_retry's attempts, the movement is appended here and the terminal carries
+on. Each append is committed to a WAL-mode SQLite file with synchronous=FULL
+(fsync'd) before update_stock returns, so a crash or power cut cannot lose
+it. While anything is pending, new movements are appended too, so the
+database receives them in the order they were scanned.
+
+A background replayer sends pending movements oldest first, up to BATCH_SIZE
+per transaction, through InventoryModel.update_stock_many together with
+their idempotency keys: a batch whose commit was lost in transit is
+recognised on the next attempt and not booked twice. Replayed movements are
+removed. Movements the database refuses (unknown product, not enough stock
+on hand by the time they arrive) are kept as 'rejected' with the reason for
+a supervisor to re-enter.
+
+While the database is unreachable or busy, the head batch simply waits.
+A batch that fails for any other reason MAX_ATTEMPTS times is replayed one
+movement at a time: a movement that still fails on its own is rejected
+with its error, and the rest go through. One bad movement cannot hold up
+the journal.
+"""
+import atexit
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+JOURNAL_PATH = os.environ.get("PYESATRAK_STOCK_JOURNAL", "")
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5  # failures of a batch before it is replayed one movement at a time
+REPLAY_INTERVAL = 2.0  # seconds between replay attempts while movements are pending
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS movements (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        product_id INTEGER NOT NULL,
+        quantity_change INTEGER NOT NULL,
+        transaction_type TEXT NOT NULL,
+        remarks TEXT NULL,
+        user_id INTEGER NULL,
+        journaled_at TEXT NOT NULL,
+        state TEXT NOT NULL DEFAULT 'pending',  -- 'pending' or 'rejected'
+        attempts INTEGER NOT NULL DEFAULT 0,
+        message TEXT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_movements_state ON movements (state, seq);
+"""
+
+BATCH_QUERY = """
+    SELECT seq, idempotency_key, product_id, quantity_change, transaction_type, remarks, user_id
+    FROM movements WHERE state = 'pending' ORDER BY seq LIMIT ?
+"""
+
+
+class Journaled:
+    """update_stock result when the movement was journaled for replay (truthy: the scan is kept)"""
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return "JOURNALED"
+
+
+JOURNALED = Journaled()
+
+_conn = None
+_lock = threading.Lock()         # guards _conn and _counts
+_replay_lock = threading.Lock()  # one replay at a time (worker or replay())
+_start_lock = threading.Lock()
+_worker = None
+_stopping = threading.Event()
+_counts = {'pending': 0, 'rejected': 0}
+_stats = {'journaled': 0, 'replayed': 0, 'failed_batches': 0}
+
+
+def configure(path):
+    """Turn the journal on (file path) or off (None). Only before it is opened."""
+    global JOURNAL_PATH
+    if _conn is not None:
+        print("Stock journal: already open, configuration unchanged")
+        return False
+    JOURNAL_PATH = path or ""
+    return True
+
+
+def is_enabled():
+    return bool(JOURNAL_PATH)
+
+
+def _get_conn():
+    """The journal connection, opened on first use. Caller holds _lock."""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(JOURNAL_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # fsync on every commit
+        conn.executescript(SCHEMA)
+        for state, count in conn.execute("SELECT state, COUNT(*) FROM movements GROUP BY state"):
+            _counts[state] = count
+        _conn = conn
+    return _conn
+
+
+def append(product_id, quantity_change, transaction_type, remarks, user_id, idempotency_key):
+    """
+    Journal one movement for replay; it is on disk when this returns.
+    Returns JOURNALED, or False if the journal file cannot be written.
+    """
+    try:
+        with _lock:
+            conn = _get_conn()
+            # The same key twice is the same movement
+            added = conn.execute("""
+                INSERT OR IGNORE INTO movements
+                (idempotency_key, product_id, quantity_change, transaction_type, remarks, user_id, journaled_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (idempotency_key, product_id, quantity_change, transaction_type, remarks, user_id,
+                  datetime.now().strftime("%Y-%m-%d %H:%M:%S"))).rowcount
+            conn.commit()
+            _counts['pending'] += added
+            _stats['journaled'] += added
+    except sqlite3.Error as e:
+        print(f"Error writing stock journal: {e}")
+        return False
+    _ensure_worker()
+    return JOURNALED
+
+
+def _count(state):
+    if not is_enabled():
+        return 0
+    try:
+        with _lock:
+            _get_conn()
+            return _counts[state]
+    except sqlite3.Error as e:
+        print(f"Error opening stock journal: {e}")
+        return 0
+
+
+def pending_count():
+    """Movements waiting to be sent (0 when the journal is off)"""
+    return _count('pending')
+
+
+def rejected_count():
+    """Movements the database refused, kept for review"""
+    return _count('rejected')
+
+
+def has_pending():
+    return pending_count() > 0
+
+
+def _next_batch(conn):
+    rows = conn.execute(BATCH_QUERY, (BATCH_SIZE,)).fetchall()
+    # update_stock_many books a batch for one user: stop where the user changes
+    batch = []
+    for row in rows:
+        if batch and row[6] != batch[0][6]:
+            break
+        batch.append(row)
+    return batch
+
+
+def _lines(rows):
+    return [{'product_id': product_id, 'quantity_change': qty, 'transaction_type': ttype,
+             'remarks': remarks or '', 'idempotency_key': key}
+            for _, key, product_id, qty, ttype, remarks, _ in rows]
+
+
+def _settle(rows, results):
+    """Remove the movements that were booked and keep the refused ones as 'rejected'"""
+    sent = [(row[0],) for row, r in zip(rows, results) if r['success']]
+    refused = [(r['message'], row[0]) for row, r in zip(rows, results) if r.get('rejected')]
+    with _lock:
+        conn = _get_conn()
+        conn.executemany("DELETE FROM movements WHERE seq = ?", sent)
+        conn.executemany("UPDATE movements SET state = 'rejected', message = ? WHERE seq = ?", refused)
+        conn.commit()
+        _counts['pending'] -= len(sent) + len(refused)
+        _counts['rejected'] += len(refused)
+        _stats['replayed'] += len(sent)
+    if refused:
+        print(f"Stock journal: {len(refused)} movement(s) rejected by the database (see --status)")
+    return len(sent) + len(refused)
+
+
+def _replay_lines(rows):
+    """Send a failing batch one movement at a time. Returns the movements settled."""
+    from SIModel import InventoryModel  # SIModel imports this module
+
+    done, results = [], []
+    for row in rows:
+        result = InventoryModel().update_stock_many(_lines([row]), row[6])[0]
+        if not result['success'] and not result.get('rejected'):
+            if result.get('retryable'):
+                break  # The database went away: the rest waits
+            result['rejected'] = True  # Fails on its own too
+        done.append(row)
+        results.append(result)
+    return _settle(done, results) if done else 0
+
+
+def _replay_batch():
+    """Send the oldest pending batch. Returns the movements settled, or None if the database failed it."""
+    from SIModel import InventoryModel  # SIModel imports this module
+
+    with _lock:
+        batch = _next_batch(_get_conn())
+    if not batch:
+        return 0
+    results = InventoryModel().update_stock_many(_lines(batch), batch[0][6])
+    if any(r['success'] or r.get('rejected') for r in results):
+        return _settle(batch, results)
+
+    # The whole batch failed: keep it for the next attempt
+    with _lock:
+        conn = _get_conn()
+        conn.executemany("UPDATE movements SET attempts = attempts + 1, message = ? WHERE seq = ?",
+                         [(results[0]['message'], row[0]) for row in batch])
+        conn.commit()
+        attempts = conn.execute("SELECT attempts FROM movements WHERE seq = ?", (batch[0][0],)).fetchone()[0]
+        _stats['failed_batches'] += 1
+    if results[0].get('retryable') or attempts < MAX_ATTEMPTS:
+        return None
+    return _replay_lines(batch) or None
+
+
+def replay():
+    """Send pending movements until none are left or the database fails. Returns how many were settled."""
+    if not is_enabled():
+        return 0
+    settled = 0
+    with _replay_lock:
+        try:
+            while True:
+                done = _replay_batch()
+                if not done:
+                    return settled
+                settled += done
+        except sqlite3.Error as e:
+            print(f"Error reading stock journal: {e}")
+            return settled
+
+
+def _run():
+    while not _stopping.is_set():
+        try:
+            if pending_count():
+                replay()
+        except Exception as e:  # keep the thread alive; the movements stay pending
+            print(f"Stock journal replay failed: {e}")
+        _stopping.wait(REPLAY_INTERVAL)
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _start_lock:
+            if _worker is None or not _worker.is_alive():
+                _stopping.clear()
+                _worker = threading.Thread(target=_run, name="stock-journal-replayer", daemon=True)
+                _worker.start()
+
+
+def start():
+    """Start replaying movements left over from an earlier session (no-op when the journal is off)"""
+    if has_pending():
+        _ensure_worker()
+
+
+def shutdown():
+    """Stop the replayer; pending movements stay on disk for the next start. Registered with atexit."""
+    global _conn
+    _stopping.set()
+    if _worker is not None:
+        _worker.join(timeout=REPLAY_INTERVAL * 2)
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+def stats():
+    return {
+        'pending': _counts['pending'],
+        'rejected': _counts['rejected'],
+        'journaled': _stats['journaled'],
+        'replayed': _stats['replayed'],
+        'failed_batches': _stats['failed_batches'],
+    }
+
+
+atexit.register(shutdown)
+
+
+if __name__ == "__main__":
+    if not is_enabled() or not ({"--status", "--replay"} & set(sys.argv)):
+        print("Usage: PYESATRAK_STOCK_JOURNAL=stock_journal.db python stock_journal.py --status | --replay")
+        sys.exit(1)
+    if "--replay" in sys.argv:
+        print(f"✓ {replay()} movement(s) settled")
+    print(f"  pending   {pending_count()}")
+    print(f"  rejected  {rejected_count()}")
+    with _lock:
+        rows = _get_conn().execute("""
+            SELECT seq, state, journaled_at, product_id, transaction_type, quantity_change, attempts, message
+            FROM movements WHERE state = 'rejected' OR attempts > 0 ORDER BY seq LIMIT 50
+        """).fetchall()
+    for seq, state, at, product_id, ttype, qty, attempts, message in rows:
+        print(f"  #{seq} {state:<8} {at} product {product_id} {ttype} {qty:+d} "
+              f"({attempts} attempt(s)): {message}")
@@ -0,0 +1,298 @@
+# stock_rollup.py
+"""
+Daily stock movement totals in `stock_daily_rollup`
+(day, product_id, transaction_type) -> qty, txn_count.
+
+catch_up() folds ledger rows with transaction_id above a high-water mark
+(the `rollup_transaction_id` row in kpi_counters) into the rollup, in one
+transaction with the mark, so no movement is ever counted twice. Rows
+younger than SETTLE_SECONDS are left for the next run.
+
+A movement can take a lower transaction_id and commit after the mark has
+passed it (it waited on a lock). Ids missing below the mark whose
+neighbours are recent are recorded in `stock_rollup_gaps`; each run folds
+the ones that have since appeared and forgets them after GAP_EXPIRY_SECONDS
+(a rolled-back movement leaves its id unused for good).
+
+Readers add the not-yet-folded rows (above the mark, or in a gap) from the
+raw ledger, so totals are exact whether or not catch_up has run recently;
+catch-up only keeps that tail short. A 12-month summary then reads about
+365 x SKU rollup rows instead of every transaction.
+
+The application runs catch_up on a background thread (start()); readers
+never fold. Without the application running, use cron:
+    python stock_rollup.py --catch-up    (cron / after bulk imports)
+    python stock_rollup.py --backfill    (rebuild from the live ledger)
+"""
+import sys
+import threading
+import time
+from datetime import date
+
+from mysql.connector import Error
+from db_pool import get_connection
+from date_ranges import date_range
+
+MARK_NAME = 'rollup_transaction_id'
+SETTLE_SECONDS = 10
+GAP_EXPIRY_SECONDS = 3600  # a missing id not seen by then was rolled back
+BATCH_SIZE = 20000  # ledger rows folded per transaction
+CATCH_UP_INTERVAL = 60  # seconds between background catch_up() runs
+
+# Last id of the next batch: at most BATCH_SIZE ledger rows above the mark,
+# stopping before the first row that has not settled yet (gaps left by
+# archived rows are skipped over)
+BATCH_END_QUERY = """
+    SELECT MAX(b.transaction_id)
+    FROM (
+        SELECT transaction_id FROM stock_transactions
+        WHERE transaction_id > %s
+        ORDER BY transaction_id
+        LIMIT %s
+    ) b
+    WHERE b.transaction_id < (
+        SELECT COALESCE(MIN(transaction_id), 2147483647) FROM stock_transactions
+        WHERE transaction_id > %s AND transaction_date >= NOW() - INTERVAL %s SECOND)
+"""
+
+# Ids in the batch, and whether each row is recent enough for a gap before it to matter
+BATCH_IDS_QUERY = """
+    SELECT transaction_id, transaction_date >= NOW() - INTERVAL %s SECOND
+    FROM stock_transactions
+    WHERE transaction_id > %s AND transaction_id <= %s
+    ORDER BY transaction_id
+"""
+
+# Ids recorded as gaps are left to the late pass, even if they committed meanwhile
+FOLD_QUERY = """
+    INSERT INTO stock_daily_rollup (day, product_id, transaction_type, qty, txn_count)
+    SELECT DATE(transaction_date), product_id, transaction_type, SUM(quantity), COUNT(*)
+    FROM stock_transactions
+    WHERE transaction_id > %s AND transaction_id <= %s
+      AND transaction_id NOT IN (SELECT transaction_id FROM stock_rollup_gaps)
+    GROUP BY DATE(transaction_date), product_id, transaction_type
+    ON DUPLICATE KEY UPDATE qty = qty + VALUES(qty), txn_count = txn_count + VALUES(txn_count)
+"""
+
+LATE_IDS_QUERY = """
+    SELECT g.transaction_id FROM stock_rollup_gaps g
+    JOIN stock_transactions t ON t.transaction_id = g.transaction_id
+"""
+
+FOLD_IDS_QUERY = """
+    INSERT INTO stock_daily_rollup (day, product_id, transaction_type, qty, txn_count)
+    SELECT DATE(transaction_date), product_id, transaction_type, SUM(quantity), COUNT(*)
+    FROM stock_transactions
+    WHERE transaction_id IN ({ids})
+    GROUP BY DATE(transaction_date), product_id, transaction_type
+    ON DUPLICATE KEY UPDATE qty = qty + VALUES(qty), txn_count = txn_count + VALUES(txn_count)
+"""
+
+# Rollup days in range plus the unfolded ledger rows (tail and late gaps).
+# Params: totals_params(start, end)
+MOVEMENT_TOTALS_QUERY = """
+    SELECT x.transaction_type, SUM(x.qty) as total_qty, SUM(x.txn_count) as txn_count
+    FROM (
+        SELECT r.transaction_type, r.qty, r.txn_count
+        FROM stock_daily_rollup r
+        WHERE r.day >= %s AND r.day < %s
+        UNION ALL
+        SELECT t.transaction_type, t.quantity, 1
+        FROM stock_transactions t
+        WHERE (t.transaction_id > (  -- the MARK_NAME row
+                   SELECT COALESCE(MAX(counter_value), 0) FROM kpi_counters
+                   WHERE counter_name = 'rollup_transaction_id')
+               OR t.transaction_id IN (SELECT g.transaction_id FROM stock_rollup_gaps g))
+          AND t.transaction_date >= %s AND t.transaction_date < %s
+    ) x
+    GROUP BY x.transaction_type
+"""
+
+# The same totals as one row (stock_in, stock_out) for the dashboard snapshots.
+# Params: totals_params(start, end)
+FLOW_QUERY = f"""
+    SELECT SUM(CASE WHEN m.transaction_type = 'IN' THEN m.total_qty ELSE 0 END) as stock_in,
+           SUM(CASE WHEN m.transaction_type = 'OUT' THEN m.total_qty ELSE 0 END) as stock_out
+    FROM ({MOVEMENT_TOTALS_QUERY}) m
+"""
+
+_worker = None
+_start_lock = threading.Lock()
+_stopping = threading.Event()
+
+
+def totals_params(start, end):
+    """Params for MOVEMENT_TOTALS_QUERY over inclusive report dates"""
+    lower, upper = date_range(start, end)
+    return lower[:10], upper[:10], lower, upper
+
+
+def today_params():
+    """totals_params() for today, as used by the dashboard stock flow"""
+    today = date.today()
+    return totals_params(today, today)
+
+
+def _read_mark(cursor, lock=False):
+    cursor.execute(
+        "SELECT counter_value FROM kpi_counters WHERE counter_name = %s" + (" FOR UPDATE" if lock else ""),
+        (MARK_NAME,))
+    row = cursor.fetchone()
+    return int(row[0]) if row else None
+
+
+def _write_mark(cursor, value):
+    cursor.execute("""
+        INSERT INTO kpi_counters (counter_name, counter_value, updated_at) VALUES (%s, %s, NOW())
+        ON DUPLICATE KEY UPDATE counter_value = VALUES(counter_value), updated_at = NOW()
+    """, (MARK_NAME, value))
+
+
+def _rollback(conn):
+    try:
+        conn.rollback()
+    except Error:
+        pass  # Connection lost - the pool reconnects it on the next checkout
+
+
+def _batch_gaps(cursor, mark, upper):
+    """Ids missing from (mark, upper] just before a recent row: they may still commit"""
+    cursor.execute(BATCH_IDS_QUERY, (GAP_EXPIRY_SECONDS, mark, upper))
+    gaps, prev = [], mark
+    for transaction_id, recent in cursor.fetchall():
+        if recent and transaction_id - prev - 1 <= BATCH_SIZE:
+            gaps.extend(range(prev + 1, transaction_id))
+        prev = transaction_id
+    return gaps
+
+
+def _fold_late(conn, cursor):
+    """Fold gap ids whose movement has committed since, and forget expired gaps"""
+    conn.start_transaction()
+    _read_mark(cursor, lock=True)
+    cursor.execute(LATE_IDS_QUERY)
+    late = [row[0] for row in cursor.fetchall()]
+    if late:
+        ids = ", ".join(["%s"] * len(late))
+        cursor.execute(FOLD_IDS_QUERY.format(ids=ids), tuple(late))
+        cursor.execute(f"DELETE FROM stock_rollup_gaps WHERE transaction_id IN ({ids})", tuple(late))
+    cursor.execute("DELETE FROM stock_rollup_gaps WHERE seen_at < NOW() - INTERVAL %s SECOND",
+                   (GAP_EXPIRY_SECONDS,))
+    conn.commit()
+    return len(late)
+
+
+def catch_up(conn=None):
+    """
+    Fold late gap rows, then settled ledger rows above the mark, into the rollup.
+    Returns how many transaction ids were folded or passed over, or None on error.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        # Locking the mark row serialises concurrent catch-ups
+        folded = _fold_late(conn, cursor)
+        while True:
+            conn.start_transaction()
+            mark = _read_mark(cursor, lock=True)
+            if mark is None:
+                _write_mark(cursor, 0)
+                mark = 0
+            cursor.execute(BATCH_END_QUERY, (mark, BATCH_SIZE, mark, SETTLE_SECONDS))
+            upper = cursor.fetchone()[0]
+            if upper is None:
+                conn.rollback()
+                return folded
+            gaps = _batch_gaps(cursor, mark, upper)
+            if gaps:
+                cursor.executemany(
+                    "INSERT IGNORE INTO stock_rollup_gaps (transaction_id, seen_at) VALUES (%s, NOW())",
+                    [(g,) for g in gaps])
+            cursor.execute(FOLD_QUERY, (mark, upper))
+            _write_mark(cursor, upper)
+            conn.commit()
+            folded += upper - mark
+    except Error as e:
+        print(f"Error updating stock rollup: {e}")
+        _rollback(conn)
+        return None
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _run():
+    while not _stopping.is_set():
+        try:
+            catch_up()
+        except Exception as e:  # keep the thread alive; the next run retries
+            print(f"Stock rollup catch-up failed: {e}")
+        _stopping.wait(CATCH_UP_INTERVAL)
+
+
+def start():
+    """Run catch_up() every CATCH_UP_INTERVAL on a background thread"""
+    global _worker
+    with _start_lock:
+        if _worker is None or not _worker.is_alive():
+            _stopping.clear()
+            _worker = threading.Thread(target=_run, name="stock-rollup", daemon=True)
+            _worker.start()
+
+
+def shutdown():
+    """Stop the background catch-up (a batch in progress finishes first)"""
+    _stopping.set()
+    if _worker is not None:
+        _worker.join(timeout=5)
+
+
+def backfill(conn=None):
+    """
+    Rebuild the rollup from the live ledger (first install or after manual
+    edits). Days before the oldest live row are kept: those months were
+    archived by partitions.py and are no longer in stock_transactions.
+    Run while terminals are idle.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    if not conn: return None
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute("SELECT MIN(transaction_date) FROM stock_transactions")
+        oldest = cursor.fetchone()[0]
+        if oldest is not None:
+            cursor.execute("DELETE FROM stock_daily_rollup WHERE day >= %s", (str(oldest)[:10],))
+        cursor.execute("DELETE FROM stock_rollup_gaps")
+        _write_mark(cursor, 0)
+        conn.commit()
+    except Error as e:
+        print(f"Error resetting stock rollup: {e}")
+        _rollback(conn)
+        return None
+    finally:
+        if own_conn:
+            conn.close()
+    return catch_up(None if own_conn else conn)
+
+
+if __name__ == "__main__":
+    if "--backfill" in sys.argv:
+        started = time.perf_counter()
+        count = backfill()
+        if count is None:
+            sys.exit(1)
+        print(f"✓ Rollup rebuilt from {count} transaction id(s) in {time.perf_counter() - started:.1f}s")
+    elif "--catch-up" in sys.argv:
+        count = catch_up()
+        if count is None:
+            sys.exit(1)
+        print(f"✓ {count} transaction id(s) folded into the rollup")
+    else:
+        print("Usage: python stock_rollup.py --catch-up | --backfill")
+        sys.exit(1)
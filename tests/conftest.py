@@ -0,0 +1,25 @@
+# conftest.py
+"""
+Tests run on the embedded SQLite backend in a temporary file, migrated to
+the latest schema. Set PYESATRAK_DB_BACKEND=mysql to run them against the
+server in db_pool.DB_CONFIG instead (MySQL-only checks are skipped on SQLite).
+"""
+import os
+
+import pytest
+
+import db_pool
+
+
+@pytest.fixture(scope="session")
+def conn(tmp_path_factory):
+    if os.environ.get("PYESATRAK_DB_BACKEND", "sqlite").lower() == "sqlite":
+        db_pool.configure(backend="sqlite", sqlite_path=str(tmp_path_factory.mktemp("db") / "pyesatrak.db"))
+    import migrate
+
+    connection = db_pool.get_connection()
+    if connection is None:
+        pytest.skip("database not reachable")
+    migrate.migrate(connection)
+    yield connection
+    connection.close()
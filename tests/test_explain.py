@@ -0,0 +1,36 @@
+# test_explain.py
+"""The --explain checks of date_ranges, migrate and partitions, as regression tests"""
+import pytest
+
+import date_ranges
+import migrate
+import partitions
+from db_pool import using_sqlite
+
+HOT_QUERIES = migrate.hot_queries()
+
+
+def test_stock_flow_uses_range_scan(conn):
+    ok, plan = date_ranges.explain_stock_flow(conn)
+    ledger = next(row for row in plan if row.get('table') == 't')
+    assert ledger['type'] == 'range', plan
+    assert ledger['key'], plan
+    assert ok
+
+
+@pytest.mark.parametrize("desc, query, params, table, index", HOT_QUERIES, ids=[q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_expected_index(conn, desc, query, params, table, index):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + query, params)
+    plan = cursor.fetchall()
+    row = next((r for r in plan if r.get('table') == table), None)
+    assert row is not None, plan
+    assert row['key'] == index, plan
+
+
+def test_report_queries_prune_partitions(conn):
+    if using_sqlite():
+        pytest.skip("partition pruning needs the MySQL backend")
+    if not partitions.existing_partitions(conn.cursor(), 'stock_transactions'):
+        pytest.skip("tables not partitioned (python partitions.py --partition)")
+    assert partitions.explain(conn)
@@ -0,0 +1,30 @@
+# test_report_export.py
+"""A report streamed again for export reads the rows its preview counted"""
+from datetime import datetime
+
+from AreportModel import ReportsModel
+
+
+def _remarks(batches):
+    return [row['remarks'] for batch in batches for row in batch]
+
+
+def test_rows_written_after_as_of_are_left_out(conn):
+    today = datetime.now().strftime("%Y-%m-%d")
+    model = ReportsModel()
+    as_of = datetime.now()
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO inventory (product_name, brand, model, stock_quantity, status, created_at, updated_at)
+        VALUES ('Report test', 'Test', 'T1', 1, 'Available', NOW(), NOW())
+    """)
+    cursor.execute("""
+        INSERT INTO stock_transactions
+        (product_id, transaction_type, quantity, remarks, performed_by, transaction_date)
+        VALUES (%s, 'IN', 1, 'after preview', 1, NOW())
+    """, (cursor.lastrowid,))
+    conn.commit()
+
+    assert 'after preview' not in _remarks(model.iter_stock_movement(today, today, as_of=as_of))
+    assert 'after preview' in _remarks(model.iter_stock_movement(today, today))
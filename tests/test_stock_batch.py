@@ -0,0 +1,78 @@
+# test_stock_batch.py
+"""update_stock_many rejects bad lines one by one and books the rest"""
+from mysql.connector import errors
+
+import db_pool
+import SIModel
+from SIModel import InventoryModel
+
+
+def _add_product(conn, name, qty):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO inventory (product_name, brand, model, stock_quantity, status, created_at, updated_at)
+        VALUES (%s, 'Test', 'T1', %s, 'Available', NOW(), NOW())
+    """, (name, qty))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def _stock(conn, product_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT stock_quantity FROM inventory WHERE product_id = %s", (product_id,))
+    quantity = cursor.fetchone()[0]
+    conn.rollback()
+    return quantity
+
+
+def test_invalid_lines_are_rejected_individually(conn):
+    pid = _add_product(conn, "Batch test", 20)
+    results = InventoryModel().update_stock_many([
+        {'product_id': pid, 'quantity_change': 'abc', 'transaction_type': 'IN'},
+        {'product_id': pid, 'quantity_change': -5, 'transaction_type': 'IN'},
+        {'product_id': pid, 'quantity_change': 5, 'transaction_type': 'OUT'},
+        {'product_id': pid, 'quantity_change': 0, 'transaction_type': 'DEFECT'},
+        {'product_id': pid, 'quantity_change': -30, 'transaction_type': 'OUT'},
+        {'product_id': pid, 'quantity_change': 3, 'transaction_type': 'IN'},
+        {'product_id': pid, 'quantity_change': -2, 'transaction_type': 'OUT'},
+    ], user_id=1)
+    assert [r['message'] for r in results] == [
+        "Invalid transaction", "Invalid transaction", "Invalid transaction", "Invalid transaction",
+        "Insufficient stock", "OK", "OK"]
+    assert all(r.get('rejected') for r in results[:5])
+    assert _stock(conn, pid) == 21
+
+
+def test_booked_idempotency_key_is_not_applied_twice(conn):
+    pid = _add_product(conn, "Replay test", 10)
+    line = {'product_id': pid, 'quantity_change': 4, 'transaction_type': 'IN', 'idempotency_key': 'test-key-1'}
+    assert InventoryModel().update_stock_many([line], user_id=1)[0]['message'] == "OK"
+    assert InventoryModel().update_stock_many([line], user_id=1)[0]['message'] == "Already booked"
+    assert _stock(conn, pid) == 14
+
+
+class _DroppingConnection:
+    """A pooled connection that is lost at COMMIT, so the rollback fails as well"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        raise errors.OperationalError(msg="Lost connection to MySQL server during query", errno=2013)
+
+    def rollback(self):
+        raise errors.OperationalError(msg="MySQL server has gone away", errno=2006)
+
+
+def test_dropped_connection_fails_the_batch_as_retryable(conn, monkeypatch):
+    pid = _add_product(conn, "Dropped batch", 10)
+    monkeypatch.setattr(SIModel, "get_connection", lambda: _DroppingConnection(db_pool.get_connection()))
+    results = InventoryModel().update_stock_many([
+        {'product_id': pid, 'quantity_change': 2, 'transaction_type': 'IN'},
+        {'product_id': pid, 'quantity_change': -1, 'transaction_type': 'OUT'},
+    ], user_id=1)
+    assert [(r['success'], r['retryable']) for r in results] == [(False, True), (False, True)]
+    assert _stock(conn, pid) == 10
@@ -0,0 +1,76 @@
+# test_stock_rollup.py
+"""A movement that commits after the rollup mark passed its id is still counted once"""
+import pytest
+
+import stock_rollup
+from ADBModel import DashboardModel
+from SDBoardModel import StaffDashboardModel
+
+
+def _add_movement(conn, transaction_id, quantity):
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO stock_transactions
+        (transaction_id, product_id, transaction_type, quantity, remarks, performed_by, transaction_date)
+        VALUES (%s, 1, 'IN', %s, 'rollup test', 1, NOW() - INTERVAL 30 SECOND)
+    """, (transaction_id, quantity))
+    conn.commit()
+
+
+def _total_in(conn):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(stock_rollup.MOVEMENT_TOTALS_QUERY, stock_rollup.today_params())
+    totals = {r['transaction_type']: int(r['total_qty'] or 0) for r in cursor.fetchall()}
+    conn.rollback()
+    return totals.get('IN', 0)
+
+
+def _next_free_id(conn):
+    """An id well above the ledger, after ageing earlier rows past SETTLE_SECONDS so the mark can pass them"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE stock_transactions SET transaction_date = NOW() - INTERVAL 30 SECOND
+        WHERE transaction_date > NOW() - INTERVAL 30 SECOND
+    """)
+    conn.commit()
+    cursor.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM stock_transactions")
+    base = cursor.fetchone()[0] + 100
+    conn.rollback()
+    return base
+
+
+def test_late_lower_id_is_folded_once(conn):
+    assert stock_rollup.catch_up(conn) is not None
+    before = _total_in(conn)
+    base = _next_free_id(conn)
+    cursor = conn.cursor()
+
+    # base + 1 is still in flight when the mark moves past base + 2
+    _add_movement(conn, base, 5)
+    _add_movement(conn, base + 2, 7)
+    stock_rollup.catch_up(conn)
+    cursor.execute("SELECT COUNT(*) FROM stock_rollup_gaps WHERE transaction_id = %s", (base + 1,))
+    assert cursor.fetchone()[0] == 1
+    conn.rollback()
+    assert _total_in(conn) == before + 12
+
+    _add_movement(conn, base + 1, 11)
+    assert _total_in(conn) == before + 23  # read from the ledger until folded
+    stock_rollup.catch_up(conn)
+    assert _total_in(conn) == before + 23
+    cursor.execute("SELECT COUNT(*) FROM stock_rollup_gaps WHERE transaction_id = %s", (base + 1,))
+    assert cursor.fetchone()[0] == 0
+    conn.rollback()
+
+
+@pytest.mark.parametrize("model", [DashboardModel, StaffDashboardModel])
+def test_snapshot_flow_counts_late_gap_rows(conn, model):
+    base = _next_free_id(conn)
+    _add_movement(conn, base, 2)
+    _add_movement(conn, base + 2, 3)
+    stock_rollup.catch_up(conn)
+    _add_movement(conn, base + 1, 4)  # committed after the mark passed it
+
+    dashboard = model()
+    assert dashboard.get_dashboard_snapshot()['stock_flow'] == dashboard.get_stock_flow_summary()
+    assert dashboard.get_stock_flow_summary()['in'] == _total_in(conn)
@@ -0,0 +1,91 @@
+# user_index.py
+"""
+In-memory search index of the user directory for Manage Users.
+
+The directory (no passwords) is kept client-side with an n-gram index:
+every substring of up to GRAM characters of first name, last name and
+username, lowercased, maps to the ids of the users containing it. A search
+term of up to GRAM characters is one dict lookup; a longer one intersects
+the sets of its trigrams and confirms the substring on the few candidates
+left, so results match the old LIKE '%term%' query without a round trip.
+
+sync() reads the user_directory_version stamp (kpi_counters, bumped by every
+ManageUsersModel write) and fetches the directory only when it moved. The
+rows are diffed in: only added, changed and removed users touch the index.
+"""
+
+GRAM = 3
+SEARCH_FIELDS = ('userFname', 'userLname', 'username')
+
+
+def _grams(text):
+    text = (text or "").lower()
+    return {text[i:i + n] for n in range(1, GRAM + 1) for i in range(len(text) - n + 1)}
+
+
+class UserDirectoryIndex:
+    def __init__(self, model):
+        self.model = model
+        self.users = {}    # user_id -> row
+        self.grams = {}    # n-gram -> set of user ids
+        self.version = None
+        self.loaded = False
+
+    def sync(self):
+        """Fetch the directory if its version moved. Returns True when the index changed."""
+        version = self.model.get_directory_version()
+        if self.loaded and version is not None and version == self.version:
+            return False
+        # Version read BEFORE the rows: a write in between is fetched again next time
+        rows = self.model.get_user_directory()
+        if rows is None:
+            return False
+        fresh = {row['user_id']: row for row in rows}
+        changed = False
+        for uid in [uid for uid in self.users if uid not in fresh]:
+            self._unindex(self.users.pop(uid))
+            changed = True
+        for uid, row in fresh.items():
+            old = self.users.get(uid)
+            if old == row:
+                continue
+            if old:
+                self._unindex(old)
+            self.users[uid] = row
+            self._index(row)
+            changed = True
+        self.version = version
+        self.loaded = True
+        return changed
+
+    def _index(self, row):
+        for field in SEARCH_FIELDS:
+            for gram in _grams(row.get(field)):
+                self.grams.setdefault(gram, set()).add(row['user_id'])
+
+    def _unindex(self, row):
+        for field in SEARCH_FIELDS:
+            for gram in _grams(row.get(field)):
+                ids = self.grams.get(gram)
+                if ids is not None:
+                    ids.discard(row['user_id'])
+                    if not ids:
+                        del self.grams[gram]
+
+    def search(self, search="", role="All", status="All"):
+        """Users whose names or username contain `search` (any case), newest first"""
+        term = search.lower()
+        if not term:
+            ids = self.users.keys()
+        elif len(term) <= GRAM:
+            ids = self.grams.get(term, ())
+        else:
+            candidates = sorted((self.grams.get(term[i:i + GRAM], set()) for i in range(len(term) - GRAM + 1)),
+                                key=len)
+            ids = [uid for uid in set.intersection(*candidates)
+                   if any(term in (self.users[uid].get(f) or "").lower() for f in SEARCH_FIELDS)]
+        rows = [self.users[uid] for uid in ids
+                if (role == "All" or self.users[uid]['role'] == role)
+                and (status == "All" or self.users[uid]['status'] == status)]
+        rows.sort(key=lambda r: r['user_id'], reverse=True)
+        return rows